@@ -7,7 +7,7 @@ CarbonX Player  v3.0  "Grid Edition"
 - Signal Chain 13 modulow DSP z zapisem presetow JSON
 - Monitor Mode przez wirtualny PulseAudio sink
 """
-import sys, os, math, random, re, json, locale, time
+import sys, os, math, random, re, json, locale, time, resource, threading
 
 # Wymuszamy locale C dla GLib/GStreamer — MUSI być przed importem gi
 # Bez tego GLib loguje floaty z przecinkiem (pl_PL) i set_property może odrzucać wartości
@@ -25,18 +25,27 @@ from PyQt6.QtWidgets import (QInputDialog,
     QDialog, QLineEdit, QSpinBox, QListWidgetItem, QStackedWidget,
     QScrollArea, QSplitter, QTabWidget, QButtonGroup
 )
-from PyQt6.QtCore  import Qt, QTimer, QPointF, QRect, QUrl, pyqtSignal
+from PyQt6.QtCore  import Qt, QTimer, QPointF, QRect, QRectF, QUrl, pyqtSignal
 from PyQt6.QtGui   import (QPainter, QColor, QPen, QBrush, QLinearGradient,
                             QRadialGradient, QPixmap, QImage, QPainterPath,
-                            QFontMetrics, QFont, QPalette)
+                            QFontMetrics, QFont, QPalette, QPolygonF)
 from PyQt6.QtMultimedia        import QMediaPlayer
 from PyQt6.QtMultimediaWidgets import QVideoWidget
 
+import numpy as np
 import gi
 gi.require_version('Gst', '1.0')
-from gi.repository import Gst, GLib
+gi.require_version('GstBase', '1.0')
+from gi.repository import Gst, GstBase, GLib, GObject
 Gst.init(None)
 
+try:
+    gi.require_version('GstController', '1.0')
+    from gi.repository import GstController
+    GSTCONTROLLER_OK = True
+except (ValueError, ImportError):
+    GSTCONTROLLER_OK = False
+
 try:
     import eyed3, logging
     logging.getLogger("eyed3").setLevel(logging.ERROR)
@@ -56,12 +65,59 @@ except ImportError:
 VIRTUAL_SINK   = "carbon_monitor"
 CHAIN_FILE     = "carbon_chain_presets.json"
 
+# ── Format toru FX ───────────────────────────────────────────────────────────
+# Jedna decyzja dla całego grafu FX: przypięta capsfilterem za res_in
+# i utrzymywana aż do conv_out. audioconvert tylko tam, gdzie szablony
+# padów pluginu nie obejmują FX_CAPS (patrz plugin_accepts_fx).
+FX_FORMAT = "F32LE"
+FX_RATE   = 48000
+FX_CAPS   = f"audio/x-raw,format={FX_FORMAT},rate={FX_RATE},channels=2,layout=interleaved"
+
 CHAIN_ORDER = [
     "phase_inv","gate","compressor","expander",
     "hi_pass","lo_pass","notch",
     "panorama","karaoke","chorus","reverb","stereo_fx","trim",
 ]
 
+# Wyłączony moduł łańcucha:
+#   "relink"      — resolver wypina element z toru (przebudowa połączeń)
+#   "neutral"     — element zostaje w torze, dostaje neutralne propsy (dalej liczy)
+#   "selector"    — moduł na stałe w binie output-selector → (moduł | skrót) →
+#                   input-selector (ChainBypass); wyłączony nie dostaje buforów,
+#                   przełączenie = zmiana aktywnych padów, bez przepinania
+# Bez trybu "passthrough": filtry audiofx są in-place i GstBaseTransform woła
+# transform_ip także w passthrough — stąd skrót obok elementu, nie w nim.
+BYPASS_MODES = ("relink", "neutral", "selector")
+BYPASS_MODE  = "relink"
+
+# Leniwa konstrukcja: moduły CHAIN_GST i MultibandLimiter powstają przy
+# pierwszym użyciu (checkbox modułu / LimiterRouter.enable), potem zostają
+LAZY_DSP = True
+
+# Okablowanie punktów LimiterRouter:
+#   "relink" — inject/eject przepina pady i przestawia ~35 elementów MBL przez NULL
+#   "switch" — LimiterSwitch (tee → dry | valve → MBL → mikser) wpinany przy
+#              pierwszym włączeniu punktu i zostaje; potem włączenie = otwarcie
+#              valve + crossfade dry/wet, bez zmian stanu. Nieużywany punkt nie
+#              ma w torze ani kolejek, ani miksera.
+MBL_WIRING   = "switch"
+MBL_XFADE_MS = 20
+MBL_XFADE_WARMUP_MS = 30     # świeżo otwarta gałąź liczy tyle przed startem rampy
+
+# Profile kolejek (propsy queue; leaky jako nick enuma):
+#   fx       — tor słyszalny: blokuje (back-pressure do źródła), ale ma sufit czasu
+#   analysis — gałąź analizy: leaky=downstream, gubi najstarsze bufory, nigdy
+#              nie wstrzymuje tee, gdy analiza / pętla Qt nie nadąża
+#   mbl      — gałęzie pasm MBL za tee: krótkie, blokujące (pasma muszą iść razem)
+QUEUE_PROFILES = {
+    "fx":       {"max-size-buffers": 0, "max-size-bytes": 0,
+                 "max-size-time": 200 * 1000000, "leaky": "no"},
+    "analysis": {"max-size-buffers": 8, "max-size-bytes": 0,
+                 "max-size-time": 100 * 1000000, "leaky": "downstream"},
+    "mbl":      {"max-size-buffers": 4, "max-size-bytes": 0,
+                 "max-size-time": 0, "leaky": "no"},
+}
+
 # label, accent color, {param: (min,max,default,scale,unit)}
 CHAIN_DEFS = {
     "phase_inv":  ("Phase Inv L/R", "#FF5555", {}),
@@ -183,6 +239,8 @@ MBLIMIT_BANDS = [
 BUILTIN_SCENES = {
     # Filozofia: minimalna ingerencja, przezroczystość sygnału.
     # Każda scena to subtelna korekcja — nie "efekt", a punkt startowy.
+    # POST_FX chroni 5-pasmowe MBL; limiter "type": "truepeak" (jeden element
+    # w Pythonie, wątek strumienia) jest opt-in — scena musi go wybrać jawnie.
     "🎙 Podcast": {
         "meta": {"icon": "🎙", "desc": "Mowa — lekka korekcja, naturalny głos"},
         "volume": 78,
@@ -407,7 +465,13 @@ class SceneManager:
         if not router:
             return result
         for pid in router.registered_points():
-            mbl = router.get(pid)
+            if router.kind(pid) == "tp":
+                tp = router.peek_tp(pid)
+                if tp:
+                    result[pid] = {"enabled": tp._injected, "type": "truepeak",
+                                   "ceiling": tp.ceiling_db, "release": tp.release_ms}
+                continue
+            mbl = router.peek(pid)      # niezbudowany punkt = wyłączony, bez ustawień
             if mbl:
                 result[pid] = {
                     "enabled": mbl._injected,
@@ -439,23 +503,21 @@ class SceneManager:
             self._do_apply(s)
 
     def _fade_apply(self, s, fade_ms):
-        """Dip volume → apply → restore volume."""
-        app = self.app
-        orig_vol = app.vol_sl.value()
-        target_vol = s.get("volume", orig_vol)
-
-        def step1():
-            # Fade down
-            app.vol_sl.setValue(0)
-            QTimer.singleShot(fade_ms, step2)
+        """
+        Dip volume → apply → restore volume.
+        Rampy na out_vol liczy GstController w wątku streamingu; timer GLib
+        wyznacza tylko moment podmiany ustawień (dołek rampy).
+        """
+        app  = self.app
+        auto = app.automation
+        auto.ramp(app.out_vol, "volume", 0.0, fade_ms)
 
         def step2():
-            # Apply all settings
-            self._do_apply(s)
-            # Fade up to target
-            QTimer.singleShot(30, lambda: app.vol_sl.setValue(target_vol))
+            self._do_apply(s)                      # _vol() → krótka rampa do celu
+            auto.ramp(app.out_vol, "volume", app.vol_sl.value() / 100.0, fade_ms)
+            return False
 
-        step1()
+        GLib.timeout_add(fade_ms, step2)
 
     def _do_apply(self, s):
         app = self.app
@@ -548,26 +610,40 @@ class SceneManager:
         if not router or not limiter_s:
             return
         for pid, pstate in limiter_s.items():
-            mbl = router.get(pid)
-            if not mbl:
-                continue
-            # Ustaw threshold/ratio per pasmo
-            bands = pstate.get("bands", [])
-            for i, bd in enumerate(bands[:len(mbl.nodes)]):
-                mbl.set_band_threshold(i, bd.get("thr", 0.8))
-                mbl.set_band_ratio(i, bd.get("ratio", 3.0))
-            # Włącz/wyłącz
             en = pstate.get("enabled", False)
+            if pstate.get("type") == "truepeak" and router.has_tp(pid):
+                router.set_kind(pid, "tp")
+                tp = router.tp(pid) if en else router.peek_tp(pid)
+                if tp:
+                    tp.set_ceiling(pstate.get("ceiling", TP_CEILING_DB))
+                    tp.set_release(pstate.get("release", TP_RELEASE_MS))
+            else:
+                router.set_kind(pid, "mbl")
+                # Leniwe punkty budujemy tylko gdy scena je włącza
+                mbl = router.get(pid) if en else router.peek(pid)
+                if not mbl:
+                    continue
+                # Ustaw threshold/ratio per pasmo
+                bands = pstate.get("bands", [])
+                for i, bd in enumerate(bands[:len(mbl.nodes)]):
+                    mbl.set_band_threshold(i, bd.get("thr", 0.8))
+                    mbl.set_band_ratio(i, bd.get("ratio", 3.0))
+            # Włącz/wyłącz
             router.enable(pid, en)
-            # Sync checkbox w RouterWidget
+            # Sync checkbox (i przycisku TP) w RouterWidget
             if rw and pid in rw._point_widgets:
                 cb = rw._point_widgets[pid]["cb"]
                 cb.blockSignals(True)
                 cb.setChecked(en)
                 cb.blockSignals(False)
+                tpb = rw._point_widgets[pid].get("tp")
+                if tpb:
+                    tpb.blockSignals(True)
+                    tpb.setChecked(router.kind(pid) == "tp")
+                    tpb.blockSignals(False)
         # Wyłącz punkty których nie ma w scenie
         for pid in router.registered_points():
-            if pid not in limiter_s and router.get(pid)._injected:
+            if pid not in limiter_s and pid in router.active_points():
                 router.enable(pid, False)
                 if rw and pid in rw._point_widgets:
                     cb = rw._point_widgets[pid]["cb"]
@@ -1835,47 +1911,81 @@ class LimiterRouter:
     Użycie:
         router = LimiterRouter(pipeline)
         router.register("POST_FX", mbl_instance, conv_out, hw_sink)
+        router.register("INPUT", lambda: MultibandLimiter(...), fx_caps, tee)  # lazy
         router.enable("POST_FX", True)
         router.get("POST_FX").set_band_threshold(0, 0.8)
+
+    Punkt zarejestrowany z fabryką (callable) buduje MBL przy pierwszym
+    get()/enable(True) i trzyma go potem w cache. peek() nigdy nie buduje —
+    do odczytów stanu (checkboxy, sceny, AutoInsert, resolver).
+    on_built: lista callback(pid, mbl) wołanych po zbudowaniu.
     """
 
     def __init__(self):
-        self._points = {}   # point_id -> {"mbl": MBL, "up": el, "dn": el}
+        self._points = {}   # point_id -> {"mbl": MBL | None, "factory": callable | None, "up": el, "dn": el}
+        self.on_built = []
 
     def register(self, point_id, mbl, upstream_el, downstream_el):
         """
         Rejestruje punkt wstrzyknięcia.
-        mbl musi być już skonstruowane z tymi samymi elementami pipeline.
+        mbl: gotowy MultibandLimiter (z tymi samymi elementami pipeline)
+             albo fabryka bez argumentów — MBL powstanie przy pierwszym użyciu.
         upstream/downstream to elementy GST między którymi MBL zostanie wstrzyknięty.
         """
-        mbl._upstream   = upstream_el
-        mbl._downstream = downstream_el
+        factory = mbl if callable(mbl) else None
         self._points[point_id] = {
-            "mbl": mbl, "up": upstream_el, "dn": downstream_el
+            "mbl": None if factory else mbl, "factory": factory,
+            "up": upstream_el, "dn": downstream_el
         }
+        if not factory:
+            mbl._upstream   = upstream_el
+            mbl._downstream = downstream_el
         print(f"  [Router] zarejestrowano punkt: {point_id} "
-              f"({upstream_el.get_name()} → {downstream_el.get_name()})")
+              f"({upstream_el.get_name()} → {downstream_el.get_name()})"
+              f"{'  [lazy]' if factory else ''}")
+
+    def _build(self, point_id, pt):
+        t0 = time.perf_counter()
+        mbl = pt["factory"]()
+        mbl._upstream   = pt["up"]
+        mbl._downstream = pt["dn"]
+        pt["mbl"] = mbl
+        print(f"  [Router] {point_id}: MBL zbudowany przy pierwszym użyciu "
+              f"({(time.perf_counter() - t0) * 1000:.1f} ms)")
+        for cb in self.on_built:
+            cb(point_id, mbl)
+        return mbl
 
     def enable(self, point_id, en):
         """Włącza/wyłącza MBL w danym punkcie."""
-        pt = self._points.get(point_id)
-        if pt:
-            pt["mbl"].set_enabled(en)
+        mbl = self.get(point_id) if en else self.peek(point_id)
+        if mbl:
+            mbl.set_enabled(en)
 
     def enable_all(self, en):
         """Włącza/wyłącza wszystkie punkty jednocześnie."""
-        for pt in self._points.values():
-            pt["mbl"].set_enabled(en)
+        for pid in self._points:
+            self.enable(pid, en)
 
     def get(self, point_id):
-        """Zwraca instancję MultibandLimiter dla danego punktu."""
+        """Zwraca instancję MultibandLimiter dla danego punktu (buduje leniwy)."""
+        pt = self._points.get(point_id)
+        if not pt:
+            return None
+        return pt["mbl"] or self._build(point_id, pt)
+
+    def peek(self, point_id):
+        """Jak get(), ale None dla jeszcze niezbudowanego punktu."""
         pt = self._points.get(point_id)
         return pt["mbl"] if pt else None
 
+    def built_points(self):
+        return [pid for pid, pt in self._points.items() if pt["mbl"]]
+
     def active_points(self):
         """Zwraca listę aktywnych (wstrzykniętych) punktów."""
         return [pid for pid, pt in self._points.items()
-                if pt["mbl"]._injected]
+                if pt["mbl"] and pt["mbl"]._injected]
 
     def registered_points(self):
         return list(self._points.keys())
@@ -2694,14 +2804,82 @@ class EqualizerWidget(QGroupBox):
 # więc wszystkie tryby budujemy z dostępnych prymitywów.
 
 
+# ============================================================================
+# ZWROTNICA LINKWITZ-RILEY — topologia "lr_tree" dla MultibandLimiter
+# ============================================================================
+# "fanout"  — tee → N × pełne pasmo → audiocheblimit (pasma środkowe: HP → LP);
+#             8 filtrów Czebyszewa, suma pasm w mikserze nie jest płaska
+# "lr_tree" — drzewo podziałów: tee → LR4 LP | LR4 HP → kolejne podziały.
+#             LR4 = 2 × sekcja Butterwortha Q=1/√2 w jednym audioiirfilter.
+#             LP+HP jednego podziału sumuje się do allpassu 2. rzędu, więc
+#             gałąź, która nie przechodzi przez dany podział, dostaje ten
+#             allpass (kompensacja) — suma pasm ma |H| = 1.
+#             Allpass kompensacji jest wliczony we współczynniki filtra
+#             podziału gałęzi (splot b i a), a nie osobnym elementem: jeden
+#             audioiirfilter na gałąź podziału, 8 przebiegów jak fanout.
+#             Suma płaska do ~0.001 dB (float64, filtr rzędu 6–8 w DF).
+# Współczynniki liczone w numpy dla FX_RATE (tor MBL jest zawsze w FX_CAPS).
+
+MBL_TOPOLOGIES = ("fanout", "lr_tree")
+# Domyślnie fanout — lr_tree ma tyle samo przebiegów filtrów (8), ale podziały
+# liczą szeregowo w wątku upstream toru, a nie w kolejkach pasm; włączać per
+# punkt (tu albo LimiterRouter.set_topology) gdy płaska suma pasm jest ważniejsza
+MBL_TOPOLOGY   = {"INPUT": "fanout", "POST_EQ": "fanout", "POST_FX": "fanout"}
+
+
+def _bw2(fc, fs):
+    """Sekcja Butterwortha 2. rzędu (bilinear): (b_lp, b_hp, a)."""
+    k = math.tan(math.pi * fc / fs)
+    q = 1.0 / math.sqrt(2.0)
+    n = 1.0 / (1.0 + k / q + k * k)
+    a = np.array([1.0, 2.0 * (k * k - 1.0) * n, (1.0 - k / q + k * k) * n])
+    return np.array([k * k * n, 2.0 * k * k * n, k * k * n]), np.array([n, -2.0 * n, n]), a
+
+
+def lr4_coeffs(fc, kind, fs=FX_RATE):
+    """(b, a) LR4 dla kind 'lp' / 'hp' — kwadrat sekcji Butterwortha."""
+    lp, hp, a = _bw2(fc, fs)
+    b = lp if kind == "lp" else hp
+    return np.convolve(b, b), np.convolve(a, a)
+
+
+def lr4_allpass(fcs, fs=FX_RATE):
+    """(b, a) allpass = LP+HP podziałów LR4 na częstotliwościach fcs (kaskada)."""
+    b, a = np.ones(1), np.ones(1)
+    for fc in fcs:
+        den = _bw2(fc, fs)[2]
+        b, a = np.convolve(b, den[::-1]), np.convolve(a, den)
+    return b, a
+
+
+def lr_tree_plan(lo, hi, xs):
+    """
+    Drzewo podziałów dla pasm lo..hi: (fc, (lo_plan, comp_lo), (hi_plan, comp_hi))
+    albo indeks pasma dla liścia. xs[j] rozdziela pasmo j i j+1; comp_* to
+    podziały drugiej gałęzi, które trzeba skompensować allpassem.
+    """
+    if lo == hi:
+        return lo
+    k = (lo + hi) // 2
+    return (xs[k], (lr_tree_plan(lo, k, xs), xs[k + 1:hi]),
+                   (lr_tree_plan(k + 1, hi, xs), xs[lo:k]))
+
+
+def crossover_points(bands_cfg):
+    """Częstotliwości podziału z MBLIMIT_BANDS (górna granica każdego pasma poza ostatnim)."""
+    return [float(cfg["f_hi"]) for cfg in bands_cfg[:-1]]
+
+
 class BandLimiterNode:
     """
     Samowystarczalny węzeł limitera jednopasmowego.
     Można go wstrzyknąć między dowolne dwa elementy GST w pipeline.
 
     Wewnętrzna struktura jednej instancji:
-        [sink_pad] → audioconvert → filtr_pasmowy → audiodynamic(limiter)
-                   → level → audioconvert → [src_pad]
+        [sink_pad] → caps(FX_FORMAT) → filtr_pasmowy → audiodynamic(limiter)
+                   → level → [src_pad]
+    W torze FX format jest już przypięty (FX_CAPS) — audioconvert na wejściu
+    i wyjściu powstaje tylko z convert=True (punkt poza torem FX).
 
     Użycie:
         node = BandLimiterNode(pipeline, "band0", band_cfg, bus_callback)
@@ -2712,12 +2890,13 @@ class BandLimiterNode:
         # node.peak_db, node.rms_db aktualizowane przez callback
     """
 
-    def __init__(self, pipeline, name, band_cfg, on_level=None):
+    def __init__(self, pipeline, name, band_cfg, on_level=None, convert=False):
         """
         pipeline  — Gst.Pipeline do którego należą elementy
         name      — unikalna nazwa (prefix dla elementów GST)
         band_cfg  — słownik z MBLIMIT_BANDS[i]
         on_level  — callback(node, rms_db, peak_db) wywoływany z GST bus
+        convert   — audioconvert na wejściu/wyjściu (gdy upstream nie jest w FX_CAPS)
         """
         self.pipeline   = pipeline
         self.name       = name
@@ -2736,11 +2915,11 @@ class BandLimiterNode:
 
         # Buduj elementy GST
         n = name
-        self._conv_in  = self._mk("audioconvert",  f"{n}_conv_in")
-        # Caps filter wymusza F32LE przez cały łańcuch pasm
+        self._conv_in  = self._mk("audioconvert",  f"{n}_conv_in") if convert else None
+        # Caps filter wymusza FX_FORMAT przez cały łańcuch pasm
         # Eliminuje trzeszczenie z re-negocjacji formatu między audiocheblimit/audiodynamic
         self._caps_f32 = self._mk_caps(f"{n}_capsf32",
-            "audio/x-raw,format=F32LE")
+            f"audio/x-raw,format={FX_FORMAT}")
         self._filter   = self._build_filter(band_cfg, n)
         self._limiter  = self._mk("audiodynamic",  f"{n}_limiter", {
             "characteristics": "hard-knee",
@@ -2754,9 +2933,10 @@ class BandLimiterNode:
             "peak-falloff":    20.0,
             "post-messages":   True,
         })
-        # conv_out usunięty — mixer po stronie MultibandLimiter robi własną konwersję
-        # Zachowujemy dla kompatybilności z _all_els() i inject/eject
-        self._conv_out = self._mk("audioconvert",  f"{n}_conv_out")
+        self._conv_out = self._mk("audioconvert",  f"{n}_conv_out") if convert else None
+        # Pierwszy / ostatni element węzła — do nich linkuje inject/eject i MBL
+        self._head = self._conv_in  or self._caps_f32
+        self._tail = self._conv_out or self._level
 
         # Dodaj do pipeline
         for el in [self._conv_in, self._caps_f32, self._filter, self._limiter,
@@ -2787,6 +2967,9 @@ class BandLimiterNode:
     def _build_filter(self, cfg, prefix):
         """Tworzy odpowiedni filtr pasmowy zależnie od typu pasma."""
         ftype = cfg["filter"]
+        if ftype == "flat":
+            # Pasmo wydzielone już przez zwrotnicę MBL (lr_tree) — bez filtra
+            return None
         if ftype == "lo":
             # Low-pass — przepuszcza tylko niskie
             return self._mk("audiocheblimit", f"{prefix}_filt", {
@@ -2814,7 +2997,7 @@ class BandLimiterNode:
 
     def _link_internal(self):
         """Łączy elementy wewnątrz węzła.
-        conv_in → caps_f32(F32LE) → [hi_pass →] filter → limiter → level → conv_out
+        [conv_in →] caps_f32 → [hi_pass →] filter → limiter → level [→ conv_out]
         caps_f32 wymusza format przed filtrem — eliminuje trzeszczenie.
         """
         def lnk(a, b):
@@ -2823,7 +3006,7 @@ class BandLimiterNode:
                     print(f"  [BandLimiter:{self.name}] link fail: "
                           f"{a.get_name()}→{b.get_name()}")
 
-        # conv_in → F32LE
+        # [conv_in →] FX_FORMAT
         lnk(self._conv_in, self._caps_f32)
 
         hi = getattr(self, "_band_hi", None)
@@ -2833,7 +3016,8 @@ class BandLimiterNode:
             lnk(hi, self._filter)   # _filter = lo_pass
         else:
             # lo/hi: caps_f32 → filtr → limiter → level → conv_out
-            lnk(self._caps_f32, self._filter)
+            # flat (lr_tree): caps_f32 → limiter
+            lnk(self._caps_f32, self._filter or self._limiter)
 
         lnk(self._filter, self._limiter)
         lnk(self._limiter, self._level)
@@ -2859,11 +3043,11 @@ class BandLimiterNode:
             if peer and peer.get_parent() == downstream_el:
                 sp.unlink(peer)
 
-        # Podłącz: upstream → conv_in ... conv_out → downstream
-        if not upstream_el.link(self._conv_in):
-            print(f"  [BandLimiter:{self.name}] inject: upstream→conv_in FAIL")
-        if not self._conv_out.link(downstream_el):
-            print(f"  [BandLimiter:{self.name}] inject: conv_out→downstream FAIL")
+        # Podłącz: upstream → head ... tail → downstream
+        if not upstream_el.link(self._head):
+            print(f"  [BandLimiter:{self.name}] inject: upstream→head FAIL")
+        if not self._tail.link(downstream_el):
+            print(f"  [BandLimiter:{self.name}] inject: tail→downstream FAIL")
 
         # Synchronizuj stan z pipeline
         for el in self._all_els():
@@ -2888,11 +3072,11 @@ class BandLimiterNode:
         if sp and sp.is_linked():
             peer = sp.get_peer(); peer and sp.unlink(peer)
 
-        sk = self._conv_in.get_static_pad("sink")
+        sk = self._head.get_static_pad("sink")
         if sk and sk.is_linked():
             peer = sk.get_peer(); peer and peer.unlink(sk)
 
-        sp2 = self._conv_out.get_static_pad("src")
+        sp2 = self._tail.get_static_pad("src")
         if sp2 and sp2.is_linked():
             peer = sp2.get_peer(); peer and sp2.unlink(peer)
 
@@ -2910,7 +3094,7 @@ class BandLimiterNode:
     def _all_els(self):
         els = [self._conv_in, self._caps_f32, self._filter, self._limiter, self._level, self._conv_out]
         hi = getattr(self, "_band_hi", None)
-        if hi: els.insert(1, hi)
+        if hi: els.insert(2, hi)
         return [e for e in els if e]
 
     # ── Kontrola parametrów ─────────────────────────────────────────────────
@@ -2943,8 +3127,13 @@ class BandLimiterNode:
         Zachowujemy osobno L i R dla poprawnego pomiaru stereo.
         """
         try:
-            rms_arr  = structure.get_value("rms")
-            peak_arr = structure.get_value("peak")
+            self.update_levels(structure.get_value("rms"), structure.get_value("peak"))
+        except Exception:
+            pass   # ciche — nie zaśmiecaj konsoli per każdą ramkę
+
+    def update_levels(self, rms_arr, peak_arr):
+        """rms/peak jako listy dB per kanał (BusDispatcher podaje już sparsowane)."""
+        try:
             # rms_arr/peak_arr to listy dB per kanał: [L_db, R_db]
             if rms_arr and len(rms_arr) >= 1:
                 self.rms_db   = max(rms_arr)           # ogólny (do AutoLevels)
@@ -2960,17 +3149,56 @@ class BandLimiterNode:
             pass   # ciche — nie zaśmiecaj konsoli per każdą ramkę
 
 
+# AutoInsert / AutoLevels w wątku streamingu — pad probe BUFFER + numpy,
+# bez timerów Qt i bez dodatkowych elementów level:
+#   AutoInsert — prawdziwe RMS bloku na wejściu punktu (srcpad upstream),
+#                włączenie powyżej progu, wyłączenie poniżej progu − AI_HYST_DB;
+#                hold / release / cooldown liczone w czasie strumienia
+#   AutoLevels — szczyt pasma przed limiterem (sinkpad audiodynamic),
+#                krok EMA progu co AL_WINDOW_MS strumienia
+AI_HYST_DB     = 13.0
+AI_HOLD_MS     = 200
+AI_RELEASE_MS  = 1000
+AI_COOLDOWN_MS = 2000
+AL_WINDOW_MS   = 200
+
+
+def block_levels(buf, channels=2):
+    """
+    (średni kwadrat, szczyt liniowy, długość ms) bufora F32 interleaved —
+    max po kanałach. None gdy bufor pusty / nie da się zmapować.
+    """
+    ok, info = buf.map(Gst.MapFlags.READ)
+    if not ok:
+        return None
+    try:
+        x = np.frombuffer(info.data, dtype=np.float32)
+        n = x.size - x.size % channels
+        if not n:
+            return None
+        x = x[:n].reshape(-1, channels)
+        ms = float(np.einsum("ij,ij->j", x, x).max()) / x.shape[0]
+        pk = float(np.abs(x).max())
+    finally:
+        buf.unmap(info)
+    return ms, pk, x.shape[0] * 1000.0 / FX_RATE
+
+
 class MultibandLimiter:
     """
     Zarządca N instancji BandLimiterNode.
     Wstrzykuje wszystkie między tymi samymi dwoma węzłami pipeline
     przez tee → [node0, node1, ...] → audiomixer.
 
-    Schemat:
+    Schemat (topology="fanout"):
         upstream → tee → queue → BandNode0 → mixer
                        → queue → BandNode1 → mixer
                        → ...                       → downstream
 
+    topology="lr_tree": tee → drzewo podziałów LR4 (lr_tree_plan) → queue
+    → BandNode bez filtra → mixer; suma pasm płaska. Wybór per punkt
+    LimiterRouter: MBL_TOPOLOGY.
+
     Użycie:
         mbl = MultibandLimiter(pipeline, "mbl_main", MBLIMIT_BANDS)
         mbl.inject(sp_echo, conv_out)
@@ -2980,7 +3208,8 @@ class MultibandLimiter:
         # z on_bus: mbl.handle_bus_message(structure)
     """
 
-    def __init__(self, pipeline, name_prefix, bands_cfg, on_level=None):
+    def __init__(self, pipeline, name_prefix, bands_cfg, on_level=None, convert=False,
+                 topology="fanout"):
         self.pipeline     = pipeline
         self.prefix       = name_prefix
         self.on_level     = on_level
@@ -2988,17 +3217,24 @@ class MultibandLimiter:
         self._injected    = False
         self._upstream    = None
         self._downstream  = None
+        self._switch      = None   # LimiterSwitch — gdy punkt wpięty na stałe
+        self._branch      = "mbl"
 
-        # AutoInsert state
+        # AutoInsert state (liczniki w ms czasu strumienia — pisze tylko wątek streamingu)
         self._autoinsert_en     = False
         self._user_forced       = False   # True = użytkownik ręcznie ustawił stan, AI nie nadpisuje
         self._ai_owns_inject    = False   # True = AI samo wstrzyknęło, może sam wysunąć
         self._ai_threshold_db   = -12.0
-        self._ai_hold_frames    = 4
-        self._ai_release_frames = 20
-        self._ai_above_frames   = 0
-        self._ai_below_frames   = 0
+        self._ai_hold_ms        = AI_HOLD_MS
+        self._ai_release_ms     = AI_RELEASE_MS
+        self._ai_above_ms       = 0.0
+        self._ai_below_ms       = 0.0
+        self._ai_since_ms       = 0.0     # od ostatniego przełączenia (cooldown)
+        self._ai_pending        = None    # decyzja czekająca na pętlę główną (relink)
+        self._ai_rms_db         = -80.0
         self._on_ai_state       = None
+        self._probes            = {}      # klucz -> (pad, id probe)
+        self.ctl_stats          = {"blocks": 0, "us": 0.0, "switches": 0}
 
         # AutoLevels state
         self._autolevels_en = False
@@ -3015,56 +3251,97 @@ class MultibandLimiter:
         if self._mixer:
             try: self._mixer.set_property("output-buffer-duration", 10_000_000)
             except: pass
-        # caps_out po mikserze — stabilizuje format F32LE przed conv
+        # caps_out po mikserze — stabilizuje format FX_FORMAT na wyjściu MBL
         self._caps_out = Gst.ElementFactory.make("capsfilter", f"{name_prefix}_caps_out")
         if self._caps_out:
-            self._caps_out.set_property("caps", Gst.Caps.from_string("audio/x-raw,format=F32LE"))
-        self._conv  = Gst.ElementFactory.make("audioconvert", f"{name_prefix}_conv")
+            self._caps_out.set_property("caps", Gst.Caps.from_string(f"audio/x-raw,format={FX_FORMAT}"))
+        # conv tylko poza torem FX_CAPS — w torze FX caps_out jest ostatnim elementem
+        self._conv  = Gst.ElementFactory.make("audioconvert", f"{name_prefix}_conv") if convert else None
+        self._tail  = self._conv or self._caps_out or self._mixer
         for el in [self._tee, self._mixer, self._caps_out, self._conv]:
             if el: pipeline.add(el)
 
         # Kolejki między tee a każdym węzłem (tee wymaga queue)
         self._queues = []
         for i in range(len(bands_cfg)):
-            q = Gst.ElementFactory.make("queue", f"{name_prefix}_q{i}")
+            q = mkgst("queue", f"{name_prefix}_q{i}", QUEUE_PROFILES["mbl"])
             if q:
-                q.set_property("max-size-buffers", 4)
-                q.set_property("max-size-time", 0)
-                q.set_property("max-size-bytes", 0)
                 pipeline.add(q)
             self._queues.append(q)
 
+        # lr_tree: pasma wydziela zwrotnica LR4 przed kolejkami, węzły bez filtrów
+        if topology == "lr_tree" and not Gst.ElementFactory.find("audioiirfilter"):
+            print(f"  [MBL:{name_prefix}] brak audioiirfilter — topologia fanout")
+            topology = "fanout"
+        self.topology = topology
+        self._xover   = []
+
         # Utwórz węzły BandLimiterNode
         self.nodes = []
         for i, cfg in enumerate(bands_cfg):
             node = BandLimiterNode(
                 pipeline  = pipeline,
                 name      = f"{name_prefix}_b{i}",
-                band_cfg  = cfg,
+                band_cfg  = dict(cfg, filter="flat") if topology == "lr_tree" else cfg,
                 on_level  = self._on_node_level,
+                convert   = convert,
             )
             self.nodes.append(node)
 
-        # Połącz wewnętrznie: tee→queue[i]→node[i].conv_in ... node[i].conv_out→mixer
+        if topology == "lr_tree" and self._tee:
+            self._build_xover(self._tee, lr_tree_plan(0, len(bands_cfg) - 1,
+                                                      crossover_points(bands_cfg)))
+
+        # Połącz wewnętrznie: tee→queue[i]→node[i].head ... node[i].tail→mixer
         for i, (q, node) in enumerate(zip(self._queues, self.nodes)):
-            if q and self._tee:
+            if q and self._tee and topology == "fanout":
                 if not self._tee.link(q):
                     print(f"  [MBL] tee→q{i} fail")
-            if q and node._conv_in:
-                if not q.link(node._conv_in):
+            if q and node._head:
+                if not q.link(node._head):
                     print(f"  [MBL] q{i}→node fail")
             # node ma już połączone wewnętrzne elementy
-            # podłącz conv_out węzła → mixer
-            if node._conv_out and self._mixer:
-                if not node._conv_out.link(self._mixer):
+            # podłącz tail węzła → mixer
+            if node._tail and self._mixer:
+                if not node._tail.link(self._mixer):
                     print(f"  [MBL] node{i}→mixer fail")
 
-        # mixer → caps_out → conv → downstream
-        if self._mixer and self._caps_out and self._conv:
-            self._mixer.link(self._caps_out)
-            self._caps_out.link(self._conv)
-        elif self._mixer and self._conv:
-            self._mixer.link(self._conv)
+        # mixer → caps_out [→ conv] → downstream
+        prev = self._mixer
+        for el in (self._caps_out, self._conv):
+            if prev and el:
+                prev.link(el); prev = el
+
+    def _build_xover(self, up, plan, tag=""):
+        """
+        Rozwija lr_tree_plan od elementu up. Podział: tee → LR4 LP/HP
+        (z wliczonym allpassem kompensacji) → poddrzewo. Liść linkuje do kolejki pasma —
+        każda ścieżka z tee kończy się na queue, więc tee nigdy nie czeka
+        na mikser. Filtry podziałów liczą w wątku upstream, pasma w kolejkach.
+        """
+        if isinstance(plan, int):
+            q = self._queues[plan]
+            if q and not up.link(q):
+                print(f"  [MBL] xover{tag}→q{plan} fail")
+            return
+        fc, *branches = plan
+        tee = up
+        if tag:   # korzeń używa self._tee
+            tee = mkgst("tee", f"{self.prefix}_x{tag}_tee")
+            self.pipeline.add(tee); self._xover.append(tee)
+            up.link(tee)
+        for side, (sub, comp) in zip(("l", "h"), branches):
+            prev = tee
+            b, a = lr4_coeffs(fc, "lp" if side == "l" else "hp")
+            if comp:
+                bc, ac = lr4_allpass(comp)
+                b, a = np.convolve(b, bc), np.convolve(a, ac)
+            el = mkgst("audioiirfilter", f"{self.prefix}_x{tag}{side}",
+                       {"b": [float(v) for v in b], "a": [float(v) for v in a]})
+            if el:
+                self.pipeline.add(el); self._xover.append(el)
+                prev.link(el); prev = el
+            self._build_xover(prev, sub, tag + side)
 
     def set_enabled(self, en, _from_autoinsert=False):
         # _injected jest jedynym source of truth — enabled jest tylko alias
@@ -3089,6 +3366,13 @@ class MultibandLimiter:
             return   # już wstrzyknięty — ignoruj
         self._upstream   = upstream_el
         self._downstream = downstream_el
+        if self._switch:
+            # Tor wpięty na stałe — tylko crossfade na gałąź MBL
+            self._switch.select(self._branch)
+            self._injected = True
+            self.enabled   = True
+            print(f"  [MBL:{self.prefix}] włączony (switch, crossfade {MBL_XFADE_MS} ms)")
+            return
 
         # Odepnij bezpośrednie połączenie upstream→downstream
         sp = upstream_el.get_static_pad("src")
@@ -3100,8 +3384,8 @@ class MultibandLimiter:
             print(f"  [MBL] upstream→tee FAIL")
             upstream_el.link(downstream_el)   # przywróć
             return
-        if not self._conv.link(downstream_el):
-            print(f"  [MBL] conv→downstream FAIL")
+        if not self._tail.link(downstream_el):
+            print(f"  [MBL] tail→downstream FAIL")
             upstream_el.unlink(self._tee)
             upstream_el.link(downstream_el)   # przywróć
             return
@@ -3117,6 +3401,12 @@ class MultibandLimiter:
     def eject(self):
         if not self._injected:
             return
+        if self._switch:
+            self._switch.release(self._branch)
+            self._injected = False
+            self.enabled   = False
+            print(f"  [MBL:{self.prefix}] wyłączony (switch, crossfade {MBL_XFADE_MS} ms)")
+            return
         print(f"  [MBL:{self.prefix}] eject called")
         up, dn = self._upstream, self._downstream
 
@@ -3128,7 +3418,7 @@ class MultibandLimiter:
             p = sp.get_peer()
             if p: sp.unlink(p)
 
-        sp2 = self._conv.get_static_pad("src")
+        sp2 = self._tail.get_static_pad("src")
         if sp2 and sp2.is_linked():
             p = sp2.get_peer()
             if p: sp2.unlink(p)
@@ -3153,100 +3443,127 @@ class MultibandLimiter:
         if self._mixer:    els.append(self._mixer)
         if hasattr(self, "_caps_out") and self._caps_out: els.append(self._caps_out)
         if self._conv:     els.append(self._conv)
+        els.extend(self._xover)
         for n in self.nodes:
             els.extend(n._all_els())
         return els
 
     # ── AutoInsert — automatyczne wstrzyknięcie gdy sygnał przekracza próg ───
 
-    def tick_autoinsert(self, rms):
-        # Nie rób nic jeśli AutoInsert nie jest włączony
-        if not self._autoinsert_en:
-            return
-
-        # Inicjalizacja zmiennych dla cooldownu (wykona się tylko raz)
-        if not hasattr(self, '_last_toggle_time'):
-            self._last_toggle_time = time.time()  # cooldown aktywny od razu przy starcie
-            self._cooldown_seconds = 2.0  # Wtyczka nie zmieni stanu częściej niż co 2 sekundy
-
-        now = time.time()
-        
-        # Jeśli jesteśmy w okresie blokady (cooldown), nie rób nic
-        if (now - self._last_toggle_time) < self._cooldown_seconds:
+    def _set_probe(self, key, pad, cb=None, data=None):
+        """Zdejmuje probe spod klucza; z cb zakłada nowy BUFFER probe na pad."""
+        old = self._probes.pop(key, None)
+        if old:
+            old[0].remove_probe(old[1])
+        if pad is not None and cb is not None:
+            self._probes[key] = (pad, pad.add_probe(Gst.PadProbeType.BUFFER, cb, data))
+
+    def _ai_probe(self, pad, info, _data):
+        """Wątek streamingu wejścia punktu: RMS bloku → _ai_step."""
+        t0 = time.perf_counter()
+        lv = block_levels(info.get_buffer())
+        if lv is not None:
+            self._ai_step(10.0 * math.log10(lv[0] + 1e-12), lv[2])
+        st = self.ctl_stats
+        st["blocks"] += 1; st["us"] += (time.perf_counter() - t0) * 1e6
+        return Gst.PadProbeReturn.OK
+
+    def _ai_step(self, rms_db, dt_ms):
+        """
+        Histereza AutoInsert na jednym bloku. Próg on = _ai_threshold_db,
+        off = on − AI_HYST_DB; stan musi trwać hold / release ms strumienia,
+        a między przełączeniami mija AI_COOLDOWN_MS.
+        """
+        self._ai_rms_db = rms_db
+        self._ai_since_ms += dt_ms
+        if rms_db > self._ai_threshold_db:
+            self._ai_above_ms += dt_ms; self._ai_below_ms = 0.0
+        elif rms_db < self._ai_threshold_db - AI_HYST_DB:
+            self._ai_below_ms += dt_ms; self._ai_above_ms = 0.0
+        else:
+            self._ai_above_ms = self._ai_below_ms = 0.0
+        if self._ai_pending is not None or self._ai_since_ms < AI_COOLDOWN_MS:
             return
-
-        # Ustalenie histerezy - DOSTOSUJ TE WARTOŚCI DO SWOJEGO PROGRAMU
-        # threshold_on to próg włączenia (np. sygnał wyższy niż -12 dB)
-        # threshold_off to próg wyłączenia (np. sygnał niższy niż -25 dB)
-        threshold_on = -12.0  
-        threshold_off = -25.0 
-
-        is_enabled = self.enabled  # odczyt aktualnego stanu
-
-        if rms > threshold_on and not is_enabled:
-            self._ai_owns_inject = True
-            self.set_enabled(True, _from_autoinsert=True)
-            self._last_toggle_time = now
-        elif rms < threshold_off and is_enabled and self._ai_owns_inject:
-            # AI ejectuje tylko to co sam wstrzyknął — nie nadpisuje ręcznego stanu
-            self._ai_owns_inject = False
-            self.set_enabled(False, _from_autoinsert=True)
-            self._last_toggle_time = now
-
-    def set_autoinsert(self, en, threshold_db=-12.0, hold_frames=4,
-                       release_frames=20, on_state=None):
+        if not self.enabled and self._ai_above_ms >= self._ai_hold_ms:
+            self._ai_request(True)
+        elif self.enabled and self._ai_owns_inject and self._ai_below_ms >= self._ai_release_ms:
+            self._ai_request(False)
+
+    def _ai_request(self, on):
+        self._ai_since_ms = self._ai_above_ms = self._ai_below_ms = 0.0
+        self._ai_pending = on
+        # Relink zmienia stany elementów, switch — timeouty GLib i krzywe
+        # GstController: jedno i drugie tylko z pętli głównej
+        GLib.idle_add(self._ai_apply, on)
+
+    def _ai_apply(self, on):
+        self._ai_pending = None
+        if not self._autoinsert_en or (not on and not self._ai_owns_inject):
+            return False
+        # AI ejectuje tylko to co sam wstrzyknął — nie nadpisuje ręcznego stanu
+        self._ai_owns_inject = on
+        self.set_enabled(on, _from_autoinsert=True)
+        self.ctl_stats["switches"] += 1
+        if self._on_ai_state:
+            self._on_ai_state(self._injected)
+        return False
+
+    def set_autoinsert(self, en, threshold_db=-12.0, hold_ms=AI_HOLD_MS,
+                       release_ms=AI_RELEASE_MS, on_state=None):
         """
         Konfiguruje tryb AutoInsert.
-        en             — włącz/wyłącz automatykę
-        threshold_db   — próg RMS w dB powyżej którego MBL się włącza (-20..-6)
-        hold_frames    — ile ramek powyżej progu zanim włączy (debounce)
-        release_frames — ile ramek poniżej progu zanim wyłączy
-        on_state       — callback(active: bool) dla UI
+        en           — włącz/wyłącz automatykę (probe na srcpadzie upstream punktu)
+        threshold_db — próg RMS w dB powyżej którego MBL się włącza (-40..-3)
+        hold_ms      — jak długo (czas strumienia) powyżej progu zanim włączy
+        release_ms   — jak długo poniżej progu − AI_HYST_DB zanim wyłączy
+        on_state     — callback(active: bool), wołany z wątku streamingu lub GLib
         """
         self._autoinsert_en      = en
         if en:
             self._user_forced = False    # AI przejmuje kontrolę
             self._ai_owns_inject = False # zresetuj — AI zacznie od nowa
         self._ai_threshold_db    = threshold_db
-        self._ai_hold_frames     = hold_frames
-        self._ai_release_frames  = release_frames
+        self._ai_hold_ms         = hold_ms
+        self._ai_release_ms      = release_ms
         self._on_ai_state        = on_state
-        self._ai_above_frames    = 0
-        self._ai_below_frames    = 0
+        self._ai_above_ms = self._ai_below_ms = self._ai_since_ms = 0.0
+        self._ai_pending         = None
+        up = self._upstream.get_static_pad("src") if self._upstream else None
+        self._set_probe("ai", up, self._ai_probe if en else None)
+        if en and up is None:
+            print(f"  [MBL:{self.prefix}] AutoInsert: brak punktu upstream — nic nie mierzy")
         if not en and self._injected:
             self.set_enabled(False)
 
+    def set_ai_threshold(self, threshold_db):
+        """Zmiana progu bez resetu stanu AutoInsert."""
+        self._ai_threshold_db = float(threshold_db)
+
     # ── AutoLevels — automatyczne dostosowanie threshold per pasmo ───────────
 
-    def tick_autolevels(self):
+    def _al_probe(self, pad, info, i):
         """
-        Tryb AutoLevels: analizuje zmierzone poziomy RMS per pasmo
-        i automatycznie przesuwa threshold każdego limitera tak, żeby
-        gain reduction był stabilny i proporcjonalny do konfiguracji.
-
-        Algorytm:
-        - Cel: threshold = measured_peak * target_headroom
-        - Zmiana threshold jest wygładzona (EMA z alpha=0.05)
-        - Bounds: zawsze w zakresie [min_thr, max_thr] per pasmo
-
-        Wywołuj co ~200ms (wolniejszy cykl niż AutoInsert).
+        Wątek pasma i: szczyt przed limiterem zbierany przez AL_WINDOW_MS
+        strumienia, potem krok EMA progu:
+            threshold += alpha * (clamp(peak * headroom) − threshold)
         """
-        if not self._autolevels_en:
-            return
-        for i, node in enumerate(self.nodes):
-            if node.peak_db <= -79:
-                continue   # brak sygnału w paśmie — pomiń
-            # Zmierz szczytowy poziom (liniowy)
-            peak_lin  = 10 ** (node.peak_db / 20.0)
-            # Cel: threshold powinien być tuż nad szczytem * headroom
-            target_thr = min(1.0, peak_lin * self._al_headroom)
-            target_thr = max(self._al_min_thr, min(self._al_max_thr, target_thr))
-            # Wygładź (EMA)
-            node._al_thr = node._al_thr + self._al_alpha * (target_thr - node._al_thr)
-            node.set_threshold(node._al_thr)
-            # Powiadom UI
-            if self._on_al_update:
-                self._on_al_update(i, node._al_thr)
+        t0 = time.perf_counter()
+        lv = block_levels(info.get_buffer())
+        if lv is not None:
+            win = self._al_win[i]
+            win[0] = max(win[0], lv[1]); win[1] += lv[2]
+            if win[1] >= AL_WINDOW_MS:
+                peak, win[0], win[1] = win[0], 0.0, 0.0
+                if peak > 1e-4:   # brak sygnału w paśmie (< -80 dB) — pomiń
+                    node = self.nodes[i]
+                    target = max(self._al_min_thr, min(self._al_max_thr, peak * self._al_headroom))
+                    node._al_thr = node._al_thr + self._al_alpha * (target - node._al_thr)
+                    node.set_threshold(node._al_thr)
+                    if self._on_al_update:
+                        self._on_al_update(i, node._al_thr)
+        st = self.ctl_stats
+        st["blocks"] += 1; st["us"] += (time.perf_counter() - t0) * 1e6
+        return Gst.PadProbeReturn.OK
 
     def set_autolevels(self, en, headroom=1.05, alpha=0.05,
                        min_thr=0.3, max_thr=0.98, on_update=None):
@@ -3257,7 +3574,7 @@ class MultibandLimiter:
         alpha     — szybkość śledzenia EMA (0.01=wolno .. 0.3=szybko)
         min_thr   — minimalny dopuszczalny threshold (bezpieczeństwo)
         max_thr   — maksymalny threshold (nie relaksuj za bardzo)
-        on_update — callback(band_idx, new_thr) dla aktualizacji suwaków UI
+        on_update — callback(band_idx, new_thr) z wątku pasma (UI przez idle_add)
         """
         self._autolevels_en = en
         self._al_headroom   = headroom
@@ -3265,9 +3582,12 @@ class MultibandLimiter:
         self._al_min_thr    = min_thr
         self._al_max_thr    = max_thr
         self._on_al_update  = on_update
-        # Inicjalizuj stan EMA w węzłach
-        for node in self.nodes:
+        # Inicjalizuj stan EMA w węzłach, okna szczytu i probe na wejściu limiterów
+        self._al_win = [[0.0, 0.0] for _ in self.nodes]
+        for i, node in enumerate(self.nodes):
             node._al_thr = node.band_cfg["threshold"]
+            pad = node._limiter.get_static_pad("sink") if node._limiter else None
+            self._set_probe(f"al{i}", pad, self._al_probe if en else None, i)
 
     def set_band_threshold(self, band_idx, v):
         if 0 <= band_idx < len(self.nodes):
@@ -3277,6 +3597,21 @@ class MultibandLimiter:
         if 0 <= band_idx < len(self.nodes):
             self.nodes[band_idx].set_ratio(v)
 
+    def copy_settings(self, other):
+        """Przejmuje progi/ratio pasm, AutoInsert i AutoLevels od other (przebudowa punktu)."""
+        for i, node in enumerate(other.nodes):
+            if node._limiter:
+                self.set_band_threshold(i, node._limiter.get_property("threshold"))
+                self.set_band_ratio(i, node._limiter.get_property("ratio"))
+        if other._autoinsert_en:
+            self.set_autoinsert(True, other._ai_threshold_db, other._ai_hold_ms,
+                                other._ai_release_ms, other._on_ai_state)
+            self._ai_owns_inject = other._ai_owns_inject
+        if other._autolevels_en:
+            self.set_autolevels(True, other._al_headroom, other._al_alpha,
+                                other._al_min_thr, other._al_max_thr, other._on_al_update)
+        self._user_forced = other._user_forced
+
     def _on_node_level(self, node, rms_db, peak_db):
         if self.on_level:
             idx = next((i for i,n in enumerate(self.nodes) if n is node), -1)
@@ -3330,13 +3665,7 @@ class MultibandLimiterWidget(QGroupBox):
         self.mbl: MultibandLimiter = None
         self._band_widgets = []   # [(thr_sl, rat_sl, meter), ...]
         self._thr_lbls     = []
-        self._overall_rms  = -80.0
-
-        # Timery automatyzacji
-        self._ai_timer = QTimer(); self._ai_timer.setInterval(50)
-        self._ai_timer.timeout.connect(self._ai_tick)
-        self._al_timer = QTimer(); self._al_timer.setInterval(200)
-        self._al_timer.timeout.connect(self._al_tick)
+        # AutoInsert / AutoLevels liczą w wątku streamingu (probe w MultibandLimiter)
 
         self._build()
 
@@ -3355,10 +3684,6 @@ class MultibandLimiterWidget(QGroupBox):
         self._ai_en.clicked.connect(self._toggle_ai)
         self._al_en.clicked.connect(self._toggle_al)
 
-    def update_overall_rms(self, rms_db):
-        """Wywoływane z _spectrum() w głównym oknie — ogólny poziom dla AutoInsert."""
-        self._overall_rms = rms_db
-
     # ── Budowa UI ────────────────────────────────────────────────────────────
 
     def _build(self):
@@ -3404,8 +3729,7 @@ class MultibandLimiterWidget(QGroupBox):
         self._ai_thr_lbl = QLabel("-12 dB"); self._ai_thr_lbl.setFixedWidth(44)
         self._ai_thr_sl.valueChanged.connect(
             lambda v: (self._ai_thr_lbl.setText(f"{v} dB"),
-                       self.mbl and self.mbl._autoinsert_en and
-                       self.mbl.set_autoinsert(True, threshold_db=float(v))))
+                       self.mbl and self.mbl.set_ai_threshold(v)))
         ai_r2.addWidget(self._ai_thr_sl); ai_r2.addWidget(self._ai_thr_lbl)
         ai_v.addLayout(ai_r2)
         root.addWidget(ai_box)
@@ -3505,38 +3829,25 @@ class MultibandLimiterWidget(QGroupBox):
         thr = float(self._ai_thr_sl.value())
         self.mbl.set_autoinsert(en, threshold_db=thr,
                                 on_state=self._on_ai_state_change)
-        if en:
-            self._ai_timer.start()
-        else:
-            self._ai_timer.stop()
+        if not en:
             self._ai_indicator.setText("◯")
             self._ai_indicator.setStyleSheet("color:#444;font-size:14px")
 
     def _toggle_al(self, en):
         if not self.mbl: return
         alpha = self._al_speed_sl.value() / 100.0
+        # on_update przychodzi z wątku pasma — suwaki tylko przez pętlę główną
         self.mbl.set_autolevels(en, alpha=alpha,
-                                on_update=self._on_al_thr_update)
+                                on_update=lambda i, t: GLib.idle_add(self._on_al_thr_update, i, t))
         if en:
-            self._al_timer.start()
             # AutoLevels wymaga żeby MBL był aktywny — włącz tylko jeśli AI nie jest aktywny
-            if not self.mbl._injected and not self._ai_timer.isActive():
+            if not self.mbl._injected and not self.mbl._autoinsert_en:
                 self._en.blockSignals(True)
                 self._en.setChecked(True)
                 self._en.blockSignals(False)
                 self.mbl.set_enabled(True)
                 self._status_lbl.setText("● AKTYWNY")
                 self._status_lbl.setStyleSheet("color:#FF8844;font-size:9px")
-        else:
-            self._al_timer.stop()
-
-    def _ai_tick(self):
-        if self.mbl:
-            self.mbl.tick_autoinsert(self._overall_rms)
-
-    def _al_tick(self):
-        if self.mbl:
-            self.mbl.tick_autolevels()
 
     def _on_ai_state_change(self, active):
         """Callback z AutoInsert — aktualizuje wskaźnik LED."""
@@ -3671,18 +3982,385 @@ class BandMeter(QWidget):
         p.end()
 
 
+# ============================================================================
+# TRUE-PEAK LIMITER — jednoprzebiegowa ochrona wyjścia (typ punktu "tp")
+# ============================================================================
+# Alternatywa dla 5-pasmowego MBL tam, gdzie scena chce tylko nie przesterować
+# wyjścia: jeden element carbontplimit (GstBase.BaseTransform w Pythonie,
+# DSP w numpy — TruePeakCore) zamiast 5 gałęzi filtrów + miksera.
+# Wzmocnienie liczone z nadpróbkowanych szczytów, ale mnożone przy
+# częstotliwości bazowej, przepuszcza do ~0.7 dB ponad sufit (szum pełnopasmowy
+# przy ~15 dB redukcji) — drugi etap (twardy sufit, P próbek wyprzedzenia)
+# dociska resztę gęstszym detektorem, więc true-peak wyjścia ≤ sufit.
+# Element jest w Pythonie w wątku strumienia — sceny wybierają go jawnie
+# ("type": "truepeak"); domyślną ochroną punktów pozostaje MBL.
+
+TP_ELEMENT      = "carbontplimit"
+TP_CEILING_DB   = -1.0     # sufit true-peak (dBTP)
+TP_RELEASE_MS   = 80.0     # powrót wzmocnienia (stała czasowa redukcji w dB)
+TP_LOOKAHEAD_MS = 1.5      # wyprzedzenie = czas narastania redukcji
+TP_OVERSAMPLE   = 4        # nadpróbkowanie detektora (1 = tylko próbki)
+TP_TAPS         = 32       # długość filtra interpolacji na fazę
+TP_CHUNK        = 4096     # blok rekursji release (r^-k bez przepełnienia)
+TP_CLIP_OVERSAMPLE = 16    # detektor twardego sufitu (gęściej niż etap 1)
+TP_CLIP_TAPS    = 64       # jego okno interpolacji
+TP_CLIP_ITERS   = 8        # iteracje twardego sufitu (zwykle 1–2)
+
+
+class TruePeakCore:
+    """
+    Look-ahead limiter true-peak na numpy, bez pętli per próbka:
+      1. detektor — polifazowa interpolacja ×R (okno Hann × sinc, TP_TAPS
+         na fazę) na przesuwnych oknach próbek → szczyt międzypróbkowy
+      2. redukcja a[n] = max(0, TP[dB] − sufit)
+      3. max w oknie L+T+1 i średnia krocząca L+1 — redukcja narasta przez
+         L próbek i jest ≥ a[szczyt] na całym nośniku interpolacji (T próbek
+         wokół szczytu), więc modulacja wzmocnienia nie odtwarza szczytu
+         między próbkami
+      4. release: A[n] = max(m[n], A[n−1]·r) w postaci zamkniętej
+         r^n · cummax(m[k]·r^−k)
+      5. twardy sufit — wyjście etapów 1–4 czeka P próbek (okno TP_CLIP_TAPS
+         + rampa); każde okno, w którym gęstsza interpolacja ×TP_CLIP_OVERSAMPLE
+         przekracza sufit, skaluje swoje próbki o sufit/szczyt (min po oknach,
+         wygładzone), aż true_peak(wyjście) ≤ sufit
+    Audio opóźnione o delay = L + T + P próbek (T = TP_TAPS; zgłaszane jako latencja).
+    """
+
+    clip_delay = TP_CLIP_TAPS + 2 * (TP_CLIP_TAPS // 4)   # P: okno + rampa twardego sufitu
+
+    def __init__(self, rate, channels, ceiling_db=TP_CEILING_DB, release_ms=TP_RELEASE_MS,
+                 lookahead_ms=TP_LOOKAHEAD_MS, oversample=TP_OVERSAMPLE):
+        self.rate, self.channels = int(rate), int(channels)
+        self.ceiling_db, self.release_ms = float(ceiling_db), float(release_ms)
+        self.lookahead_ms, self.oversample = float(lookahead_ms), int(oversample)
+        self.reset()
+
+    def reset(self):
+        t, c = TP_TAPS, self.channels
+        self.la = max(1, int(round(self.lookahead_ms * self.rate / 1000.0)))
+        self.delay = self.la + t + self.clip_delay
+        self._w = self._kernel(self.oversample, t)
+        self._wc = self._clip_kernel()
+        self._fix = np.zeros((TP_CLIP_TAPS - 1, c))      # wysłane (kontekst okien)
+        self._pend = np.zeros((self.clip_delay, c))      # czekające na sufit
+        self._x_hist = np.zeros((t - 1, c))
+        self._a_hist = np.zeros(self.la + t)
+        self._h_hist = np.zeros(self.la)
+        self._dl = np.zeros((self.la + t, c), dtype=np.float32)
+        self._r = math.exp(-1.0 / max(1e-3, self.release_ms / 1000.0 * self.rate))
+        self._A = 0.0
+        self.gr_db = 0.0             # redukcja na końcu ostatniego bloku (dB)
+        self.max_gr_db = 0.0
+        self.clip_hits = 0           # iteracje twardego sufitu (diagnostyka)
+
+    @staticmethod
+    def _kernel(r, t):
+        """(t, r−1): wagi faz k/r dla okna próbek n−t+1..n (środek n−t/2)."""
+        if r <= 1:
+            return np.zeros((t, 0))
+        taps = np.arange(t) - (t // 2 - 1)                 # −t/2+1 .. t/2
+        w = np.empty((t, r - 1))
+        for p in range(1, r):
+            u = p / r - taps
+            w[:, p - 1] = np.sinc(u) * 0.5 * (1.0 + np.cos(np.pi * u / (t / 2)))
+            w[:, p - 1] /= w[:, p - 1].sum()
+        return w
+
+    @classmethod
+    def _clip_kernel(cls):
+        """(TP_CLIP_TAPS, TP_CLIP_OVERSAMPLE): próbka środkowa + fazy pośrednie."""
+        t = TP_CLIP_TAPS
+        centre = np.zeros((t, 1))
+        centre[t // 2 - 1] = 1.0
+        return np.hstack([centre, cls._kernel(TP_CLIP_OVERSAMPLE, t)])
+
+    @classmethod
+    def true_peak(cls, x):
+        """True-peak (liniowo) sygnału x (N, C) detektorem twardego sufitu."""
+        w = cls._clip_kernel()
+        t = w.shape[0]
+        x = np.pad(np.asarray(x, dtype=np.float64).reshape(len(x), -1), ((t - 1, t - 1), (0, 0)))
+        return float(np.abs(np.lib.stride_tricks.sliding_window_view(x, t, axis=0) @ w).max())
+
+    def detect(self, x):
+        """Szczyt (max po kanałach i fazach) na środek okna — (N,)."""
+        t = TP_TAPS
+        ext = np.concatenate([self._x_hist, x])
+        self._x_hist = ext[-(t - 1):]
+        win = np.lib.stride_tricks.sliding_window_view(ext, t, axis=0)   # (N, C, t)
+        pk = np.abs(win[:, :, t // 2 - 1]).max(axis=1)
+        if self._w.shape[1]:
+            pk = np.maximum(pk, np.abs(win @ self._w).max(axis=(1, 2)))
+        return pk
+
+    def _release(self, m):
+        out = np.empty_like(m)
+        r = self._r
+        for s in range(0, m.size, TP_CHUNK):
+            c = m[s:s + TP_CHUNK]
+            k = np.arange(1, c.size + 1)
+            rk = r ** k
+            out[s:s + c.size] = rk * np.maximum(self._A, np.maximum.accumulate(c / rk))
+            self._A = out[s + c.size - 1]
+        return out
+
+    def gain(self, x):
+        """Wzmocnienie (N,) dla bloku x (N, C); aktualizuje stan."""
+        la, hw = self.la, self.la + TP_TAPS
+        a = np.maximum(0.0, 20.0 * np.log10(self.detect(x) + 1e-12) - self.ceiling_db)
+        ext = np.concatenate([self._a_hist, a]); self._a_hist = ext[-hw:]
+        held = np.lib.stride_tricks.sliding_window_view(ext, hw + 1).max(axis=1)
+        ext = np.concatenate([self._h_hist, held]); self._h_hist = ext[-la:]
+        cs = np.concatenate([[0.0], np.cumsum(ext)])
+        red = self._release((cs[la + 1:] - cs[:-la - 1]) / (la + 1))
+        self.gr_db = float(red[-1])
+        self.max_gr_db = max(self.max_gr_db, float(red.max()))
+        return 10.0 ** (-red / 20.0)
+
+    def clip(self, y):
+        """Twardy sufit: y (N, C) → (N, C) opóźnione o P; true-peak ≤ sufit."""
+        t, h, n = TP_CLIP_TAPS, TP_CLIP_TAPS // 4, y.shape[0]
+        f = t - 1
+        buf = np.concatenate([self._fix, self._pend, y])
+        ceil = 10.0 ** (self.ceiling_db / 20.0)
+        aim = ceil * (1.0 - 1e-4)         # poniżej sufitu: zbieżność + zaokrąglenie float32
+        ones = np.ones(t - 1)
+        view = np.lib.stride_tricks.sliding_window_view
+        for _ in range(TP_CLIP_ITERS):
+            pk = np.abs(view(buf, t, axis=0) @ self._wc).max(axis=(1, 2))
+            over = pk > ceil
+            if not over.any():
+                break
+            # min po oknach zawierających próbkę, potem gładko (hold ±h, średnia ±h) —
+            # skok wzmocnienia sam tworzyłby szczyty międzypróbkowe w sąsiednich oknach
+            lg = np.concatenate([ones, np.where(over, aim / np.maximum(pk, 1e-12), 1.0), ones])
+            lg = -np.log(view(lg, t).min(axis=1))
+            lg = view(np.pad(lg, h), 2 * h + 1).max(axis=1)
+            lg = view(np.pad(lg, h), 2 * h + 1).mean(axis=1)
+            buf[f:] *= np.exp(-lg[f:])[:, None]
+            self.clip_hits += 1
+        self._fix = buf[n:n + f]
+        self._pend = buf[f + n:]
+        return buf[f:f + n]
+
+    def process(self, x):
+        """x (N, C) float32 → blok wyjściowy (N, C), opóźniony o self.delay."""
+        if not x.size:
+            return x
+        g = self.gain(x.astype(np.float64))
+        ext = np.concatenate([self._dl, x])
+        self._dl = ext[x.shape[0]:]
+        return self.clip(ext[:x.shape[0]] * g[:, None]).astype(np.float32)
+
+
+class TruePeakLimiterElement(GstBase.BaseTransform):
+    """carbontplimit: in-place, F32 interleaved; latencja = TruePeakCore.delay."""
+
+    __gtype_name__ = "CarbonTruePeakLimiter"
+    __gstmetadata__ = ("CarbonX true-peak limiter", "Filter/Effect/Audio",
+                       "Look-ahead limiter z detekcją true-peak (nadpróbkowanie)", "CarbonX")
+    _caps = Gst.Caps.from_string(f"audio/x-raw,format={FX_FORMAT},layout=interleaved,"
+                                 "rate=[1,2147483647],channels=[1,8]")
+    __gsttemplates__ = (
+        Gst.PadTemplate.new("src",  Gst.PadDirection.SRC,  Gst.PadPresence.ALWAYS, _caps),
+        Gst.PadTemplate.new("sink", Gst.PadDirection.SINK, Gst.PadPresence.ALWAYS, _caps),
+    )
+    __gproperties__ = {
+        "ceiling":    (float, "Ceiling", "Sufit true-peak (dBTP)", -24.0, 0.0,
+                       TP_CEILING_DB, GObject.ParamFlags.READWRITE),
+        "release":    (float, "Release", "Powrót wzmocnienia (ms)", 1.0, 2000.0,
+                       TP_RELEASE_MS, GObject.ParamFlags.READWRITE),
+        "lookahead":  (float, "Look-ahead", "Wyprzedzenie (ms)", 0.1, 20.0,
+                       TP_LOOKAHEAD_MS, GObject.ParamFlags.READWRITE),
+        "oversample": (int, "Oversample", "Nadpróbkowanie detektora", 1, 16,
+                       TP_OVERSAMPLE, GObject.ParamFlags.READWRITE),
+        "reduction":  (float, "Reduction", "Bieżąca redukcja (dB)", 0.0, 200.0,
+                       0.0, GObject.ParamFlags.READABLE),
+    }
+
+    def __init__(self):
+        super().__init__()
+        self._props = {"ceiling": TP_CEILING_DB, "release": TP_RELEASE_MS,
+                       "lookahead": TP_LOOKAHEAD_MS, "oversample": TP_OVERSAMPLE}
+        self.core = None
+
+    def do_get_property(self, prop):
+        if prop.name == "reduction":
+            return self.core.gr_db if self.core else 0.0
+        return self._props[prop.name]
+
+    def do_set_property(self, prop, value):
+        self._props[prop.name] = value
+        core = self.core
+        if core is None:
+            return
+        if prop.name == "ceiling":
+            core.ceiling_db = float(value)
+        elif prop.name == "release":
+            core.release_ms = float(value)
+            core._r = math.exp(-1.0 / max(1e-3, core.release_ms / 1000.0 * core.rate))
+        else:
+            # Zmiana wyprzedzenia / detektora zmienia opóźnienie — nowy stan
+            self.core = self._make_core(core.rate, core.channels)
+            self.post_message(Gst.Message.new_latency(self))
+
+    def _make_core(self, rate, channels):
+        p = self._props
+        return TruePeakCore(rate, channels, p["ceiling"], p["release"],
+                            p["lookahead"], p["oversample"])
+
+    def do_set_caps(self, incaps, outcaps):
+        s = incaps.get_structure(0)
+        ok_r, rate = s.get_int("rate")
+        ok_c, ch = s.get_int("channels")
+        if not (ok_r and ok_c):
+            return False
+        if not self.core or (self.core.rate, self.core.channels) != (rate, ch):
+            self.core = self._make_core(rate, ch)
+        return True
+
+    def do_stop(self):
+        if self.core:
+            self.core.reset()
+        return True
+
+    def do_transform_ip(self, buf):
+        core = self.core
+        if core is None:
+            return Gst.FlowReturn.NOT_NEGOTIATED
+        ok, info = buf.map(Gst.MapFlags.READ | Gst.MapFlags.WRITE)
+        if not ok:
+            return Gst.FlowReturn.ERROR
+        try:
+            # Mapowanie do zapisu daje zapisywalny memoryview — wynik wprost do bufora
+            x = np.frombuffer(info.data, dtype=np.float32).reshape(-1, core.channels)
+            x[:] = core.process(x)
+        finally:
+            buf.unmap(info)
+        return Gst.FlowReturn.OK
+
+    def do_query(self, direction, query):
+        res = GstBase.BaseTransform.do_query(self, direction, query)
+        if res and query.type == Gst.QueryType.LATENCY and self.core:
+            live, lo, hi = query.parse_latency()
+            lat = self.core.delay * Gst.SECOND // self.core.rate
+            query.set_latency(live, lo + lat, hi + lat if hi != Gst.CLOCK_TIME_NONE else hi)
+        return res
+
+
+def register_truepeak():
+    """Rejestruje carbontplimit w rejestrze GStreamera (raz); False gdy się nie da."""
+    if Gst.ElementFactory.find(TP_ELEMENT):
+        return True
+    try:
+        return Gst.Element.register(None, TP_ELEMENT, Gst.Rank.NONE, TruePeakLimiterElement)
+    except Exception as e:
+        print(f"  [TruePeak] rejestracja {TP_ELEMENT} FAIL: {e}")
+        return False
+
+
+class TruePeakLimiter:
+    """
+    Punkt LimiterRouter typu "tp": jeden carbontplimit między upstream a
+    downstream. Interfejs jak MultibandLimiter w zakresie, którego używają
+    router, LimiterSwitch i resolver (inject / eject / set_enabled /
+    _injected / _all_els / _tee / _tail); bez pasm, AutoInsert i AutoLevels.
+    """
+
+    topology = "truepeak"
+
+    def __init__(self, pipeline, name_prefix, ceiling_db=TP_CEILING_DB, release_ms=TP_RELEASE_MS):
+        self.pipeline    = pipeline
+        self.prefix      = name_prefix
+        self.enabled     = False
+        self._injected   = False
+        self._upstream   = None
+        self._downstream = None
+        self._switch     = None
+        self._branch     = "tp"
+        self._autoinsert_en = False
+        self.nodes       = []
+        self._queues     = []
+        self.ctl_stats   = {"blocks": 0, "us": 0.0, "switches": 0}
+        self.ceiling_db  = float(ceiling_db)
+        self.release_ms  = float(release_ms)
+        self._el = mkgst(TP_ELEMENT, f"{name_prefix}_tp",
+                         {"ceiling": self.ceiling_db, "release": self.release_ms}) \
+            if register_truepeak() else None
+        if self._el:
+            pipeline.add(self._el)
+        self._tee = self._tail = self._el
+
+    def set_ceiling(self, db):
+        self.ceiling_db = float(db)
+        if self._el: self._el.set_property("ceiling", self.ceiling_db)
+
+    def set_release(self, ms):
+        self.release_ms = float(ms)
+        if self._el: self._el.set_property("release", self.release_ms)
+
+    @property
+    def reduction_db(self):
+        return self._el.get_property("reduction") if self._el else 0.0
+
+    def set_enabled(self, en, _from_autoinsert=False):
+        if en == self._injected:
+            return
+        if en:
+            if self._upstream and self._downstream:
+                self.inject(self._upstream, self._downstream)
+        else:
+            self.eject()
+
+    def inject(self, upstream_el, downstream_el):
+        if self._injected or not self._el:
+            return
+        self._upstream, self._downstream = upstream_el, downstream_el
+        if self._switch:
+            self._switch.select(self._branch)
+        else:
+            sp = upstream_el.get_static_pad("src")
+            if sp and sp.is_linked():
+                sp.unlink(sp.get_peer())
+            if not (upstream_el.link(self._el) and self._el.link(downstream_el)):
+                print(f"  [TruePeak:{self.prefix}] inject FAIL — przywracam połączenie")
+                upstream_el.unlink(self._el); upstream_el.link(downstream_el)
+                return
+            self._el.sync_state_with_parent()
+        self._injected = self.enabled = True
+        print(f"  [TruePeak:{self.prefix}] włączony: sufit {self.ceiling_db:.1f} dBTP, "
+              f"release {self.release_ms:.0f} ms{' (switch)' if self._switch else ''}")
+
+    def eject(self):
+        if not self._injected:
+            return
+        if self._switch:
+            self._switch.release(self._branch)
+        else:
+            up, dn = self._upstream, self._downstream
+            self._el.set_state(Gst.State.NULL)
+            up.unlink(self._el); self._el.unlink(dn)
+            if not up.link(dn):
+                print(f"  [TruePeak:{self.prefix}] eject: restore {up.get_name()}→{dn.get_name()} FAIL")
+        self._injected = self.enabled = False
+        print(f"  [TruePeak:{self.prefix}] wyłączony")
+
+    def _all_els(self):
+        return [self._el] if self._el else []
+
+
 # ============================================================================
 # LIMITER ROUTER — wielopunktowe wstrzykiwanie MBL w pipeline
 # ============================================================================
 # Zdefiniowane punkty wstrzyknięcia w pipeline CarbonX:
 #
-#   INPUT    — zaraz po audioconvert wejściowym (przed Tape)
+#   INPUT    — zaraz po przypięciu formatu FX (fx_caps → tee, przed Tape)
 #              idealny do: ochrony przed przesterowaniem na wejściu
 #
 #   POST_EQ  — po EQ, przed Spatial (po kształtowaniu widma)
 #              idealny do: limitowania po korekcji barwy
 #
-#   POST_FX  — po całym łańcuchu DSP, przed wyjściem (conv_out → hw_sink)
+#   POST_FX  — po całym łańcuchu DSP, przed wyjściem (fx_out → conv_out)
 #              idealny do: finalny limiter master, zabezpieczenie wyjścia
 #
 #   POST_MON — w torze monitora (opcjonalnie, niezależnie od main)
@@ -3697,59 +4375,458 @@ LIMITER_POINTS = {
 }
 
 
-class LimiterRouter:
+class LimiterSwitch:
     """
-    Zarządza wieloma instancjami MultibandLimiter w różnych punktach pipeline.
-    Każdy punkt ma własną instancję MBL z niezależnymi ustawieniami.
-
-    Użycie:
-        router = LimiterRouter(pipeline)
-        router.register("POST_FX", mbl_instance, conv_out, hw_sink)
-        router.enable("POST_FX", True)
-        router.get("POST_FX").set_band_threshold(0, 0.8)
+    Stałe okablowanie punktu LimiterRouter (MBL_WIRING="switch"):
+
+        up → tee ─ q_dry ──────────────────────┬→ mix → caps → dn
+                 ├ q_mbl → valve → [MBL] ───────┤
+                 └ q_tp  → valve → [TP]  ───────┘   (gałąź tp opcjonalna)
+
+    LimiterRouter tworzy switch przy pierwszym włączeniu punktu; wpięcie
+    między up a dn robi probe IDLE na srcpadzie up. Od tej chwili procesor
+    siedzi w torze i nie zmienia stanu. select(gałąź) otwiera jej valve
+    i robi crossfade głośności padów miksera (dry / mbl / tp) na zegarze
+    potoku — bez przepinania padów, bez NULL, bez dziury.
+    Zamknięta valve (drop-mode=transform-to-gap) zamienia bufory na GAP,
+    więc procesor nic nie liczy, a mikser nie czeka na jego gałąź.
+    Procesory dołączane są przez attach — do tego czasu valve → mix.
+    select/release tylko z pętli głównej (GLib/Qt): timeout valve i krzywe
+    GstController nie są chronione lockiem.
     """
 
+    def __init__(self, up, dn, name, branches=("mbl",)):
+        self.name    = name
+        self.up      = up
+        self.dn      = dn
+        self.active  = None        # nazwa gałęzi na wyjściu albo None (dry)
+        self._cs     = {}
+        self._close  = None
+        self._br     = {}          # gałąź -> {"q", "valve", "pad", "proc"}
+        self.stats   = {"switches": 0, "attach_ms": None}
+        b = up.get_parent()
+        self._tee   = mkgst("tee",        f"{name}_sw_tee")
+        self._q_dry = mkgst("queue",      f"{name}_sw_qd", QUEUE_PROFILES["mbl"])
+        self._mix   = mkgst("audiomixer", f"{name}_sw_mix")
+        self._caps  = mkgst("capsfilter", f"{name}_sw_caps",
+                            {"caps": Gst.Caps.from_string(f"audio/x-raw,format={FX_FORMAT}")})
+        for br in branches:
+            self._br[br] = {"q":     mkgst("queue", f"{name}_sw_q{br}", QUEUE_PROFILES["mbl"]),
+                            "valve": mkgst("valve", f"{name}_sw_v{br}", {"drop": True}),
+                            "pad": None, "proc": None}
+        els = [self._tee, self._q_dry, self._mix, self._caps]
+        for br in self._br.values():
+            els += [br["q"], br["valve"]]
+        self.ok = all(els)
+        if not self.ok:
+            print(f"  [Switch:{name}] brak elementów — punkt zostaje w trybie relink")
+            return
+        # Bez transform-to-gap (GStreamer < 1.20) zamknięta valve zatrzymałaby
+        # mikser — wtedy gałęzie liczą zawsze, przełącza tylko crossfade
+        self._gap = self._br[branches[0]]["valve"].find_property("drop-mode") is not None
+        for br in self._br.values():
+            if self._gap:
+                br["valve"].set_property("drop-mode", "transform-to-gap")
+            else:
+                br["valve"].set_property("drop", False)
+        self._mix.set_property("output-buffer-duration", 10_000_000)
+        for el in els:
+            b.add(el)
+
+        req = getattr(self._mix, "request_pad_simple", None) or self._mix.get_request_pad
+        self._tee.link(self._q_dry)
+        self._dry_pad = req("sink_%u")
+        self._q_dry.get_static_pad("src").link(self._dry_pad)
+        self._dry_pad.set_property("volume", 1.0)
+        for br in self._br.values():
+            self._tee.link(br["q"]); br["q"].link(br["valve"])
+            br["pad"] = req("sink_%u")
+            br["valve"].get_static_pad("src").link(br["pad"])
+            br["pad"].set_property("volume", 0.0)
+        self._mix.link(self._caps)
+        for el in reversed(els):
+            el.sync_state_with_parent()
+        # up → dn zamieniamy na up → tee … caps → dn, gdy przez srcpad up nic nie płynie
+        up.get_static_pad("src").add_probe(Gst.PadProbeType.IDLE, self._splice, None)
+
+    def _splice(self, pad, info, _data):
+        peer = pad.get_peer()
+        if peer:
+            pad.unlink(peer)
+        ok = (pad.link(self._tee.get_static_pad("sink")) == Gst.PadLinkReturn.OK and
+              self._caps.get_static_pad("src").link(self.dn.get_static_pad("sink"))
+              == Gst.PadLinkReturn.OK)
+        print(f"  [Switch:{self.name}] {self.up.get_name()} → [dry | {' | '.join(self._br)}] → "
+              f"{self.dn.get_name()}{'' if ok else '  BŁĄD link'}"
+              f"{'' if self._gap else '  (valve bez drop-mode — gałęzie liczą stale)'}")
+        return Gst.PadProbeReturn.REMOVE
+
+    def attach(self, proc, branch="mbl"):
+        """Wpina procesor (MBL / TP) między valve gałęzi a jej pad miksera (raz, przy zamkniętej valve)."""
+        t0 = time.perf_counter()
+        br = self._br[branch]
+        proc._switch, proc._branch = self, branch
+        br["proc"] = proc
+        vp = br["valve"].get_static_pad("src")
+
+        def on_idle(pad, info, _data):
+            if pad.is_linked():
+                pad.unlink(br["pad"])
+            ok = (pad.link(proc._tee.get_static_pad("sink")) == Gst.PadLinkReturn.OK and
+                  proc._tail.get_static_pad("src").link(br["pad"]) == Gst.PadLinkReturn.OK)
+            for el in reversed(proc._all_els()):
+                el.sync_state_with_parent()
+            self.stats["attach_ms"] = (time.perf_counter() - t0) * 1000.0
+            print(f"  [Switch:{self.name}] {proc.prefix} dołączony do gałęzi {branch}"
+                  f"{'' if ok else ' — BŁĄD link'} ({self.stats['attach_ms']:.1f} ms)")
+            return Gst.PadProbeReturn.REMOVE
+
+        vp.add_probe(Gst.PadProbeType.IDLE, on_idle, None)
+
+    def detach(self, branch, done):
+        """
+        Odpina procesor gałęzi — valve znów linkuje prosto do padu miksera,
+        więc wybrana gałąź gra na ten czas bez procesora, ale bez dziury.
+        done() woła pętla główna: elementy procesora można wtedy zatrzymać
+        i usunąć z binu.
+        """
+        br = self._br[branch]
+        proc, br["proc"] = br["proc"], None
+        if proc is None:
+            GLib.idle_add(done)
+            return
+
+        def on_idle(pad, info, _data):
+            if pad.is_linked():
+                pad.unlink(pad.get_peer())
+            tail = proc._tail.get_static_pad("src")
+            if tail.is_linked():
+                tail.unlink(br["pad"])
+            if pad.link(br["pad"]) != Gst.PadLinkReturn.OK:
+                print(f"  [Switch:{self.name}] detach {proc.prefix}: BŁĄD link valve → mix")
+            proc._switch = None
+            GLib.idle_add(done)
+            return Gst.PadProbeReturn.REMOVE
+
+        br["valve"].get_static_pad("src").add_probe(Gst.PadProbeType.IDLE, on_idle, None)
+
+    def _fade(self, pad, v0, v1, now, t0):
+        cs = self._cs.get(pad)
+        if cs is None:
+            cs = GstController.InterpolationControlSource()
+            cs.set_property("mode", GstController.InterpolationMode.LINEAR)
+            pad.add_control_binding(GstController.DirectControlBinding.new_absolute(pad, "volume", cs))
+            self._cs[pad] = cs
+        cs.unset_all()
+        cs.set(now, v0)
+        cs.set(t0, v0)
+        cs.set(t0 + int(MBL_XFADE_MS * Gst.MSECOND), v1)
+
+    def select(self, branch):
+        """
+        Crossfade MBL_XFADE_MS na gałąź (None = dry). Tylko z pętli głównej.
+
+        Gałęzie niosą ten sam sygnał (koherentne), więc crossfade jest liniowy
+        o stałej sumie wzmocnień = 1 — wtedy poziom się nie zmienia (równa moc
+        dałaby +3 dB w połowie). Wzmocnienia startowe (np. w trakcie poprzedniej
+        rampy) są normalizowane do sumy 1. Świeżo otwarta gałąź najpierw liczy
+        MBL_XFADE_WARMUP_MS przy zerowym wzmocnieniu — stany filtrów i obwiednie
+        limiterów dochodzą do sygnału, zanim gałąź trafi na wyjście.
+        """
+        if not self.ok or branch == self.active:
+            return
+        self.active = branch
+        self.stats["switches"] += 1
+        if self._close is not None:
+            GLib.source_remove(self._close); self._close = None
+        warm = 0
+        if branch and self._gap:
+            valve = self._br[branch]["valve"]
+            if valve.get_property("drop"):
+                valve.set_property("drop", False)
+                warm = MBL_XFADE_WARMUP_MS
+        pads = [self._dry_pad] + [br["pad"] for br in self._br.values()]
+        v1 = [0.0 if branch else 1.0] + [1.0 if name == branch else 0.0 for name in self._br]
+        v0 = [pad.get_property("volume") for pad in pads]
+        tot = sum(v0)
+        v0 = [v / tot for v in v0] if tot > 1e-6 else list(v1)
+        ok, now = self.up.get_static_pad("src").query_position(Gst.Format.TIME)
+        if GSTCONTROLLER_OK and ok and now >= 0:
+            t0 = now + int(warm * Gst.MSECOND)
+            for pad, a, b in zip(pads, v0, v1):
+                self._fade(pad, a, b, now, t0)
+        else:
+            # Nic nie płynie albo brak GstController — od razu wartości końcowe
+            for pad, v in zip(pads, v1):
+                cs = self._cs.get(pad)
+                if cs is not None:
+                    cs.unset_all(); cs.set(0, v)
+                pad.set_property("volume", v)
+        if self._gap:
+            # Valve nieaktywnych gałęzi zamykają się dopiero po wybrzmieniu crossfade'u
+            self._close = GLib.timeout_add(warm + MBL_XFADE_MS + 100, self._close_valves)
+
+    def release(self, branch):
+        """Powrót do dry, jeśli na wyjściu jest właśnie ta gałąź."""
+        if self.active == branch:
+            self.select(None)
+
+    def _close_valves(self):
+        self._close = None
+        for name, br in self._br.items():
+            if name != self.active:
+                br["valve"].set_property("drop", True)
+        return False
+
+
+class LimiterRouter:
+    """
+    Zarządza wieloma instancjami MultibandLimiter w różnych punktach pipeline.
+    Każdy punkt ma własną instancję MBL z niezależnymi ustawieniami.
+
+    Użycie:
+        router = LimiterRouter(pipeline)
+        router.register("POST_FX", mbl_instance, conv_out, hw_sink)
+        router.register("INPUT", lambda: MultibandLimiter(...), fx_caps, tee)  # lazy
+        router.enable("POST_FX", True)
+        router.get("POST_FX").set_band_threshold(0, 0.8)
+
+    MBL_WIRING="switch": pierwsze enable(True) punktu wpina LimiterSwitch
+    między upstream a downstream (up → dn musi być już połączone) i dołącza
+    do niego zbudowane procesory; kolejne enable() to już tylko crossfade.
+    Punkt, którego nikt nie włączył, nie dokłada do toru żadnego elementu.
+
+    Punkt zarejestrowany z fabryką (callable) buduje MBL przy pierwszym
+    get()/enable(True) i trzyma go potem w cache. peek() nigdy nie buduje —
+    do odczytów stanu (checkboxy, sceny, AutoInsert, resolver).
+    on_built: lista callback(pid, mbl) wołanych po zbudowaniu.
+    set_topology() przebudowuje MBL punktu w innej topologii (fanout / lr_tree) —
+    fabryka dostaje wtedy topology=...; on_built woła się też po przebudowie.
+
+    Punkt może mieć drugi procesor — TruePeakLimiter (register(..., tp=fabryka)).
+    kind(pid) mówi, który z nich obsługuje enable(): "mbl" albo "tp";
+    set_kind() przełącza (przy włączonym punkcie crossfade / przepięcie).
+    get/peek zawsze dotyczą MBL, tp/peek_tp — TruePeakLimiter, active() — bieżącego.
+    """
+
+    KINDS = ("mbl", "tp")
+
     def __init__(self):
-        self._points = {}   # point_id -> {"mbl": MBL, "up": el, "dn": el}
+        self._points = {}   # point_id -> {"mbl", "factory", "topology", "tp", "tp_factory", "kind", "up", "dn", "sw"}
+        self.on_built = []
 
-    def register(self, point_id, mbl, upstream_el, downstream_el):
+    def register(self, point_id, mbl, upstream_el, downstream_el, tp=None):
         """
         Rejestruje punkt wstrzyknięcia.
-        mbl musi być już skonstruowane z tymi samymi elementami pipeline.
+        mbl: gotowy MultibandLimiter (z tymi samymi elementami pipeline)
+             albo fabryka bez argumentów — MBL powstanie przy pierwszym użyciu.
         upstream/downstream to elementy GST między którymi MBL zostanie wstrzyknięty.
+        tp:  opcjonalna fabryka TruePeakLimiter — alternatywny typ punktu.
         """
-        mbl._upstream   = upstream_el
-        mbl._downstream = downstream_el
+        factory = mbl if callable(mbl) else None
         self._points[point_id] = {
-            "mbl": mbl, "up": upstream_el, "dn": downstream_el
+            "mbl": None if factory else mbl, "factory": factory, "topology": None,
+            "tp": None, "tp_factory": tp, "kind": "mbl",
+            "up": upstream_el, "dn": downstream_el,
+            "sw": None, "sw_tried": MBL_WIRING != "switch",
         }
+        if not factory:
+            mbl._upstream   = upstream_el
+            mbl._downstream = downstream_el
         print(f"  [Router] zarejestrowano punkt: {point_id} "
-              f"({upstream_el.get_name()} → {downstream_el.get_name()})")
+              f"({upstream_el.get_name()} → {downstream_el.get_name()})"
+              f"{'  [lazy]' if factory else ''}")
+
+    def _ensure_switch(self, point_id, pt):
+        """Przy pierwszym włączeniu punktu (MBL_WIRING="switch") wpina LimiterSwitch."""
+        if pt["sw_tried"]:
+            return pt["sw"]
+        pt["sw_tried"] = True
+        # Procesor wstrzyknięty wcześniej przez relink (np. AutoInsert) — najpierw wysuń
+        relinked = [p for p in self.built(point_id) if p._injected]
+        for p in relinked:
+            p.eject()
+        sw = LimiterSwitch(pt["up"], pt["dn"], f"lr_{point_id.lower()}",
+                           branches=("mbl", "tp") if pt["tp_factory"] else ("mbl",))
+        if sw.ok:
+            pt["sw"] = sw
+            for p in self.built(point_id):
+                sw.attach(p, p._branch)
+        for p in relinked:
+            p.inject(pt["up"], pt["dn"])
+        return pt["sw"]
+
+    def _build(self, point_id, pt):
+        t0 = time.perf_counter()
+        mbl = pt["factory"](pt["topology"]) if pt["topology"] else pt["factory"]()
+        mbl._upstream   = pt["up"]
+        mbl._downstream = pt["dn"]
+        if pt["sw"]:
+            pt["sw"].attach(mbl)
+        pt["mbl"] = mbl
+        print(f"  [Router] {point_id}: MBL ({mbl.topology}) zbudowany przy pierwszym użyciu "
+              f"({(time.perf_counter() - t0) * 1000:.1f} ms)")
+        for cb in self.on_built:
+            cb(point_id, mbl)
+        return mbl
+
+    def _build_tp(self, point_id, pt):
+        tp = pt["tp_factory"]()
+        tp._upstream, tp._downstream = pt["up"], pt["dn"]
+        if pt["sw"]:
+            pt["sw"].attach(tp, "tp")
+        pt["tp"] = tp
+        print(f"  [Router] {point_id}: TruePeakLimiter zbudowany")
+        return tp
 
     def enable(self, point_id, en):
-        """Włącza/wyłącza MBL w danym punkcie."""
+        """Włącza/wyłącza procesor bieżącego typu (kind) w danym punkcie."""
+        proc = self.active(point_id, build=en)
+        if proc:
+            if en:
+                self._ensure_switch(point_id, self._points[point_id])
+            proc.set_enabled(en)
+
+    def kind(self, point_id):
+        pt = self._points.get(point_id)
+        return pt["kind"] if pt else None
+
+    def has_tp(self, point_id):
+        pt = self._points.get(point_id)
+        return bool(pt and pt["tp_factory"])
+
+    def set_kind(self, point_id, kind):
+        """
+        Zmienia typ punktu ("mbl" / "tp"). Włączony punkt przechodzi na nowy
+        procesor od razu: switch — crossfade gałęzi (nowy włączany pierwszy),
+        relink — stary wysuwany przed wstrzyknięciem nowego.
+        """
+        pt = self._points.get(point_id)
+        if not pt or kind == pt["kind"] or (kind == "tp" and not pt["tp_factory"]):
+            return
+        old = self.active(point_id)
+        pt["kind"] = kind
+        if not (old and old._injected):
+            return
+        new = self.active(point_id, build=True)
+        if self._ensure_switch(point_id, pt):
+            new.set_enabled(True); old.set_enabled(False)
+        else:
+            old.set_enabled(False); new.set_enabled(True)
+        print(f"  [Router] {point_id}: typ → {kind}")
+
+    def has_factory(self, point_id):
+        pt = self._points.get(point_id)
+        return bool(pt and pt["factory"])
+
+    def topology(self, point_id):
+        """Topologia MBL punktu — zbudowanego albo tej, w której się zbuduje."""
+        pt = self._points.get(point_id)
+        if not pt:
+            return None
+        if pt["mbl"]:
+            return pt["mbl"].topology
+        return pt["topology"] or MBL_TOPOLOGY.get(point_id, "fanout")
+
+    def set_topology(self, point_id, topology):
+        """
+        Zmienia topologię MBL punktu ("fanout" / "lr_tree"). Niezbudowany punkt
+        zbuduje się już w nowej; zbudowany MBL jest przebudowywany — progi, ratio,
+        AutoInsert i AutoLevels przechodzą na nowy, włączony punkt zostaje włączony.
+        switch: gałąź mbl na czas przebudowy gra bez limitera (bez dziury);
+        relink: eject → nowy MBL → inject. Tylko z pętli głównej.
+        Punkt zarejestrowany z gotowym MBL (bez fabryki) nie zmienia topologii.
+        """
         pt = self._points.get(point_id)
-        if pt:
-            pt["mbl"].set_enabled(en)
+        if not pt or topology not in MBL_TOPOLOGIES or topology == self.topology(point_id):
+            return False
+        if not pt["factory"]:
+            print(f"  [Router] {point_id}: MBL bez fabryki — topologia bez zmian")
+            return False
+        pt["topology"] = topology
+        old = pt["mbl"]
+        if old is None:
+            return True
+        pt["mbl"] = None
+        was = old._injected
+        # Probe AutoInsert siedzi na srcpadzie upstream — stary MBL nie może już reagować
+        for key in list(old._probes):
+            old._set_probe(key, None)
+        if pt["sw"]:
+            pt["sw"].detach(old._branch, lambda: self._rebuild(point_id, pt, old, was))
+        else:
+            old.eject()
+            self._rebuild(point_id, pt, old, was)
+        return True
+
+    def _rebuild(self, point_id, pt, old, was):
+        """Usuwa elementy starego MBL z binu (zwalnia nazwy) i buduje nowy."""
+        for el in old._all_els():
+            el.set_state(Gst.State.NULL)
+            old.pipeline.remove(el)
+        mbl = self._build(point_id, pt)
+        mbl.copy_settings(old)
+        if was:
+            mbl.inject(pt["up"], pt["dn"])
+        return False
+
+    def active(self, point_id, build=False):
+        """Procesor bieżącego typu punktu (build=True — zbuduj leniwy)."""
+        pt = self._points.get(point_id)
+        if not pt:
+            return None
+        if pt["kind"] == "tp":
+            return self.tp(point_id) if build else pt["tp"]
+        return self.get(point_id) if build else pt["mbl"]
+
+    def tp(self, point_id):
+        """TruePeakLimiter punktu (buduje przy pierwszym użyciu); None bez fabryki tp."""
+        pt = self._points.get(point_id)
+        if not pt or not pt["tp_factory"]:
+            return None
+        return pt["tp"] or self._build_tp(point_id, pt)
+
+    def peek_tp(self, point_id):
+        pt = self._points.get(point_id)
+        return pt["tp"] if pt else None
+
+    def built(self, point_id):
+        """Zbudowane procesory punktu (MBL i/lub TP)."""
+        pt = self._points.get(point_id)
+        return [p for p in (pt["mbl"], pt["tp"]) if p] if pt else []
 
     def enable_all(self, en):
         """Włącza/wyłącza wszystkie punkty jednocześnie."""
-        for pt in self._points.values():
-            pt["mbl"].set_enabled(en)
+        for pid in self._points:
+            self.enable(pid, en)
 
     def get(self, point_id):
-        """Zwraca instancję MultibandLimiter dla danego punktu."""
+        """Zwraca instancję MultibandLimiter dla danego punktu (buduje leniwy)."""
+        pt = self._points.get(point_id)
+        if not pt:
+            return None
+        return pt["mbl"] or self._build(point_id, pt)
+
+    def peek(self, point_id):
+        """Jak get(), ale None dla jeszcze niezbudowanego punktu."""
         pt = self._points.get(point_id)
         return pt["mbl"] if pt else None
 
+    def built_points(self):
+        return [pid for pid, pt in self._points.items() if pt["mbl"]]
+
     def active_points(self):
         """Zwraca listę aktywnych (wstrzykniętych) punktów."""
-        return [pid for pid, pt in self._points.items()
-                if pt["mbl"]._injected]
+        return [pid for pid in self._points
+                if any(p._injected for p in self.built(pid))]
 
     def registered_points(self):
         return list(self._points.keys())
 
+    def switch_stats(self):
+        """{pid: stats LimiterSwitch} dla punktów wpiętych na stałe."""
+        return {pid: pt["sw"].stats for pid, pt in self._points.items() if pt["sw"]}
+
 
 class LimiterRouterWidget(QGroupBox):
     """
@@ -3789,6 +4866,7 @@ class LimiterRouterWidget(QGroupBox):
         # Dodaj wiersz per każdy zarejestrowany punkt
         for pid in router.registered_points():
             self._add_point_row(pid)
+        router.on_built.append(self._on_mbl_built)
         # Podepnij sygnały dopiero po zakończeniu renderowania (unika spurious clicked)
         QTimer.singleShot(500, self._connect_signals)
 
@@ -3822,12 +4900,16 @@ class LimiterRouterWidget(QGroupBox):
         if not self.router:
             return
         for pid, pw in self._point_widgets.items():
-            mbl = self.router.get(pid)
+            mbl = self.router.active(pid)
             if mbl:
                 cb = pw["cb"]
                 cb.blockSignals(True)
                 cb.setChecked(mbl._injected)
                 cb.blockSignals(False)
+            if pw.get("tp"):
+                pw["tp"].blockSignals(True)
+                pw["tp"].setChecked(self.router.kind(pid) == "tp")
+                pw["tp"].blockSignals(False)
 
     def _build(self):
         self._root_v = QVBoxLayout(self)
@@ -3873,19 +4955,61 @@ class LimiterRouterWidget(QGroupBox):
         cb._pid = point_id   # podpięcie sygnału odroczone do set_router
         row.addWidget(cb)
 
+        # Typ punktu: 5-pasmowy MBL albo jednoprzebiegowy true-peak (jeśli zarejestrowany)
+        tp = None
+        if self.router and self.router.has_tp(point_id):
+            tp = QPushButton("TP")
+            tp.setCheckable(True); tp.setFixedWidth(30)
+            tp.setToolTip("True-peak limiter zamiast 5-pasmowego MBL")
+            tp.clicked.connect(lambda checked, pid=point_id: self._on_kind(pid, checked))
+            row.addWidget(tp)
+
+        # Topologia MBL punktu — zmiana przebudowuje MBL (LimiterRouter.set_topology)
+        topo = None
+        if self.router:
+            topo = QComboBox()
+            topo.addItems(MBL_TOPOLOGIES)
+            topo.setCurrentText(self.router.topology(point_id))
+            topo.setEnabled(self.router.has_factory(point_id))
+            topo.setToolTip("fanout: tee → filtry Czebyszewa; lr_tree: drzewo LR4, płaska suma pasm")
+            topo.currentTextChanged.connect(lambda t, pid=point_id: self._on_topology(pid, t))
+            row.addWidget(topo)
+
         # Przycisk szczegółów
         btn = QPushButton("Edytuj")
         btn.setFixedWidth(48)
         btn.clicked.connect(lambda _, pid=point_id: self._open_detail(pid))
         row.addWidget(btn)
 
-        self._point_widgets[point_id] = {"cb": cb, "btn": btn, "dot": dot}
+        self._point_widgets[point_id] = {"cb": cb, "btn": btn, "dot": dot, "tp": tp, "topo": topo}
         self._points_layout.addLayout(row)
 
+    def _on_kind(self, point_id, tp):
+        if not self._ready or not self.router:
+            return
+        self.router.set_kind(point_id, "tp" if tp else "mbl")
+        self._sync_checkboxes()
+
+    def _on_topology(self, point_id, topology):
+        if not self.router:
+            return
+        if not self._ready or not self.router.set_topology(point_id, topology):
+            combo = self._point_widgets[point_id]["topo"]
+            combo.blockSignals(True)
+            combo.setCurrentText(self.router.topology(point_id))
+            combo.blockSignals(False)
+
+    def _on_mbl_built(self, point_id, mbl):
+        """Po przebudowie punktu otwarty panel szczegółów steruje nowym MBL."""
+        w = self._detail_widgets.get(point_id)
+        if w and w.mbl is not mbl:
+            w.mbl = mbl
+            mbl.on_level = w._on_level
+
     def _on_toggle(self, point_id, en):
         if not self.router:
             return
-        mbl = self.router.get(point_id)
+        mbl = self.router.active(point_id)
         if mbl and en == mbl._injected:
             return  # guard — Qt może wysłać sygnał przy inicjalizacji
         if self.router:
@@ -3923,10 +5047,9 @@ class LimiterRouterWidget(QGroupBox):
 # ============================================================================
 # Każdy moduł ma:
 #   "group"    — kategoria DSP (decyduje o priorytecie kolejności)
-#   "caps_in"  — wymagany format wejściowy (None = dowolny)
-#   "caps_out" — format wyjściowy po module
-#   "needs_conv_before" — czy koniecznie potrzebuje audioconvert PRZED sobą
-#   "needs_conv_after"  — czy koniecznie potrzebuje audioconvert PO sobie
+# oraz flagi wyliczane przez probe_dsp_meta() z szablonów padów pluginu:
+#   "needs_conv_before" — sink pluginu nie przyjmuje FX_CAPS → audioconvert PRZED
+#   "needs_conv_after"  — src pluginu nie daje FX_CAPS → audioconvert PO
 #
 # Grupy DSP i ich naturalna kolejność (niższy nr = wcześniej w łańcuchu):
 #   10 PHASE     — inwersja fazy (przed wszystkim)
@@ -3935,42 +5058,64 @@ class LimiterRouterWidget(QGroupBox):
 #   40 SPATIAL   — panorama, karaoke (prosta stereo manipulacja)
 #   50 TIME      — chorus/echo (czas i modulacja)
 #   60 REVERB    — pogłos (na końcu efektów czasowych)
-#   70 STEREO    — stereo widening (potrzebuje float stereo)
+#   70 STEREO    — stereo widening
 #   80 GAIN      — trim / wzmocnienie końcowe
 #
 # audioconvert jest wstawiany automatycznie gdy:
-#   - moduł wymaga float (freeverb, stereo)
-#   - moduł zmienia format caps który następny moduł nie akceptuje
+#   - moduł nie przyjmuje FX_CAPS (np. 'stereo' = tylko S16LE)
+#   - poprzedni moduł oddał format inny niż FX_CAPS
 
 DSP_META = {
-    "phase_inv":  {"group": 10, "needs_conv_before": False, "needs_conv_after": False,
-                   "float_required": False},
-    "gate":       {"group": 20, "needs_conv_before": False, "needs_conv_after": False,
-                   "float_required": False},
-    "compressor": {"group": 20, "needs_conv_before": False, "needs_conv_after": False,
-                   "float_required": False},
-    "expander":   {"group": 20, "needs_conv_before": False, "needs_conv_after": False,
-                   "float_required": False},
-    "hi_pass":    {"group": 30, "needs_conv_before": False, "needs_conv_after": False,
-                   "float_required": False},
-    "lo_pass":    {"group": 30, "needs_conv_before": False, "needs_conv_after": False,
-                   "float_required": False},
-    "notch":      {"group": 30, "needs_conv_before": False, "needs_conv_after": False,
-                   "float_required": False},
-    "panorama":   {"group": 40, "needs_conv_before": False, "needs_conv_after": False,
-                   "float_required": False},
-    "karaoke":    {"group": 40, "needs_conv_before": False, "needs_conv_after": False,
-                   "float_required": False},
-    "chorus":     {"group": 50, "needs_conv_before": False, "needs_conv_after": False,
-                   "float_required": False},
-    "reverb":     {"group": 60, "needs_conv_before": True,  "needs_conv_after": True,
-                   "float_required": True},   # freeverb wymaga F32 stereo
-    "stereo_fx":  {"group": 70, "needs_conv_before": True,  "needs_conv_after": True,
-                   "float_required": True},   # plugin 'stereo' wymaga F32
-    "trim":       {"group": 80, "needs_conv_before": False, "needs_conv_after": False,
-                   "float_required": False},
+    "phase_inv":  {"group": 10},
+    "gate":       {"group": 20},
+    "compressor": {"group": 20},
+    "expander":   {"group": 20},
+    "hi_pass":    {"group": 30},
+    "lo_pass":    {"group": 30},
+    "notch":      {"group": 30},
+    "panorama":   {"group": 40},
+    "karaoke":    {"group": 40},
+    "chorus":     {"group": 50},
+    "reverb":     {"group": 60},
+    "stereo_fx":  {"group": 70},
+    "trim":       {"group": 80},
 }
 
+_CAPS_PROBE = {}   # plugin -> (sink_ok, src_ok)
+
+def plugin_accepts_fx(plugin):
+    """
+    (sink_ok, src_ok) — czy szablony padów ALWAYS pluginu obejmują FX_CAPS.
+    Wynik cache'owany per plugin. Brak pluginu → (True, True).
+    """
+    r = _CAPS_PROBE.get(plugin)
+    if r is None:
+        ok  = {Gst.PadDirection.SINK: True, Gst.PadDirection.SRC: True}
+        fac = Gst.ElementFactory.find(plugin)
+        if fac:
+            fx = Gst.Caps.from_string(FX_CAPS)
+            for tmpl in fac.get_static_pad_templates():
+                if tmpl.direction in ok and tmpl.presence == Gst.PadPresence.ALWAYS:
+                    ok[tmpl.direction] = fx.is_subset(tmpl.get_caps())
+        r = _CAPS_PROBE[plugin] = (ok[Gst.PadDirection.SINK], ok[Gst.PadDirection.SRC])
+    return r
+
+def conv_for(plugin, side, name):
+    """audioconvert przed ("sink") / po ("src") pluginie — None gdy format pasuje."""
+    sink_ok, src_ok = plugin_accepts_fx(plugin)
+    if sink_ok if side == "sink" else src_ok:
+        return None
+    return mkgst("audioconvert", name)
+
+def probe_dsp_meta(meta=None):
+    """Wypełnia needs_conv_* w DSP_META na podstawie caps pluginów z CHAIN_GST."""
+    meta = DSP_META if meta is None else meta
+    for mid, m in meta.items():
+        sink_ok, src_ok = plugin_accepts_fx(CHAIN_GST[mid][0])
+        m["needs_conv_before"] = not sink_ok
+        m["needs_conv_after"]  = not src_ok
+    DSPTopology.invalidate()
+
 # Reguły DSP: które efekty NIE powinny być po sobie (reorder hint)
 # Format: (A, B) => B powinno być PRZED A jeśli oba aktywne
 DSP_REORDER_RULES = [
@@ -3995,13 +5140,131 @@ DSP_REORDER_RULES = [
 ]
 
 
+class DSPTopology:
+    """
+    Prekompilowana topologia DSP — wspólna dla wszystkich resolverów.
+
+    Kolejność = sortowanie topologiczne (Kahn) grafu z DSP_REORDER_RULES,
+    remisy rozstrzyga grupa z DSP_META, potem pozycja w CHAIN_ORDER.
+    Cykl w regułach jest wykrywany raz, przy budowie (ValueError).
+
+    Tablica: maska aktywnych modułów (13 bitów → max 8192 wpisów) →
+    (kolejność, sloty). Sloty to sekwencja łańcucha: str = moduł,
+    int = indeks slotu konwertera (tylko tam, gdzie format wychodzi z FX_CAPS). Wpisy liczone leniwie przy pierwszym
+    użyciu, potem rebuild planuje w O(1).
+    """
+
+    _shared = None
+
+    def __init__(self, order=None, meta=None, rules=None,
+                 conv_slots=4):
+        self.order      = list(order or CHAIN_ORDER)
+        self.meta       = meta if meta is not None else DSP_META
+        self.conv_slots = conv_slots
+        self.bit  = {mid: 1 << i for i, mid in enumerate(self.order)}
+        self.prio = {mid: (self.meta.get(mid, {}).get("group", 99), i)
+                     for i, mid in enumerate(self.order)}
+        # deps[mid] = maska modułów które muszą stać PRZED mid
+        self.deps = {mid: 0 for mid in self.order}
+        for after, before in (rules if rules is not None else DSP_REORDER_RULES):
+            if after in self.bit and before in self.bit:
+                self.deps[after] |= self.bit[before]
+        cyc = self._find_cycle()
+        if cyc:
+            raise ValueError(f"DSP_REORDER_RULES: cykl {' → '.join(cyc)}")
+        self._table = {}
+
+    @classmethod
+    def shared(cls):
+        if cls._shared is None:
+            cls._shared = cls()
+        return cls._shared
+
+    @classmethod
+    def invalidate(cls):
+        """Wywołać po zmianie DSP_META / reguł — tablica zbuduje się od nowa."""
+        cls._shared = None
+
+    def _find_cycle(self):
+        state = {}            # mid -> 1 (w trakcie) / 2 (gotowe)
+        stack = []
+        def visit(mid):
+            state[mid] = 1; stack.append(mid)
+            for dep in self.order:
+                if self.deps[mid] & self.bit[dep]:
+                    if state.get(dep) == 1:
+                        return stack[stack.index(dep):] + [dep]
+                    if dep not in state:
+                        c = visit(dep)
+                        if c: return c
+            state[mid] = 2; stack.pop()
+            return None
+        for mid in self.order:
+            if mid not in state:
+                c = visit(mid)
+                if c: return c
+        return None
+
+    def mask(self, mids):
+        m = 0
+        for mid in mids:
+            m |= self.bit.get(mid, 0)
+        return m
+
+    def plan(self, mids):
+        """Zwraca (kolejność, sloty) dla zbioru aktywnych modułów."""
+        m = self.mask(mids)
+        p = self._table.get(m)
+        if p is None:
+            p = self._table[m] = self._compile(m)
+        return p
+
+    def compile_all(self):
+        """Wypełnia całą tablicę (np. przy starcie). Zwraca liczbę wpisów."""
+        for m in range(1 << len(self.order)):
+            if m not in self._table:
+                self._table[m] = self._compile(m)
+        return len(self._table)
+
+    def _compile(self, m):
+        # Kahn: spośród modułów bez niespełnionych zależności bierz najniższy priorytet
+        left  = [mid for mid in self.order if m & self.bit[mid]]
+        done  = 0
+        order = []
+        while left:
+            ready = [mid for mid in left if not (self.deps[mid] & m & ~done)]
+            mid = min(ready, key=self.prio.__getitem__)
+            order.append(mid); left.remove(mid); done |= self.bit[mid]
+        return tuple(order), self._slots(order)
+
+    def _slots(self, order):
+        # dirty = wyjście poprzedniego modułu nie jest w FX_CAPS — jeden konwerter
+        # naprawia i to, i ewentualne wymaganie wejściowe następnego modułu
+        slots, conv_idx, dirty = [], 0, False
+        for mid in order:
+            meta = self.meta.get(mid, {})
+            if (dirty or meta.get("needs_conv_before", False)) and conv_idx < self.conv_slots:
+                slots.append(conv_idx); conv_idx += 1
+            slots.append(mid)
+            dirty = meta.get("needs_conv_after", False)
+        if dirty and conv_idx < self.conv_slots:
+            slots.append(conv_idx)     # powrót do FX_CAPS przed exit_el
+        return tuple(slots)
+
+
+probe_dsp_meta()
+
+
 class DSPAutoResolver:
     """
     Wyznacza optymalną kolejność DSP i przebudowuje fragment pipeline
     między entry_el a exit_el.
 
     Strategia przebudowy:
-    - Pipeline musi być w stanie NULL przed relinkingiem (GStreamer wymaga)
+    - HOT_SWAP (pipeline PLAYING/PAUSED): probe IDLE na srcpadzie entry_el,
+      segment przepinany na żywo, reszta pipeline gra dalej; gap mierzony
+      w próbkach i zapisywany w last_swap
+    - cold (pipeline READY/NULL): elementy segmentu w NULL, pełne odpięcie
     - Wszystkie elementy chain są w pipeline od startu (dodane w _gst_init)
     - Rebuild tylko odpina/podpina połączenia — nie usuwa ani nie dodaje elementów
     - Konwertery (max 4 stałe sloty) też są w pipeline od startu
@@ -4009,6 +5272,8 @@ class DSPAutoResolver:
 
     # Stałe sloty konwerterów — tyle ile może być potrzebnych naraz
     CONV_SLOTS = 4
+    # Podmiana segmentu na żywo (blokujący probe) zamiast NULL + relink
+    HOT_SWAP = True
 
     def __init__(self, pipeline, entry_el, exit_el, name_prefix="ar"):
         self.pipeline      = pipeline
@@ -4020,14 +5285,70 @@ class DSPAutoResolver:
         self._current_order = None       # None = nie zbuildowane jeszcze
         self._initialized  = False
         self.limiter_router = None       # opcjonalnie: LimiterRouter — eject/re-inject wokół rebuild
+        self.element_factory = None      # LAZY_DSP: callable(mid) -> Gst.Element
+        self.bypass_mode   = BYPASS_MODE
+        self.bypasses      = {}          # {mid: ChainBypass} — tryb "selector"
+        self.topology      = DSPTopology.shared()   # wspólna tablica planów (main + monitor)
         
         # --- DODANE: Zmienne do cooldownu ---
         self._last_rebuild_time = 0.0
         self._rebuild_cooldown  = 1.5  # Zablokuj przebudowę na 1.5 sekundy
 
+        # Kolejka scalająca: w cooldownie pamiętamy tylko OSTATNI żądany stan
+        self._pending_mids  = None       # lista mid czekająca na koniec cooldownu
+        self._pending_src   = None       # id GLib.timeout_add
+        self._pending_since = 0.0        # czas pierwszego odłożonego żądania
+        self._rb_stats      = {"received": 0, "merged": 0, "applied": 0,
+                               "delay_ms": 0.0, "max_delay_ms": 0.0}
+        self.on_rebuilt     = None       # callback(order) po faktycznym zastosowaniu
+
+        # Hot-swap
+        self._current_seq  = []          # elementy aktualnie wpięte między entry a exit
+        self._target_seq   = []
+        self._swap_pending = False
+        self.last_swap     = None        # {"gap_ns","gap_samples","rate","buffer_samples","ok"}
+
     def set_chain_elements(self, chain_els):
         self.chain_els = chain_els
 
+    def element(self, mid):
+        """
+        Element modułu; przy LAZY_DSP tworzony przez element_factory przy pierwszym
+        użyciu, dodawany do pipeline i zapamiętany w chain_els (ten sam dict
+        co w SignalChainPanel / FXChain). W trybie "selector" — moduł z ChainBypass.
+        """
+        if self.bypass_mode == "selector":
+            bp = self.bypass(mid)
+            return bp.el if bp else None
+        el = self.chain_els.get(mid)
+        if el is None and self.element_factory:
+            el = self.element_factory(mid)
+            if el:
+                self.pipeline.add(el)
+                el.sync_state_with_parent()
+                self.chain_els[mid] = el
+                print(f"[AutoResolver:{self.name_prefix}] utworzono moduł: {mid}")
+        return el
+
+    def bypass(self, mid):
+        """ChainBypass modułu (tryb "selector"): własny element w binie z selektorami."""
+        bp = self.bypasses.get(mid)
+        if bp is None and self.element_factory:
+            bp = ChainBypass(mid, self.element_factory(mid), f"{self.name_prefix}_chb_{mid}")
+            if not bp.ok:
+                return None
+            self.pipeline.add(bp.bin)
+            bp.bin.sync_state_with_parent()
+            self.bypasses[mid] = bp
+            print(f"[AutoResolver:{self.name_prefix}] utworzono bypass (selector): {mid}")
+        return bp
+
+    def set_bypass_mode(self, mode):
+        """Zmiana trybu podmienia elementy slotów — następny rebuild przepina segment."""
+        if mode != self.bypass_mode:
+            self.bypass_mode = mode
+            self._current_order = None
+
     def init_convs(self):
         """Tworzy i dodaje do pipeline stałą pulę konwerterów. Wywołać po set_chain_elements."""
         for i in range(self.CONV_SLOTS):
@@ -4046,67 +5367,279 @@ class DSPAutoResolver:
     def resolve_order(self, enabled_mids):
         if not enabled_mids:
             return []
-        ordered = sorted(enabled_mids, key=lambda m: DSP_META.get(m, {}).get("group", 99))
-        changed = True
-        passes = 0
-        while changed and passes < 20:
-            changed = False; passes += 1
-            for (after, before) in DSP_REORDER_RULES:
-                if after in ordered and before in ordered:
-                    ia, ib = ordered.index(after), ordered.index(before)
-                    if ib > ia:
-                        ordered[ia], ordered[ib] = ordered[ib], ordered[ia]
-                        changed = True
-        return ordered
+        return list(self.topology.plan(enabled_mids)[0])
 
     # ── Główna metoda rebuild ────────────────────────────────────────────────
 
     def rebuild(self, enabled_mids):
+        """
+        Żądanie przebudowy. Poza cooldownem stosowane od razu; w cooldownie
+        odkładane — kolejne żądania nadpisują odłożone (scalanie), a ostatnie
+        jest stosowane raz, gdy cooldown minie. Zwraca aktualnie wpiętą kolejność.
+        """
         if not self._initialized:
             self.init_convs()
+        self._rb_stats["received"] += 1
 
         optimal = self.resolve_order(enabled_mids)
 
         if optimal == self._current_order:
+            # Powrót do stanu bieżącego — odłożone żądanie jest już nieaktualne
+            self._drop_pending()
             return optimal
 
-        # ─── DODANE: Ochrona przed thrashingiem (Cooldown) ───────────────────
-        now = time.time()
-        
-        # Jeśli upłynęło za mało czasu od ostatniej przebudowy, odrzucamy żądanie.
-        # Wyjątek: Zawsze pozwalamy na całkowite opróżnienie łańcucha (optimal == []).
-        if (now - self._last_rebuild_time) < self._rebuild_cooldown and len(optimal) > 0:
+        # ─── Ochrona przed thrashingiem (cooldown) ───────────────────────────
+        # Wyjątek: zawsze pozwalamy na całkowite opróżnienie łańcucha (optimal == []).
+        remaining = self._rebuild_cooldown - (time.time() - self._last_rebuild_time)
+        if remaining > 0 and len(optimal) > 0:
+            if self._pending_mids is not None:
+                self._rb_stats["merged"] += 1
+            else:
+                self._pending_since = time.time()
+            self._pending_mids = list(enabled_mids)
+            if self._pending_src is None:
+                self._pending_src = GLib.timeout_add(
+                    int(remaining * 1000) + 1, self._flush_pending)
             return self._current_order
-            
-        self._last_rebuild_time = now
-        # ─────────────────────────────────────────────────────────────────────────
+
+        since = self._pending_since if self._pending_mids is not None else None
+        self._drop_pending()
+        self._apply(optimal, since)
+        return optimal
+
+    def _drop_pending(self):
+        # "merged" liczy tylko rebuild() w cooldownie, który nadpisał odłożone żądanie
+        self._pending_mids = None
+        if self._pending_src is not None:
+            GLib.source_remove(self._pending_src)
+            self._pending_src = None
+
+    def _flush_pending(self):
+        """Koniec cooldownu — stosuje ostatni odłożony stan."""
+        self._pending_src = None
+        mids, self._pending_mids = self._pending_mids, None
+        if mids is None:
+            return False
+        optimal = self.resolve_order(mids)
+        if optimal != self._current_order:
+            self._apply(optimal, self._pending_since)
+        return False
+
+    def get_rebuild_stats(self):
+        st = dict(self._rb_stats)
+        st["pending"] = self._pending_mids is not None
+        return st
+
+    def _apply(self, optimal, since=None):
+        self._last_rebuild_time = time.time()
+        st = self._rb_stats
+        st["applied"] += 1
+        st["delay_ms"] = (self._last_rebuild_time - since) * 1000.0 if since else 0.0
+        st["max_delay_ms"] = max(st["max_delay_ms"], st["delay_ms"])
+        if since:
+            print(f"[AutoResolver:{self.name_prefix}] po cooldownie: "
+                  f"{st['delay_ms']:.0f} ms  (scalono {st['merged']}/{st['received']})")
 
         print(f"[AutoResolver:{self.name_prefix}] {self._current_order} → {optimal}")
         self._current_order = optimal
+        sequence = self._build_sequence(optimal)
+
+        _, cur_state, _ = self.pipeline.get_state(0)
+        if self.HOT_SWAP and cur_state in (Gst.State.PLAYING, Gst.State.PAUSED):
+            self._rebuild_hot(sequence)
+        else:
+            self._rebuild_cold(sequence)
+        if self.on_rebuilt:
+            try:
+                self.on_rebuilt(list(optimal))
+            except Exception as e:
+                print(f"[AutoResolver:{self.name_prefix}] on_rebuilt: {e}")
+
+    def _build_sequence(self, optimal):
+        """Zamienia kolejność modułów na listę elementów z wstawionymi konwerterami."""
+        sequence = []
+        for slot in self.topology.plan(optimal)[1]:
+            if isinstance(slot, int):
+                if slot < len(self._convs):
+                    sequence.append(self._convs[slot])
+            elif self.bypass_mode == "selector":
+                bp = self.bypass(slot)
+                if bp:
+                    sequence.append(bp.bin)
+            else:
+                el = self.element(slot)
+                if el:
+                    sequence.append(el)
+        return sequence
+
+    def _segment_mbls(self, segment_els):
+        """
+        Zwraca wstrzyknięte MBL, których punkt leży wewnątrz przebudowywanego
+        segmentu. Hot-swap dotyka tylko srcpada entry_el i sinkpada exit_el,
+        więc MBL wpięte np. za exit_el (POST_FX) zostają nietknięte.
+        """
+        if not self.limiter_router:
+            return []
+        seg = set(segment_els)
+        ups = seg | {self.entry_el}
+        dns = seg | {self.exit_el}
+        found = []
+        for pid in self.limiter_router.registered_points():
+            for mbl in self.limiter_router.built(pid):     # MBL / TruePeakLimiter
+                if (mbl._injected and not mbl._switch
+                        and (mbl._upstream in ups or mbl._downstream in dns)):
+                    found.append(mbl)
+        return found
+
+    # ── Hot-swap: podmiana segmentu bez zatrzymywania pipeline ──────────────
+
+    def _rebuild_hot(self, sequence):
+        """
+        Blokuje TYLKO srcpad entry_el probe'em IDLE i w callbacku przepina
+        segment entry → [sequence] → exit. Reszta pipeline zostaje w PLAYING.
+
+        Segment nie ma kolejek — pracuje w wątku streamingu entry_el, więc
+        w momencie gdy probe IDLE odpala, w segmencie nie ma danych w locie
+        i nie trzeba go drenować przez EOS. MBL wpięte w segment są przepinane
+        w tym samym callbacku (bez eject) — limiter nie znika z toru.
+        """
+        self._target_seq = sequence
+        if self._swap_pending:
+            # Poprzedni probe jeszcze nie odpalił — podmieni już nowy _target_seq
+            return
+        sp = self.entry_el.get_static_pad("src")
+        if not sp:
+            self._rebuild_cold(sequence)
+            return
+        self._swap_pending = True
+        sp.add_probe(Gst.PadProbeType.IDLE, self._on_swap_idle, None)
+
+    def _on_swap_idle(self, pad, info, _data):
+        t0 = time.perf_counter()
+        sequence = self._target_seq
+        old_seq  = self._current_seq
+        # MBL segmentu liczone teraz — obejmują wszystkie scalone żądania
+        mbls = self._segment_mbls(old_seq + sequence)
+
+        def unlink_src(el):
+            p = el.get_static_pad("src")
+            if p and p.is_linked():
+                peer = p.get_peer()
+                if peer: p.unlink(peer)
+
+        # Odepnij stary segment: entry.src, wszystkie elementy w środku, exit.sink
+        unlink_src(self.entry_el)
+        for el in old_seq:
+            unlink_src(el)
+        for mbl in mbls:
+            unlink_src(mbl._upstream); unlink_src(mbl._tail)
+        sk = self.exit_el.get_static_pad("sink")
+        if sk and sk.is_linked():
+            peer = sk.get_peer()
+            if peer: peer.unlink(sk)
+
+        chain = [self.entry_el] + sequence + [self.exit_el]
+        ok = True
+        for a, b in zip(chain, chain[1:]):
+            if not a.link(b):
+                print(f"  [AutoResolver] BŁĄD link: {a.get_name()} → {b.get_name()}")
+                ok = False
+        # MBL z powrotem między swoje elementy, jeśli nadal sąsiadują w torze
+        for mbl in mbls:
+            up, dn = mbl._upstream, mbl._downstream
+            p = up.get_static_pad("src")
+            if p and p.is_linked() and p.get_peer().get_parent_element() == dn:
+                p.unlink(p.get_peer())
+                if up.link(mbl._tee) and mbl._tail.link(dn):
+                    continue
+                unlink_src(up); unlink_src(mbl._tail); up.link(dn)
+            print(f"  [AutoResolver] MBL {mbl.prefix}: punkt poza nowym torem — wyłączony")
+            mbl._injected = mbl.enabled = False
+            GLib.idle_add(self._retire, mbl._all_els())
+        # Od końca — downstream musi być gotowy zanim popłyną dane
+        for el in reversed(sequence):
+            el.sync_state_with_parent()
+        self._current_seq = list(sequence)
+        # Elementy które wypadły z łańcucha — NULL z pętli głównej, nie z wątku streamingu
+        dropped = [el for el in old_seq if el not in sequence]
+        if dropped:
+            GLib.idle_add(self._retire, dropped)
+
+        gap_ns = int((time.perf_counter() - t0) * 1e9)
+        rate = self._pad_rate(pad)
+        self.last_swap = {"gap_ns": gap_ns,
+                          "gap_samples": gap_ns * rate // Gst.SECOND if rate else None,
+                          "rate": rate, "buffer_samples": None, "ok": ok}
+        self._swap_pending = False
+        if ok:
+            print(f"  łańcuch (hot): {' → '.join(e.get_name() for e in chain)}")
+        # Rozmiar bufora odczytaj z pierwszego bufora po podmianie
+        pad.add_probe(Gst.PadProbeType.BUFFER, self._on_swap_first_buffer, None)
+        if sequence is not self._target_seq:
+            # W trakcie callbacku przyszło kolejne żądanie — dokończ je
+            GLib.idle_add(lambda: (self._rebuild_hot(self._target_seq), False)[1])
+        return Gst.PadProbeReturn.REMOVE
+
+    def _on_swap_first_buffer(self, pad, info, _data):
+        st = self.last_swap
+        buf = info.get_buffer()
+        caps = pad.get_current_caps()
+        if st and buf and caps:
+            s = caps.get_structure(0)
+            ok_c, ch = s.get_int("channels")
+            fmt = s.get_string("format") or ""
+            width = 8 if "64" in fmt else 4 if "32" in fmt else 3 if "24" in fmt else 2
+            bpf = width * (ch if ok_c else 2)
+            st["buffer_samples"] = buf.get_size() // bpf if bpf else None
+            gs, bs = st["gap_samples"], st["buffer_samples"]
+            if gs is not None and bs:
+                mark = "✓" if gs < bs else "⚠ > 1 bufor"
+                print(f"[AutoResolver:{self.name_prefix}] hot-swap gap: "
+                      f"{gs} próbek (bufor {bs}) {mark}")
+        return Gst.PadProbeReturn.REMOVE
+
+    @staticmethod
+    def _pad_rate(pad):
+        caps = pad.get_current_caps()
+        if not caps:
+            return 0
+        ok, rate = caps.get_structure(0).get_int("rate")
+        return rate if ok else 0
+
+    def _retire(self, els):
+        """NULL dla elementów odpiętych przez hot-swap (pomija te wpięte ponownie)."""
+        for el in els:
+            if el not in self._current_seq:
+                el.set_state(Gst.State.NULL)
+        return False
+
+    def _reinject(self, mbls):
+        for mbl in mbls:
+            if mbl._upstream and mbl._downstream:
+                mbl.inject(mbl._upstream, mbl._downstream)
+        return False
+
+    # ── Cold rebuild: stara ścieżka (elementy segmentu w NULL) ───────────────
 
+    def _rebuild_cold(self, sequence):
         # ── Tymczasowo wysuń aktywne MBL żeby rebuild nie zerwał ich połączeń ──
         _mbl_to_reinject = []
         if self.limiter_router:
             for pid in self.limiter_router.registered_points():
-                mbl = self.limiter_router.get(pid)
-                if mbl and mbl._injected:
-                    mbl.eject()
-                    _mbl_to_reinject.append(mbl)
-
-        pipe = self.pipeline
-        # ── 1. Zapamiętaj stan pipeline ───────────────────────────────────────
-        _, cur_state, _ = pipe.get_state(0)
-        was_playing = (cur_state == Gst.State.PLAYING)
-        was_paused  = (cur_state == Gst.State.PAUSED)
-
-        # ── 2. Ustaw elementy chain i konwertery w READY (nie cały pipeline) ──
-        # READY pozwala na relinkowanie bez zatrzymywania src/sink
-        all_chain_els = list(self.chain_els.values()) + self._convs
+                for mbl in self.limiter_router.built(pid):
+                    # Punkty switch nie dotykają segmentu — zostają w torze
+                    if mbl._injected and not mbl._switch:
+                        mbl.eject()
+                        _mbl_to_reinject.append(mbl)
+
+        # ── 1. Ustaw elementy chain i konwertery w NULL (nie cały pipeline) ──
+        all_chain_els = (list(self.chain_els.values())
+                         + [bp.bin for bp in self.bypasses.values()] + self._convs)
         for el in all_chain_els:
             if el:
                 el.set_state(Gst.State.NULL)
 
-        # ── 3. Odepnij segment entry→exit ────────────────────────────────────
+        # ── 2. Odepnij segment entry→exit ────────────────────────────────────
         # srcpad entry_el
         sp = self.entry_el.get_static_pad("src")
         if sp and sp.is_linked():
@@ -4131,70 +5664,1139 @@ class DSPAutoResolver:
             peer = sk.get_peer()
             if peer: peer.unlink(sk)
 
-        # ── 4. Zbuduj sekwencję elementów z konwerterami ─────────────────────
-        sequence = []
-        conv_idx  = 0
-        prev_meta = None
+        # ── 3. Podłącz: entry → [sequence] → exit ────────────────────────────
+        chain = [self.entry_el] + sequence + [self.exit_el]
 
-        for i, mid in enumerate(optimal):
-            meta = DSP_META.get(mid, {})
-            el   = self.chain_els.get(mid)
+        # Ustaw NULL → READY przed linkowaniem (tylko elementy w środku)
+        for el in sequence:
+            el.set_state(Gst.State.NULL)
+            el.set_state(Gst.State.READY)
+
+        ok = True
+        for a, b in zip(chain, chain[1:]):
+            if not a.link(b):
+                print(f"  [AutoResolver] BŁĄD link: {a.get_name()} → {b.get_name()}")
+                ok = False
+
+        if ok:
+            print(f"  łańcuch: {' → '.join(e.get_name() for e in chain)}")
+
+        # ── 4. Synchronizuj elementy ze stanem pipeline (bez zatrzymywania src) ─
+        for el in sequence:
+            el.sync_state_with_parent()
+        self._current_seq = list(sequence)
+
+        # ── Re-wstrzyknij MBL po przebudowie ─────────────────────────────────
+        self._reinject(_mbl_to_reinject)
+
+    def get_current_order(self):
+        return list(self._current_order) if self._current_order else []
+
+    def format_chain_info(self):
+        if not self._current_order:
+            return "— brak aktywnych —"
+        return " → ".join(CHAIN_DEFS.get(m,(m,))[0] for m in self._current_order)
+
+# ============================================================================
+# FX CHAIN FACTORY — tor FX jako jeden Gst.Bin z ghost padami
+# ============================================================================
+# Deklaratywna specyfikacja toru FX (kolejność = kolejność linkowania):
+#   (klucz, plugin, propsy startowe, propsy sterowane przez widgety — informacyjnie)
+# plugin:
+#   "nazwa"                   — zwykły element
+#   ("conv", plugin, strona)  — audioconvert tylko gdy conv_for() go wymaga
+#   None przy kluczu "@chain" — segment DSPAutoResolver (moduły CHAIN_ORDER)
+#
+# Bin: [ghost sink] → q_fx → ... → ph_echo → [@chain] → fx_out → [ghost src]
+
+_ECHO_BYPASS = {"delay": 1, "intensity": 0.0, "feedback": 0.0}
+
+FX_CHAIN_SPEC = [
+    ("q_fx",      "queue",             QUEUE_PROFILES["fx"], ()),
+    ("tape_sat",  "audiodynamic",      {"characteristics": "soft-knee", "mode": "compressor",
+                                        "threshold": 1.0, "ratio": 1.0}, ("threshold", "ratio")),
+    ("tape_gain", "volume",            {"volume": 1.0}, ("volume",)),
+    ("tape_tone", "equalizer-3bands",  {}, ("band0", "band1", "band2")),
+    ("eq",        "equalizer-10bands", {}, tuple(f"band{i}" for i in range(10))),
+    ("sp_sat",    "audiodynamic",      {"characteristics": "hard-knee", "mode": "compressor",
+                                        "threshold": 0.0, "ratio": 1.0}, ("threshold", "ratio")),
+    ("sp_conv1",  ("conv", "stereo", "sink"), {}, ()),
+    ("sp_stereo", "stereo",            {"stereo": 1.0}, ("stereo",)),
+    ("sp_conv2",  ("conv", "stereo", "src"), {}, ()),
+    ("sp_echo",   "audioecho",         _ECHO_BYPASS, ("delay", "intensity", "feedback")),
+    ("ph_conv1",  ("conv", "stereo", "sink"), {}, ()),
+    ("ph_stereo", "stereo",            {"stereo": 1.0}, ("stereo",)),
+    ("ph_conv2",  ("conv", "stereo", "src"), {}, ()),
+    ("ph_echo",   "audioecho",         _ECHO_BYPASS, ("delay", "intensity", "feedback")),
+    ("@chain",    None,                {}, ()),
+    ("fx_out",    "capsfilter",        {"caps": FX_CAPS}, ()),
+]
+
+# Punkty LimiterRouter leżące WEWNĄTRZ binu: pid → (upstream, downstream, prefix MBL)
+FX_CHAIN_MBL = {
+    "POST_EQ": ("eq", "sp_sat", "mbl_eq"),
+}
+# Punkty poza binem (wpina je CarbonPhaserPlayer): pid → prefix MBL
+MBL_OUTER_POINTS = {"POST_FX": "mbl_out", "INPUT": "mbl_in"}
+
+
+def mbl_factory(pipeline, pid, name):
+    """
+    Fabryka MBL punktu pid — dla LAZY_DSP i LimiterRouter. Topologia z
+    MBL_TOPOLOGY, chyba że wywołujący poda własną (LimiterRouter.set_topology).
+    """
+    return lambda topology=None: MultibandLimiter(pipeline, name, MBLIMIT_BANDS,
+                                                  topology=topology or MBL_TOPOLOGY.get(pid, "fanout"))
+
+
+class ChainBypass:
+    """
+    Tryb bypass "selector" dla jednego modułu CHAIN_GST:
+
+        sink → output-selector ─ src_0 ────────────→ input-selector → src
+                               └ src_1 → [moduł] ──┘
+
+    Bin wpina resolver jak zwykły element (raz — potem zostaje w torze).
+    set_active przestawia aktywne pady obu selektorów: wyłączony moduł nie
+    dostaje buforów (zero próbek liczonych), włączony — bez relinku i bez
+    zmiany stanów. Tylko z pętli głównej.
+    """
+
+    def __init__(self, mid, el, name):
+        self.mid    = mid
+        self.el     = el
+        self.active = False
+        self.bin    = Gst.Bin.new(name)
+        self._osel  = mkgst("output-selector", f"{name}_os", {"pad-negotiation-mode": "active"})
+        self._isel  = mkgst("input-selector",  f"{name}_is", {"sync-streams": False})
+        self.ok = bool(self._osel and self._isel and el)
+        if not self.ok:
+            return
+        for e in (self._osel, el, self._isel):
+            self.bin.add(e)
+        req_o = getattr(self._osel, "request_pad_simple", None) or self._osel.get_request_pad
+        req_i = getattr(self._isel, "request_pad_simple", None) or self._isel.get_request_pad
+        self._dry = (req_o("src_%u"), req_i("sink_%u"))
+        self._wet = (req_o("src_%u"), req_i("sink_%u"))
+        self._dry[0].link(self._dry[1])
+        self._wet[0].link(el.get_static_pad("sink"))
+        el.get_static_pad("src").link(self._wet[1])
+        self.bin.add_pad(Gst.GhostPad.new("sink", self._osel.get_static_pad("sink")))
+        self.bin.add_pad(Gst.GhostPad.new("src",  self._isel.get_static_pad("src")))
+        self.set_active(False)
+
+    def set_active(self, on):
+        """True — sygnał przez moduł; False — skrótem, moduł bez buforów."""
+        self.active = bool(on)
+        if not self.ok:
+            return
+        src, sink = self._wet if self.active else self._dry
+        self._osel.set_property("active-pad", src)
+        self._isel.set_property("active-pad", sink)
+
+
+class FXChain:
+    """Zbudowany tor FX: bin + elementy po kluczu + resolver + MBL wewnątrz binu."""
+
+    def __init__(self, prefix, bin, els, chain_els, resolver, mbls, build_ms):
+        self.prefix    = prefix
+        self.bin       = bin
+        self.els       = els          # {klucz spec: Gst.Element | None}
+        self.chain_els = chain_els    # {mid: Gst.Element}
+        self.resolver  = resolver
+        self.mbls      = mbls         # {pid: MultibandLimiter}
+        self.build_ms  = build_ms
+
+    def __getitem__(self, key):
+        return self.els.get(key)
+
+
+class FXChainFactory:
+    """
+    Buduje FXChain z FX_CHAIN_SPEC. Spec jest kompilowany raz (conv_for
+    rozstrzygnięte, caps sparsowane) i cache'owany per (spec, FX_CAPS).
+    Monitor i generator idą przez input-selector do tego samego toru —
+    jedna instancja na pipeline, bez puli.
+    """
+
+    _compiled = {}
+
+    def __init__(self, spec=None, mbl_points=None):
+        self.spec       = spec or FX_CHAIN_SPEC
+        self.mbl_points = FX_CHAIN_MBL if mbl_points is None else mbl_points
+        self.steps      = self.compile(self.spec)
+        self._seq       = 0
+
+    @classmethod
+    def compile(cls, spec):
+        key = (id(spec), FX_CAPS)
+        steps = cls._compiled.get(key)
+        if steps is None:
+            steps = []
+            for k, plugin, props, _ in spec:
+                if isinstance(plugin, tuple):
+                    _, target, side = plugin
+                    sink_ok, src_ok = plugin_accepts_fx(target)
+                    if sink_ok if side == "sink" else src_ok:
+                        continue
+                    plugin = "audioconvert"
+                if k != "@chain" and "caps" in props:
+                    props = dict(props, caps=Gst.Caps.from_string(props["caps"]))
+                steps.append((k, plugin, props))
+            cls._compiled[key] = steps
+        return steps
+
+    @staticmethod
+    def chain_element(mid, prefix=""):
+        """Element modułu CHAIN_GST w ustawieniach neutralnych (bez dodania do binu)."""
+        cp, neutral, _ = CHAIN_GST[mid]
+        return mkgst(cp, f"{prefix}ch_{mid}", neutral)
+
+    def build(self, prefix="", with_mbl=True):
+        t0 = time.perf_counter()
+        self._seq += 1
+        b = Gst.Bin.new(f"{prefix}fx{self._seq}")
+
+        def lnk(a, c):
+            if a and c:
+                if not a.link(c): print(f"  [FXChain:{prefix}] link: {a.get_name()} -> {c.get_name()}")
+
+        els, chain_els = {}, {}
+        first = prev = entry = exit_el = None
+        for key, plugin, props in self.steps:
+            if key == "@chain":
+                if not LAZY_DSP:
+                    for mid in CHAIN_ORDER:
+                        el = self.chain_element(mid, prefix)
+                        if el: b.add(el)
+                        chain_els[mid] = el
+                entry, prev = prev, None     # segment entry → exit linkuje resolver
+                continue
+            el = mkgst(plugin, f"{prefix}{key}", props)
+            els[key] = el
             if not el:
                 continue
+            b.add(el)
+            if first is None: first = el
+            if entry is not None and exit_el is None: exit_el = el
+            lnk(prev, el); prev = el
+        # Domyślnie (brak aktywnych modułów) entry → exit bezpośrednio
+        lnk(entry, exit_el)
+
+        b.add_pad(Gst.GhostPad.new("sink", first.get_static_pad("sink")))
+        b.add_pad(Gst.GhostPad.new("src",  prev.get_static_pad("src")))
+
+        resolver = DSPAutoResolver(
+            pipeline    = b,
+            entry_el    = entry,
+            exit_el     = exit_el,
+            name_prefix = prefix.rstrip("_") or "main",
+        )
+        resolver.set_chain_elements(chain_els)
+        resolver.element_factory = lambda mid: self.chain_element(mid, prefix)
+        resolver.init_convs()
 
-            need_pre = meta.get("needs_conv_before", False)
-            if not need_pre and prev_meta and prev_meta.get("needs_conv_after", False):
-                need_pre = True
+        # LAZY_DSP: zamiast MBL fabryka dla LimiterRouter.register
+        mbls = {}
+        if with_mbl:
+            for pid, (up, dn, mprefix) in self.mbl_points.items():
+                mk = mbl_factory(b, pid, f"{prefix}{mprefix}")
+                mbls[pid] = mk if LAZY_DSP else mk()
 
-            if need_pre and conv_idx < len(self._convs):
-                sequence.append(self._convs[conv_idx]); conv_idx += 1
+        ms = (time.perf_counter() - t0) * 1000.0
+        n = len(b.children)
+        print(f"[FXChain:{prefix or 'main'}] zbudowany: {n} elementów, {ms:.1f} ms")
+        return FXChain(prefix, b, els, chain_els, resolver, mbls, ms)
 
-            sequence.append(el)
 
-            if meta.get("needs_conv_after", False):
-                next_mid  = optimal[i+1] if i+1 < len(optimal) else None
-                next_meta = DSP_META.get(next_mid, {}) if next_mid else {}
-                if not next_meta.get("float_required", False):
-                    if conv_idx < len(self._convs):
-                        sequence.append(self._convs[conv_idx]); conv_idx += 1
+# ============================================================================
+# GAPLESS DECK — dwa dekodery → concat / audiomixer, następny utwór prerollowany
+# ============================================================================
+# Gapless: plik lokalny N gra na decku A; deck B ładuje N+1 i linkuje się do
+# concat ZA padem A. concat blokuje B aż A da EOS, potem przełącza na granicy
+# próbki (adjust-base=True — running time ciągły).
+# Crossfade: oba decki → audiomixer. Pad decku B jest zablokowany (probe) aż
+# do startu przejścia; wtedy dostaje offset = bieżąca pozycja miksera, a
+# głośności padów miksera rampuje GstController (czasy = stream time padu).
+# Tor FX i wstrzyknięte MBL nie są dotykane: deck siedzi przed input-selectorem.
 
-            prev_meta = meta
+GAPLESS   = True
+CROSSFADE = 0.0    # s; 0 = gapless (concat), >0 = crossfade (audiomixer)
 
-        # ── 5. Podłącz: entry → [sequence] → exit ────────────────────────────
-        chain = [self.entry_el] + sequence + [self.exit_el]
 
-        # Ustaw NULL → READY przed linkowaniem (tylko elementy w środku)
-        for el in sequence:
-            el.set_state(Gst.State.NULL)
-            el.set_state(Gst.State.READY)
+class GaplessDeck:
+    """
+    Źródło plików dla input-selectora:
+        deck_a (uridecodebin) ─┬→ concat   → [src]   (gapless)
+        deck_b (uridecodebin) ─┴→ audiomixer → [src] (crossfade)
+    Nieużywany deck jest locked + NULL. on_switch(item) wołany w wątku GLib
+    main, gdy dźwięk przejdzie na przygotowany utwór.
+    """
+
+    TICK_MS = 200
+
+    def __init__(self, pipeline, on_switch=None):
+        self.pipeline  = pipeline
+        self.on_switch = on_switch
+        self.concat    = mkgst("concat", "deck_concat", {"adjust-base": True})
+        self.mixer     = mkgst("audiomixer", "deck_mix")
+        for el in (self.concat, self.mixer):
+            if el: pipeline.add(el)
+        self.concat.connect("notify::active-pad", self._on_active_pad)
+        self.decks  = []
+        for i, n in enumerate("ab"):
+            d = mkgst("uridecodebin", f"deck_{n}")
+            d.set_locked_state(True)
+            d.connect("pad-added", self._on_pad, i)
+            pipeline.add(d)
+            self.decks.append(d)
+        self._pads     = [None, None]   # sink pad concat/miksera per deck
+        self._dec_pads = [None, None]   # src pad dekodera per deck
+        self._blocks   = [None, None]   # id probe blokującego (crossfade, deck czekający)
+        self._items    = [None, None]   # indeks playlisty per deck
+        self._pending  = None           # (item, uri) — czeka aż aktywny deck da pad
+        self.active    = 0
+        self.xfade     = 0.0            # tryb bieżącego load(); zmiana od następnego load()
+        self._xfade_req = CROSSFADE
+        self._xfading  = False
+        self._xf_src   = None           # timeout _finish_xfade
+        self._tick_src = None
+        self._cpu_hist = []             # [(wall, cpu)] — próbki z _tick
+        self.stats     = {"loads": 0, "gapless": 0, "skips": 0, "xfades": []}
+
+    # ── Sterowanie ──────────────────────────────────────────────────────────
+
+    def set_crossfade(self, seconds):
+        """Długość crossfade (0 = gapless). Obowiązuje od następnego load()."""
+        if seconds > 0 and not GSTCONTROLLER_OK:
+            print("[Deck] crossfade wymaga GstController — zostaje gapless")
+            seconds = 0.0
+        self._xfade_req = float(seconds)
+
+    def out_key(self):
+        """Który pad input-selectora niesie bieżący tryb: 'file' (concat) / 'file_x' (mikser)."""
+        return "file_x" if self.xfade > 0 else "file"
+
+    def load(self, item, uri):
+        """Twardy start (pipeline w NULL): oba decki zwolnione, item na decku 0."""
+        self.reset()
+        self.xfade  = self._xfade_req
+        self.active = 0
+        self._arm(0, item, uri)
+        self.stats["loads"] += 1
+        if self.xfade > 0 and self._tick_src is None:
+            self._tick_src = GLib.timeout_add(self.TICK_MS, self._tick)
+
+    def prepare(self, item, uri):
+        """Preroll następnego utworu na wolnym decku."""
+        nxt = 1 - self.active
+        if self._items[nxt] == item or self._xfading:
+            return
+        self._release(nxt)
+        if self._pads[self.active] is None:
+            # Pad aktywnego decka jeszcze nie istnieje — musi być podpięty PIERWSZY
+            self._pending = (item, uri)
+            return
+        self._arm(nxt, item, uri)
+
+    def prepared(self):
+        """Indeks playlisty gotowy na wolnym decku albo None."""
+        nxt = 1 - self.active
+        ready = self._dec_pads[nxt] if self.xfade > 0 else self._pads[nxt]
+        return self._items[nxt] if ready is not None else None
+
+    def skip(self):
+        """Przejście na przygotowany utwór: crossfade od teraz albo EOS aktywnego padu concat."""
+        pad = self._pads[self.active]
+        if pad is None or self.prepared() is None:
+            return False
+        self.stats["skips"] += 1
+        if self.xfade > 0:
+            return self._start_xfade()
+        return pad.send_event(Gst.Event.new_eos())
+
+    def position(self):
+        """(ok, pos, dur) bieżącego utworu — z padu dekodera, nie z wyjścia miksera/concat."""
+        dpad = self._dec_pads[self.active]
+        if dpad is None:
+            return False, 0, 0
+        ok,  pos = dpad.query_position(Gst.Format.TIME)
+        ok2, dur = dpad.query_duration(Gst.Format.TIME)
+        return ok and ok2, pos, dur
+
+    def settle(self):
+        """
+        Przed seekiem FLUSH: crossfade w toku kończy się od razu (seek dotyczy
+        utworu wchodzącego), rampy zdjęte. Offset padu dekodera zeruje probe
+        FLUSH_STOP — po flushu running time miksera znów startuje od 0.
+        """
+        if self._xfading:
+            self._finish_xfade(1 - self.active)
+
+    def reset(self):
+        self._pending = None
+        self._xfading = False
+        if self._xf_src is not None:
+            GLib.source_remove(self._xf_src)
+            self._xf_src = None
+        if self._tick_src is not None:
+            GLib.source_remove(self._tick_src)
+            self._tick_src = None
+        for i in (0, 1):
+            self._release(i)
+
+    # ── Wewnętrzne ──────────────────────────────────────────────────────────
+
+    def _arm(self, i, item, uri):
+        d = self.decks[i]
+        d.set_property("uri", uri)
+        self._items[i] = item
+        d.set_locked_state(False)
+        d.sync_state_with_parent()
+
+    def _release(self, i):
+        d = self.decks[i]
+        d.set_locked_state(True)
+        d.set_state(Gst.State.NULL)
+        pad, self._pads[i] = self._pads[i], None
+        if pad:
+            pad.get_parent_element().release_request_pad(pad)
+        if self._dec_pads[i] is not None:
+            self._dec_pads[i].set_offset(0)
+        self._dec_pads[i] = None
+        self._blocks[i]   = None
+        self._items[i]    = None
+
+    def _request(self, el):
+        req = getattr(el, "request_pad_simple", None) or el.get_request_pad
+        return req("sink_%u")
+
+    def _on_pad(self, dec, pad, i):
+        caps = pad.get_current_caps() or pad.query_caps(None)
+        s = caps.get_structure(0) if caps and caps.get_size() else None
+        if s and not s.get_name().startswith("audio"):
+            return
+        if self._dec_pads[i] is not None:
+            return
+        self._dec_pads[i] = pad
+        pad.add_probe(Gst.PadProbeType.EVENT_FLUSH, self._on_flush, None)
+        if self.xfade > 0 and i != self.active:
+            # Crossfade: dekoder prerollowany, dane czekają na probe do startu przejścia
+            self._blocks[i] = pad.add_probe(Gst.PadProbeType.BLOCK_DOWNSTREAM,
+                                            lambda *a: Gst.PadProbeReturn.OK)
+            print(f"[Deck:{'ab'[i]}] prerolled (crossfade)")
+            return
+        sink = self._request(self.mixer if self.xfade > 0 else self.concat)
+        ret  = pad.link(sink)
+        self._pads[i] = sink
+        print(f"[Deck:{'ab'[i]}] pad link: {ret.value_name}")
+        if i == self.active and self._pending:
+            GLib.idle_add(self._arm_pending)
+
+    def _on_flush(self, pad, info, _data):
+        # Offset z _start_xfade dotyczy running time sprzed flusha — po seeku
+        # dane decka zostałyby wysłane w "przyszłość" i mikser czekałby na nie
+        ev = info.get_event()
+        if ev and ev.type == Gst.EventType.FLUSH_STOP and pad.get_offset():
+            pad.set_offset(0)
+        return Gst.PadProbeReturn.OK
+
+    def _arm_pending(self):
+        if self._pending:
+            item, uri = self._pending
+            self._pending = None
+            self.prepare(item, uri)
+        return False
+
+    def _on_active_pad(self, concat, pspec):
+        # wątek streamingu — przełączenie obsługujemy w wątku GLib main
+        GLib.idle_add(self._switched, concat.get_property("active-pad"))
+
+    def _switched(self, pad):
+        nxt = 1 - self.active
+        if pad is None or pad is not self._pads[nxt]:
+            return False
+        old, self.active = self.active, nxt
+        self._release(old)
+        self.stats["gapless"] += 1
+        if self.on_switch:
+            self.on_switch(self._items[self.active])
+        return False
+
+    # ── Crossfade ───────────────────────────────────────────────────────────
+
+    def _cpu(self):
+        ru = resource.getrusage(resource.RUSAGE_SELF)
+        return ru.ru_utime + ru.ru_stime
+
+    def _tick(self):
+        """Start crossfade gdy do końca utworu zostało ≤ xfade; próbki CPU do raportu."""
+        if self.xfade <= 0:
+            self._tick_src = None
+            return False
+        self._cpu_hist.append((time.perf_counter(), self._cpu()))
+        del self._cpu_hist[:-50]
+        if not self._xfading and self.prepared() is not None:
+            ok, pos, dur = self.position()
+            if ok and dur > 0 and dur - pos <= self.xfade * Gst.SECOND:
+                self._start_xfade()
+        return True
+
+    def _ramp(self, pad, t0, v0, v1):
+        cs = GstController.InterpolationControlSource()
+        cs.set_property("mode", GstController.InterpolationMode.LINEAR)
+        pad.add_control_binding(GstController.DirectControlBinding.new_absolute(pad, "volume", cs))
+        cs.set(t0, v0)
+        cs.set(t0 + int(self.xfade * Gst.SECOND), v1)
+
+    def _start_xfade(self):
+        nxt, old = 1 - self.active, self.active
+        dpad, out = self._dec_pads[nxt], self._pads[old]
+        if dpad is None or out is None or self._xfading:
+            return False
+        self._xfading = True
+        # Wejście dołącza w bieżącym running time miksera
+        ok, now = self.mixer.get_static_pad("src").query_position(Gst.Format.TIME)
+        dpad.set_offset(now if ok else 0)
+        mpad = self._request(self.mixer)
+        mpad.set_property("volume", 0.0)
+        dpad.link(mpad); self._pads[nxt] = mpad
+        # Rampy w stream time każdego padu: wyjście od bieżącej pozycji, wejście od 0
+        ok2, pos = self._dec_pads[old].query_position(Gst.Format.TIME)
+        self._ramp(out,  pos if ok2 else 0, 1.0, 0.0)
+        self._ramp(mpad, 0, 0.0, 1.0)
+        if self._blocks[nxt] is not None:
+            dpad.remove_probe(self._blocks[nxt]); self._blocks[nxt] = None
+        base = self._cpu_hist[-10:] or [(time.perf_counter(), self._cpu())]
+        self._xf_t0 = (time.perf_counter(), self._cpu(), base[0], base[-1])
+        self.active = nxt
+        self._xf_src = GLib.timeout_add(int(self.xfade * 1000) + 250, self._on_xfade_done, old)
+        if self.on_switch:
+            self.on_switch(self._items[nxt])
+        return True
+
+    def _on_xfade_done(self, old):
+        self._xf_src = None
+        return self._finish_xfade(old)
+
+    def _finish_xfade(self, old):
+        """Po rampie: zwolnij deck wychodzący, zaloguj CPU overlapu i szczytowe RSS."""
+        if self._xf_src is not None:
+            GLib.source_remove(self._xf_src)
+            self._xf_src = None
+        self._release(old)
+        self._xfading = False
+        # Rampa wejścia jest w stream time — seek do < xfade odegrałby ją znowu
+        pad = self._pads[self.active]
+        cb = pad.get_control_binding("volume") if pad else None
+        if cb:
+            pad.remove_control_binding(cb)
+            pad.set_property("volume", 1.0)
+        w0, c0, (bw0, bc0), (bw1, bc1) = self._xf_t0
+        w1, c1 = time.perf_counter(), self._cpu()
+        cpu_x = (c1 - c0) / max(w1 - w0, 1e-6) * 100.0
+        cpu_b = (bc1 - bc0) / (bw1 - bw0) * 100.0 if bw1 > bw0 else 0.0
+        rss   = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+        self.stats["xfades"].append({"cpu_pct": cpu_x, "base_pct": cpu_b, "maxrss_mb": rss})
+        self.stats["gapless"] += 1
+        print(f"[Deck] crossfade {self.xfade:.1f}s: CPU {cpu_x:.1f}% "
+              f"(przed: {cpu_b:.1f}%, {cpu_x-cpu_b:+.1f}%)  maxrss {rss:.0f} MB")
+        return False
+
+
+# ============================================================================
+# AUTOMATYKA PARAMETRÓW — rampy GstController zamiast kroków z QTimer
+# ============================================================================
+# Każdy (element, właściwość) dostaje przy pierwszym użyciu
+# InterpolationControlSource + DirectControlBinding (absolute — wartości
+# w jednostkach właściwości). Punkty są w stream time elementu; wartość
+# liczy wątek streamingu per bufor (sync_values), więc rampa nie zależy od
+# zajętego wątku Qt i nie ma zippera przy skokach suwaka.
+# Po podpięciu bindingu set_property() jest nadpisywane przy każdym buforze —
+# wszystkie zapisy do takiej właściwości MUSZĄ iść przez ParamAutomation.
+
+AUTOMATION_DEZIPPER_MS = 30     # domyślna rampa dla pojedynczych zapisów (suwaki)
+EQ_RAMP_MS             = 80     # rampa pasm EQ (~ interwał spectrum / SmartEQ)
+
+
+class ParamAutomation:
+    """
+    Rampy parametrów na zegarze potoku.
+        ramp(el, prop, v, ms)   — z bieżącej wartości do v w ms
+        set(el, prop, v)        — to samo z krótką rampą de-zipper
+        curve(el, prop, pts)    — łamana [(offset_ns, v), ...] od teraz (lub od t0)
+        hold(el, prop)          — zamrożenie na bieżącej wartości
+    Bez GstController wszystko degraduje do set_property (skok).
+    """
+
+    def __init__(self):
+        self._cs    = {}      # (el, prop) -> InterpolationControlSource
+        self.stats  = {"ramps": 0, "points": 0, "direct": 0}
+
+    @property
+    def ok(self):
+        return GSTCONTROLLER_OK
+
+    def _source(self, el, prop):
+        key = (el, prop)
+        cs = self._cs.get(key)
+        if cs is None and GSTCONTROLLER_OK:
+            try:
+                cs = GstController.InterpolationControlSource()
+                cs.set_property("mode", GstController.InterpolationMode.LINEAR)
+                el.add_control_binding(
+                    GstController.DirectControlBinding.new_absolute(el, prop, cs))
+                self._cs[key] = cs
+            except Exception as e:
+                print(f"  [Auto] {el.get_name()}.{prop}: binding FAIL ({e}) — zapis bezpośredni")
+                return None
+        return cs
+
+    def now(self, el):
+        """
+        Stream time czoła przetwarzania dla el: zapytanie pozycji w górę toru
+        (źródło / concat / mikser). Rampa startuje tam, gdzie zadziałałby
+        set_property — bez skoku wartości.
+        """
+        pad = el.get_static_pad("src")
+        ok, pos = pad.query_position(Gst.Format.TIME) if pad else (False, 0)
+        return pos if ok and pos >= 0 else None
+
+    def _direct(self, el, prop, value):
+        self.stats["direct"] += 1
+        try: el.set_property(prop, value)
+        except Exception as e: print(f"  [Auto] {el.get_name()}.{prop}={value}: {e}")
+
+    def curve(self, el, prop, points, t0=None):
+        """Zastępuje automatykę łamaną points=[(offset_ns, wartość)...] od t0 (domyślnie teraz)."""
+        if el is None:
+            return None
+        cs = self._source(el, prop)
+        t0 = self.now(el) if t0 is None else t0
+        if cs is None or t0 is None:
+            # Brak kontrolera albo nic nie płynie — od razu wartość końcowa,
+            # jeden punkt w 0 trzyma ją dla każdego przyszłego stream time
+            if cs is not None:
+                cs.unset_all(); cs.set(0, float(points[-1][1]))
+            self._direct(el, prop, points[-1][1])
+            return None
+        cs.unset_all()
+        for dt, v in points:
+            cs.set(t0 + int(dt), float(v))
+        self.stats["ramps"]  += 1
+        self.stats["points"] += len(points)
+        return t0
+
+    def ramp(self, el, prop, value, ms, start=None):
+        """Rampa liniowa z bieżącej (lub start) wartości do value w ms."""
+        if el is None:
+            return None
+        v0 = el.get_property(prop) if start is None else start
+        return self.curve(el, prop, [(0, v0), (int(ms * Gst.MSECOND), value)])
+
+    def set(self, el, prop, value, ms=AUTOMATION_DEZIPPER_MS):
+        return self.ramp(el, prop, value, ms)
+
+    def hold(self, el, prop):
+        if el is not None:
+            self.curve(el, prop, [(0, el.get_property(prop))])
+
+
+# ============================================================================
+# SPEKTRUM — ekstrakcja magnitude do float32 ndarray
+# ============================================================================
+# Kolejność: get_value (lista z GstValueList, overrides gst-python) →
+# get_list (GValueArray, bez overrides). Bez parsowania tekstu struktury:
+# gdy żadna ścieżka nie działa, jeden komunikat i ekstrakcja wyłączona
+# (wizualizacja zostaje na ANALYSIS_ENGINE="fft").
+# SPECTRUM_STATS mówi, która ścieżka faktycznie działa na tej instalacji.
+
+SPECTRUM_FLOOR = -80.0          # = threshold elementu spectrum
+SPECTRUM_STATS = {"value": 0, "list": 0, "miss": 0}
+_spectrum_off = False
+
+
+def spectrum_magnitudes(s):
+    """Magnitude (dB) ze struktury 'spectrum' jako float32 ndarray albo None."""
+    global _spectrum_off
+    if _spectrum_off:
+        return None
+    try:
+        v = s.get_value("magnitude")
+        if v is not None:
+            SPECTRUM_STATS["value"] += 1
+            return np.asarray(v, dtype=np.float32)
+    except TypeError:
+        pass
+    try:
+        ok, arr = s.get_list("magnitude")
+        if ok and arr is not None:
+            SPECTRUM_STATS["list"] += 1
+            vals = getattr(arr, "values", None)
+            return np.fromiter((vals if vals is not None else
+                                (arr.get_nth(i) for i in range(arr.n_values))),
+                               dtype=np.float32)
+    except (TypeError, AttributeError):
+        pass
+    SPECTRUM_STATS["miss"] += 1
+    if s.has_field("magnitude"):
+        # Pole jest, ale ani GstValueList, ani GValueArray nie przechodzi przez
+        # to PyGObject — każda następna wiadomość skończyłaby tak samo
+        _spectrum_off = True
+        print("[Spectrum] magnitude nieczytelne (brak GstValueList/GValueArray w PyGObject) "
+              "— ekstrakcja wyłączona, użyj ANALYSIS_ENGINE=\"fft\"")
+    return None
+
+
+def spectrum_normalize(mag, floor=SPECTRUM_FLOOR):
+    """dB → 0..1 względem progu spectrum (wektorowo)."""
+    return np.clip((mag - floor) * (1.0 / -floor), 0.0, 1.0)
+
+
+# ============================================================================
+# ANALIZA FFT — appsink → okno Hann z nakładaniem → rfft → pasma log
+# ============================================================================
+# Zastępuje element spectrum (64 liniowe pasma przez bus). Ramki z gałęzi tee
+# trafiają do appsink; wątek streamingu liczy rfft co ANALYSIS_HOP próbek
+# (okno ANALYSIS_N, nakładanie N-HOP) i mnoży widmo mocy przez gotowe
+# macierze pasm:
+#   eq  — 10 pasm wokół środków equalizer-10bands (granice w połowie oktawy)
+#   mbl — pasma MBLIMIT_BANDS (te same częstotliwości podziału co limiter)
+#   viz — VIZ_BARS pasm log dla MatrixVisualizer
+# Wynik (dB) ląduje w jednym AnalysisRing; konsumenci czytają najnowszą
+# ramkę we własnym tempie — zero wiadomości na bus.
+
+ANALYSIS_ENGINE = "fft"         # "fft" | "spectrum" (dawny element spectrum + bus)
+# Pre-stage analizy: audioconvert → audioresample → mono F32 @ ANALYSIS_RATE,
+# wspólny dla appsink i spectrum (4.4× mniej danych niż FX_CAPS stereo 48 kHz)
+ANALYSIS_RATE        = 22050
+ANALYSIS_INTERVAL_MS = 33       # co ile ms ramka analizy (hop FFT / interval spectrum)
+ANALYSIS_N      = 2048          # okno FFT (22.05 kHz → 10.8 Hz/bin)
+ANALYSIS_CAPS   = (f"audio/x-raw,format={FX_FORMAT},rate={ANALYSIS_RATE},"
+                   f"channels=1,layout=interleaved")
+ANALYSIS_RING   = 64            # ramek w ringu
+VIZ_BARS        = 64
+EQ_CENTERS      = (29, 59, 119, 237, 474, 947, 1889, 3770, 7523, 15011)  # equalizer-10bands
+
+
+def band_matrix(edges, n_fft, rate):
+    """
+    Macierz (len(edges)-1, n_fft//2+1): suma mocy binów w [lo, hi).
+    Pasmo węższe niż bin bierze najbliższy bin — brak pustych wierszy.
+    Wiersze mają po kilka-kilkadziesiąt niezerowych wag (rzadka w treści,
+    gęsta w pamięci — bez scipy, a matmul 64×2049 to ułamek ms).
+    """
+    freqs = np.fft.rfftfreq(n_fft, 1.0 / rate)
+    m = np.zeros((len(edges) - 1, freqs.size), dtype=np.float32)
+    for i, (lo, hi) in enumerate(zip(edges, edges[1:])):
+        sel = (freqs >= lo) & (freqs < hi)
+        if not sel.any():
+            sel = np.zeros_like(sel); sel[np.argmin(np.abs(freqs - math.sqrt(lo * hi)))] = True
+        m[i, sel] = 1.0
+    return m
+
+
+def analysis_bands(rate):
+    """
+    Granice pasm per zestaw: {"eq": edges, "mbl": edges, "viz": edges}.
+    Pasma EQ ze środkiem powyżej Nyquista zostają (stała liczba 10), ale
+    SpectrumAnalyzer oznacza je NaN — SmartEQ ich nie koryguje.
+    """
+    nyq = rate / 2.0
+    c   = np.asarray(EQ_CENTERS, dtype=np.float64)
+    eq  = np.concatenate(([c[0] / math.sqrt(2)], np.sqrt(c[:-1] * c[1:]), [c[-1] * math.sqrt(2)]))
+    eq  = np.minimum(eq, nyq)
+    xo  = [b["f_hi"] for b in MBLIMIT_BANDS if b["f_hi"]]
+    mbl = [20.0] + xo + [min(nyq, 20000.0)]
+    viz = np.geomspace(30.0, min(nyq, 16000.0), VIZ_BARS + 1)
+    return {"eq": eq, "mbl": np.asarray(mbl), "viz": viz}
+
+
+class AnalysisRing:
+    """
+    Ring ramek analizy: per zestaw pasm tablica (ANALYSIS_RING, nb) float32.
+    Jeden pisarz (wątek streamingu), wielu czytelników (pętla GLib).
+    seq rośnie monotonicznie — czytelnik porównuje ze swoim ostatnim seq.
+    """
+
+    def __init__(self, sizes, depth=ANALYSIS_RING):
+        self.depth = depth
+        self.data  = {k: np.full((depth, n), SPECTRUM_FLOOR, dtype=np.float32)
+                      for k, n in sizes.items()}
+        self.seq   = 0
+        self._lock = threading.Lock()
+
+    def write(self, frames):
+        with self._lock:
+            i = self.seq % self.depth
+            for k, v in frames.items():
+                self.data[k][i] = v
+            self.seq += 1
+
+    def latest(self, key):
+        """(seq, kopia najnowszej ramki) — seq 0 = jeszcze nic."""
+        with self._lock:
+            if not self.seq:
+                return 0, None
+            return self.seq, self.data[key][(self.seq - 1) % self.depth].copy()
+
+    def history(self, key, n):
+        """Ostatnie n ramek (najstarsza pierwsza) — np. do uśredniania."""
+        with self._lock:
+            n = min(n, self.seq, self.depth)
+            idx = (np.arange(self.seq - n, self.seq)) % self.depth
+            return self.data[key][idx].copy()
+
+
+class SpectrumAnalyzer:
+    """
+    Gałąź analizy: [q_sp → pre-stage] → appsink (ANALYSIS_CAPS) → numpy.
+        analyzer.sink   — element do wpięcia za pre-stage (None gdy name=None — bench)
+        analyzer.ring   — AnalysisRing z kluczami "eq", "mbl", "viz" (dB)
+    channels > 1 → downmix w numpy (średnia kanałów).
+    """
+
+    def __init__(self, name="an_sink", rate=ANALYSIS_RATE, channels=1,
+                 n_fft=ANALYSIS_N, interval_ms=ANALYSIS_INTERVAL_MS):
+        self.rate, self.n_fft, self.channels = rate, n_fft, channels
+        self.hop    = max(1, min(n_fft, rate * interval_ms // 1000))
+        self.window = np.hanning(n_fft).astype(np.float32)
+        # skala: sinus o amplitudzie 1 → 0 dB w swoim paśmie (suma binów / ENBW okna)
+        enbw = n_fft * float((self.window ** 2).sum()) / float(self.window.sum()) ** 2
+        self._scale = (2.0 / float(self.window.sum())) ** 2 / enbw
+        bands       = analysis_bands(rate)
+        self.mats   = {k: band_matrix(e, n_fft, rate) for k, e in bands.items()}
+        # pasma EQ ze środkiem ≥ Nyquist — NaN w ringu
+        self._nan   = {"eq": np.asarray(EQ_CENTERS) >= rate / 2.0}
+        self.ring   = AnalysisRing({k: m.shape[0] for k, m in self.mats.items()})
+        self._buf   = np.zeros(n_fft + rate, dtype=np.float32)   # mono, zapas na 1 s
+        self._fill  = 0
+        self.stats  = {"frames": 0, "fft_ms": 0.0}
+        self.sink   = None
+        if name:
+            self.sink = mkgst("appsink", name, {
+                "emit-signals": True, "sync": False, "max-buffers": 8, "drop": True,
+                "caps": Gst.Caps.from_string(
+                    f"audio/x-raw,format={FX_FORMAT},rate={rate},"
+                    f"channels={channels},layout=interleaved")})
+            self.sink.connect("new-sample", self._on_sample)
+
+    def _on_sample(self, sink):
+        sample = sink.emit("pull-sample")
+        if sample is None:
+            return Gst.FlowReturn.EOS
+        buf = sample.get_buffer()
+        ok, info = buf.map(Gst.MapFlags.READ)
+        if not ok:
+            return Gst.FlowReturn.OK
+        try:
+            x = np.frombuffer(info.data, dtype=np.float32)
+            self._push(x if self.channels == 1 else x.reshape(-1, self.channels).mean(axis=1))
+        finally:
+            buf.unmap(info)
+        return Gst.FlowReturn.OK
+
+    def _push(self, mono):
+        if mono.size > self.rate:                    # bufor > 1 s — wystarczy ogon
+            mono = mono[-self.rate:]
+        n = mono.size
+        self._buf[self._fill:self._fill + n] = mono; self._fill += n
+        start = 0
+        while self._fill - start >= self.n_fft:
+            self._analyze(self._buf[start:start + self.n_fft])
+            start += self.hop
+        if start:
+            rest = self._fill - start
+            self._buf[:rest] = self._buf[start:self._fill]; self._fill = rest
+
+    def _analyze(self, frame):
+        t0 = time.perf_counter()
+        spec = np.fft.rfft(frame * self.window)
+        pwr  = (spec.real * spec.real + spec.imag * spec.imag).astype(np.float32) * self._scale
+        out  = {k: np.maximum(10.0 * np.log10(m @ pwr + 1e-12), SPECTRUM_FLOOR)
+                for k, m in self.mats.items()}
+        for k, mask in self._nan.items():
+            out[k][mask] = np.nan
+        self.ring.write(out)
+        self.stats["frames"] += 1
+        self.stats["fft_ms"] += (time.perf_counter() - t0) * 1000.0
+
+    def reset(self):
+        self._fill = 0
+
+
+class AnalysisHub:
+    """
+    Licznik subskrypcji analizy. Gdy nikt nie słucha, valve przed kolejką
+    analizy przechodzi w drop=True — appsink/spectrum nie dostaje buforów,
+    FFT i wiadomości stoją. subscribe()/unsubscribe() zliczają referencje;
+    set(name, on) to idempotentna subskrypcja dla konsumentów ze stanem
+    (widoczny wizualizer, DYNAMIC w SmartEQ).
+    CPU procesu liczone per stan (zbiór subskrybentów) — report() pokazuje
+    ile kosztuje każdy stan względem stanu bez subskrybentów.
+    """
+
+    def __init__(self, valve, on_change=None):
+        self.valve     = valve
+        self.on_change = on_change
+        self.subs      = {}          # nazwa -> liczba referencji
+        self.cpu       = {}          # stan -> [cpu_s, wall_s]
+        self._state    = None
+        self._mark     = (time.perf_counter(), self._cpu_now())
+        self._apply()
+
+    @staticmethod
+    def _cpu_now():
+        ru = resource.getrusage(resource.RUSAGE_SELF)
+        return ru.ru_utime + ru.ru_stime
+
+    @property
+    def active(self):
+        return bool(self.subs)
+
+    def subscribe(self, name):
+        self.subs[name] = self.subs.get(name, 0) + 1
+        if self.subs[name] == 1:
+            self._apply()
+
+    def unsubscribe(self, name):
+        n = self.subs.get(name, 0) - 1
+        if n > 0:
+            self.subs[name] = n
+        elif name in self.subs:
+            del self.subs[name]
+            self._apply()
+
+    def set(self, name, on):
+        if on and name not in self.subs:
+            self.subscribe(name)
+        elif not on and name in self.subs:
+            self.subs.pop(name); self._apply()
+
+    def _account(self):
+        w, c = time.perf_counter(), self._cpu_now()
+        if self._state is not None:
+            acc = self.cpu.setdefault(self._state, [0.0, 0.0])
+            acc[0] += c - self._mark[1]; acc[1] += w - self._mark[0]
+        self._mark = (w, c)
+
+    def _apply(self):
+        self._account()
+        state = "+".join(sorted(self.subs)) or "—"
+        if state == self._state:
+            return
+        self._state = state
+        if self.valve:
+            self.valve.set_property("drop", not self.active)
+        print(f"[Analysis] subskrybenci: {state}  ({'aktywna' if self.active else 'valve drop'})")
+        if self.on_change:
+            self.on_change(self.active)
+
+    def report(self):
+        self._account()
+        idle = self.cpu.get("—")
+        base = idle[0] / idle[1] * 100.0 if idle and idle[1] > 0 else None
+        for st, (c, w) in sorted(self.cpu.items()):
+            if w <= 0: continue
+            pct = c / w * 100.0
+            rel = f"  (+{pct-base:.1f}% vs brak subskrybentów)" if base is not None and st != "—" else ""
+            print(f"  [Analysis:{st}] CPU {pct:5.1f}%  przez {w:6.1f} s{rel}")
+
+
+# ============================================================================
+# BUS DISPATCHER — filtr w sync handlerze + migawka per klatka dla UI
+# ============================================================================
+# Sync handler działa w wątku, który wysłał wiadomość (streaming). Tu:
+#   • odrzucamy szum (state-changed ze 100+ elementów, stream-status, qos, tag…)
+#   • level/spectrum parsujemy od razu do migawki pod lockiem i DROP —
+#     do pętli GLib trafia tylko to, co naprawdę obsługuje _on_bus (EOS, ERROR…)
+# Migawkę oddaje _frame co FRAME_MS: ostatnia wartość per nazwa elementu
+# level i ostatnie widmo — niezależnie od tego, ile wiadomości przyszło.
+
+BUS_DROP = {
+    Gst.MessageType.STREAM_STATUS, Gst.MessageType.QOS, Gst.MessageType.TAG,
+    Gst.MessageType.ASYNC_START,   Gst.MessageType.DURATION_CHANGED,
+    Gst.MessageType.STREAM_START,  Gst.MessageType.PROGRESS,
+}
+
+
+class BusDispatcher:
+    """
+    Dispatcher wiadomości bus głównego pipeline.
+        route(name, handler)  — handler(rms, peak) dla elementu level o tej nazwie
+        on_spectrum(struct)   — ostatnie widmo z klatki
+        rates()               — wiadomości/s per typ od poprzedniego wywołania
+    Handlery wołane w wątku GLib main, najwyżej raz na klatkę.
+    """
+
+    FRAME_MS = 33
+
+    def __init__(self, pipeline):
+        self.pipeline    = pipeline
+        self.on_spectrum = None
+        self._routes   = {}          # nazwa elementu level -> handler(rms, peak)
+        self._lock     = threading.Lock()
+        self._levels   = {}          # nazwa -> (rms, peak) — ostatnie w klatce
+        self._spec     = None        # ostatnia struktura spectrum w klatce
+        self.counts    = {}          # typ (nick) -> liczba wszystkich wiadomości
+        self.dropped   = 0
+        self.coalesced = 0           # level/spectrum nadpisane przed dostarczeniem
+        self._rate_t   = time.perf_counter()
+        self._rate_c   = {}
+        pipeline.get_bus().set_sync_handler(self._sync)
+        self._tick_src = GLib.timeout_add(self.FRAME_MS, self._frame)
+
+    # ── Indeks nazwa → handler ──────────────────────────────────────────────
+
+    def route(self, name, handler):
+        self._routes[name] = handler
+
+    def unroute(self, name):
+        self._routes.pop(name, None)
+
+    def route_limiters(self, router):
+        """Indeks level → node dla MBL routera; leniwe punkty dopisują się przy budowie."""
+        for pid in router.built_points():
+            self.route_mbl(pid, router.peek(pid))
+        router.on_built.append(self.route_mbl)
+
+    def route_mbl(self, pid, mbl):
+        for node in mbl.nodes:
+            if node._level:
+                self.route(node._level.get_name(), node.update_levels)
+
+    # ── Wątek streamingu ────────────────────────────────────────────────────
+
+    def _sync(self, bus, msg, *args):
+        t    = msg.type
+        nick = t.first_value_nick
+        with self._lock:
+            self.counts[nick] = self.counts.get(nick, 0) + 1
+        if t == Gst.MessageType.ELEMENT:
+            s = msg.get_structure()
+            name = s.get_name() if s else ""
+            if name == "level":
+                h = self._routes.get(msg.src.get_name())
+                if h is None:
+                    return self._drop()
+                try: lv = (s.get_value("rms"), s.get_value("peak"))
+                except TypeError: return self._drop()
+                with self._lock:
+                    self.coalesced += msg.src.get_name() in self._levels
+                    self._levels[msg.src.get_name()] = lv
+                return self._drop()
+            if name == "spectrum":
+                with self._lock:
+                    self.coalesced += self._spec is not None
+                    self._spec = s.copy()
+                return self._drop()
+            return Gst.BusSyncReply.PASS
+        if t == Gst.MessageType.STATE_CHANGED and msg.src is not self.pipeline:
+            return self._drop()
+        if t in BUS_DROP:
+            return self._drop()
+        return Gst.BusSyncReply.PASS
+
+    def _drop(self):
+        with self._lock:
+            self.dropped += 1
+        return Gst.BusSyncReply.DROP
+
+    # ── Wątek GLib main ─────────────────────────────────────────────────────
+
+    def _frame(self):
+        with self._lock:
+            levels, self._levels = self._levels, {}
+            spec,   self._spec   = self._spec, None
+        for name, (rms, peak) in levels.items():
+            h = self._routes.get(name)
+            if h: h(rms, peak)
+        if spec is not None and self.on_spectrum:
+            self.on_spectrum(spec)
+        return True
+
+    def rates(self):
+        """{typ: wiadomości/s} od poprzedniego wywołania."""
+        now = time.perf_counter()
+        with self._lock:
+            cur = dict(self.counts)
+        dt = max(now - self._rate_t, 1e-6)
+        out = {k: (v - self._rate_c.get(k, 0)) / dt for k, v in cur.items()}
+        self._rate_t, self._rate_c = now, cur
+        return out
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self.counts)
+            dropped, coalesced = self.dropped, self.coalesced
+        return {"total": sum(counts.values()), "dropped": dropped,
+                "coalesced": coalesced, "counts": counts, "rates": self.rates()}
+
+    def stop(self):
+        if self._tick_src is not None:
+            GLib.source_remove(self._tick_src); self._tick_src = None
+        self.pipeline.get_bus().set_sync_handler(None)
+
 
-        ok = True
-        for a, b in zip(chain, chain[1:]):
-            if not a.link(b):
-                print(f"  [AutoResolver] BŁĄD link: {a.get_name()} → {b.get_name()}")
-                ok = False
+# ============================================================================
+# TELEMETRIA KOLEJEK — current-level-* co INTERVAL_MS
+# ============================================================================
 
-        if ok:
-            print(f"  łańcuch: {' → '.join(e.get_name() for e in chain)}")
+class QueueTelemetry:
+    """
+    Próbkuje current-level-buffers/bytes/time zarejestrowanych kolejek.
+    metrics[name] = {"buffers", "bytes", "time_ms", "fill", "max_fill",
+                     "overruns", "underruns"}
+    fill = zajętość względem najciaśniejszego niezerowego limitu (0..1).
+    overrun/underrun liczone z sygnałów queue (wątek streamingu).
+    """
 
-        # ── 6. Synchronizuj elementy ze stanem pipeline (bez zatrzymywania src) ─
-        for el in sequence:
-            el.sync_state_with_parent()
+    INTERVAL_MS = 500
 
-        # ── Re-wstrzyknij MBL po przebudowie ─────────────────────────────────
-        for mbl in _mbl_to_reinject:
-            if mbl._upstream and mbl._downstream:
-                mbl.inject(mbl._upstream, mbl._downstream)
+    def __init__(self):
+        self.queues  = {}
+        self.metrics = {}
+        self._src    = None
 
-        return optimal
+    def add(self, q, name=None):
+        if q is None:
+            return
+        name = name or q.get_name()
+        self.queues[name] = q
+        m = self.metrics[name] = {"buffers": 0, "bytes": 0, "time_ms": 0.0, "fill": 0.0,
+                                  "max_fill": 0.0, "overruns": 0, "underruns": 0}
+        q.connect("overrun",  lambda *a: m.__setitem__("overruns",  m["overruns"] + 1))
+        q.connect("underrun", lambda *a: m.__setitem__("underruns", m["underruns"] + 1))
+
+    def start(self):
+        if self._src is None:
+            self._src = GLib.timeout_add(self.INTERVAL_MS, self.sample)
+
+    def stop(self):
+        if self._src is not None:
+            GLib.source_remove(self._src); self._src = None
+
+    def sample(self):
+        for name, q in self.queues.items():
+            m = self.metrics[name]
+            cur = (q.get_property("current-level-buffers"), q.get_property("current-level-bytes"),
+                   q.get_property("current-level-time"))
+            lim = (q.get_property("max-size-buffers"), q.get_property("max-size-bytes"),
+                   q.get_property("max-size-time"))
+            fill = max((c / l for c, l in zip(cur, lim) if l), default=0.0)
+            m.update(buffers=cur[0], bytes=cur[1], time_ms=cur[2] / 1e6, fill=fill,
+                     max_fill=max(m["max_fill"], fill))
+        return True
 
-    def get_current_order(self):
-        return list(self._current_order) if self._current_order else []
+    def snapshot(self):
+        return {n: dict(m) for n, m in self.metrics.items()}
+
+    def report(self):
+        for n, m in self.metrics.items():
+            print(f"  [Queue:{n}] fill {m['fill']*100:5.1f}% (max {m['max_fill']*100:5.1f}%)  "
+                  f"{m['buffers']} buf / {m['time_ms']:.1f} ms  "
+                  f"overrun {m['overruns']}  underrun {m['underruns']}")
 
-    def format_chain_info(self):
-        if not self._current_order:
-            return "— brak aktywnych —"
-        return " → ".join(CHAIN_DEFS.get(m,(m,))[0] for m in self._current_order)
 
 # ============================================================================
 # UTILITIES
@@ -4225,6 +6827,23 @@ def cleanup_virtual_sink():
                 subprocess.run(['pactl','unload-module',line.split()[0]])
     except: pass
 
+def rss_mb():
+    """Bieżące RSS procesu (MB) z /proc; poza Linuksem szczytowe ru_maxrss."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1048576.0
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+def iterate_recurse(bin_):
+    """Wszystkie elementy binu rekurencyjnie (lista)."""
+    out = []
+    for el in bin_.children:
+        out.append(el)
+        if isinstance(el, Gst.Bin):
+            out.extend(iterate_recurse(el))
+    return out
+
 def mkgst(plugin, name, props=None):
     el=Gst.ElementFactory.make(plugin,name)
     if not el:
@@ -4352,6 +6971,175 @@ class RadioSearchDialog(QDialog):
     def get_selected(self):
         return [i.data(Qt.ItemDataRole.UserRole) for i in self.rl.selectedItems()]
 
+# ============================================================================
+# VIZ PARTICLES — cząsteczki jako tablice strukturalne NumPy
+# ============================================================================
+# Każda warstwa cząsteczkowa MatrixVisualizer trzyma jedną tablicę strukturalną.
+# Ruch, spawn i usuwanie martwych to operacje na całych kolumnach, a rysowanie
+# to kilka wywołań QPainter niezależnie od liczby cząsteczek:
+#   starfield    — jedno drawPoints(QPolygonF) okrągłym piórem ⌀4
+#   bubbles      — drawPoints per kubełek promienia (co 0.5 px, pióro = średnica)
+#   digital_rain — jedno drawPixmapFragments z atlasu glifów (QFont per rozmiar, raz)
+
+VIZ_PARTICLES = {"digital_rain": 40, "bubbles": 20, "starfield": 100}   # maks. per warstwa
+VIZ_SPAWN_FRAMES = 100          # pełna pula po ~tylu klatkach (min. 1 cząsteczka/klatkę)
+
+RAIN_DT   = np.dtype([("x", "f4"), ("y", "f4"), ("v", "f4"), ("size", "i1")])
+BUBBLE_DT = np.dtype([("x", "f4"), ("y", "f4"), ("r", "f4"), ("v", "f4")])
+STAR_DT   = np.dtype([("a", "f4"), ("r", "f4")])
+
+
+class ParticleLayer:
+    """Pula cząsteczek jednej warstwy: tablica strukturalna + fabryka nowych."""
+
+    def __init__(self, dtype, cap, spawn):
+        self.a     = np.zeros(0, dtype=dtype)
+        self.cap   = int(cap)
+        self.spawn = spawn       # spawn(n, w, h) → tablica dtype (n,)
+
+    def fill(self, w, h):
+        n = min(max(1, self.cap // VIZ_SPAWN_FRAMES), self.cap - self.a.size)
+        if n > 0:
+            self.a = np.concatenate([self.a, self.spawn(n, w, h)])
+        return self.a
+
+    def keep(self, mask):
+        self.a = self.a[mask]
+
+
+class PointBuffer:
+    """
+    QPolygonF z widokiem NumPy (n, 2) float64 na jego punkty — współrzędne
+    zapisywane wektorowo, bez obiektu QPointF na punkt. Bufor jest reużywany;
+    realokacja tylko przy zmianie n.
+    """
+
+    def __init__(self):
+        self.poly = QPolygonF()
+        self.xy   = np.zeros((0, 2))
+
+    def view(self, n):
+        if n != self.xy.shape[0]:
+            self.poly.fill(QPointF(), n)
+            if n:
+                ptr = self.poly.data(); ptr.setsize(n * 16)
+                self.xy = np.frombuffer(ptr, dtype=np.float64).reshape(n, 2)
+            else:
+                self.xy = np.zeros((0, 2))
+        return self.xy
+
+    def set(self, x, y):
+        xy = self.view(len(x))
+        xy[:, 0] = x; xy[:, 1] = y
+        return self.poly
+
+
+class GlyphAtlas:
+    """Glify ASCII 33..126 w rozmiarach 6..14 pt jednego koloru na jednej pixmapie."""
+
+    FIRST, LAST = 33, 126
+    SIZES = range(6, 15)
+
+    def __init__(self, color):
+        n = self.LAST - self.FIRST + 1
+        fonts = [QFont("Consolas", s) for s in self.SIZES]
+        fms   = [QFontMetrics(f) for f in fonts]
+        cw    = [fm.maxWidth() + 1 for fm in fms]
+        ch    = [fm.height() for fm in fms]
+        self.pm = QPixmap(max(cw) * n, sum(ch)); self.pm.fill(Qt.GlobalColor.transparent)
+        # src[size_idx, glyph] = (sx, sy, w, h);  ascent — przesunięcie linii bazowej
+        self.src    = np.zeros((len(fonts), n, 4))
+        self.ascent = np.array([fm.ascent() for fm in fms], dtype=np.float64)
+        p = QPainter(self.pm); p.setPen(QColor(color)); y = 0
+        for si, (f, w, h) in enumerate(zip(fonts, cw, ch)):
+            p.setFont(f)
+            for g in range(n):
+                p.drawText(g * w, y + int(self.ascent[si]), chr(self.FIRST + g))
+                self.src[si, g] = (g * w, y, w, h)
+            y += h
+        p.end()
+
+
+def draw_fragments(p, frags, pm):
+    """Jedno drawPixmapFragments; wiązania bez listowej wersji → drawPixmap per fragment."""
+    try:
+        p.drawPixmapFragments(frags, pm)
+    except TypeError:
+        for f in frags:
+            tw, th = f.width * f.scaleX, f.height * f.scaleY
+            p.drawPixmap(QRectF(f.x - tw / 2, f.y - th / 2, tw, th), pm,
+                         QRectF(f.sourceLeft, f.sourceTop, f.width, f.height))
+
+# ============================================================================
+# VIZ BATCH RENDERER — słupki z LUT gradientu, fala jednym drawPolyline
+# ============================================================================
+# Gradient słupka (c0 u dołu → c1 na szczycie) liczony raz per preset i per
+# kubełek wysokości do paska-atlasu (kolumna k = gradient wysokości (k+1)·krok,
+# wyrównany do dołu). Wszystkie słupki to jedno drawPixmapFragments z tego
+# atlasu (scaleX = szerokość słupka, scaleY = bh / wysokość kubełka), lustro —
+# jedno drawRects, fala — jedno drawPolyline z reużywanego PointBuffer.
+
+VIZ_BAR_BUCKET = 4              # px — krok kubełków wysokości gradientu
+
+
+class BatchRenderer:
+    def __init__(self):
+        self._lut  = {}          # (c0, c1, max_h) → (QPixmap, liczba kubełków)
+        self._wave = PointBuffer()
+        self._wi   = np.arange(129, dtype=np.float64)
+        self._widx = np.minimum(63, self._wi.astype(np.int64) * 64 // 128)
+
+    def gradient_lut(self, c0, c1, max_h):
+        key = (c0, c1, max_h)
+        if key not in self._lut:
+            nb = max(1, -(-max_h // VIZ_BAR_BUCKET)); H = nb * VIZ_BAR_BUCKET
+            pm = QPixmap(nb, H); pm.fill(Qt.GlobalColor.transparent)
+            p = QPainter(pm)
+            for k in range(nb):
+                hb = (k + 1) * VIZ_BAR_BUCKET
+                g = QLinearGradient(0, H, 0, H - hb)
+                g.setColorAt(0, QColor(c0)); g.setColorAt(1, QColor(c1))
+                p.fillRect(QRectF(k, H - hb, 1, hb), QBrush(g))
+            p.end()
+            if len(self._lut) > 16:
+                self._lut.clear()
+            self._lut[key] = (pm, nb)
+        return self._lut[key]
+
+    @staticmethod
+    def _bars(ad, w, scale):
+        """x, szerokość i wysokość (int) 64 słupków — jak w dawnej pętli per słupek."""
+        ad = np.asarray(ad[:64], dtype=np.float64)
+        bw = w / 64
+        x  = (np.arange(ad.size) * bw).astype(np.int64)
+        bh = np.maximum(1, (ad * scale).astype(np.int64))
+        return x, max(1, int(bw) - 2), bh
+
+    def spectrum_bars(self, p, ad, w, h, c):
+        max_h = max(1, int(h * 0.8))
+        pm, nb = self.gradient_lut(c[0], c[1], max_h)
+        x, bw, bh = self._bars(ad, w, h * 0.8)
+        k  = np.minimum(nb - 1, (bh - 1) // VIZ_BAR_BUCKET)
+        hb = (k + 1) * VIZ_BAR_BUCKET
+        H  = nb * VIZ_BAR_BUCKET
+        mk = QPainter.PixmapFragment.create
+        draw_fragments(p, [mk(QPointF(xi + 1 + bw / 2, h - b / 2), QRectF(ki, H - hbi, 1, hbi),
+                              bw, b / hbi)
+                           for xi, b, ki, hbi in zip(x.tolist(), bh.tolist(),
+                                                     k.tolist(), hb.tolist())], pm)
+
+    def mirror_spectrum(self, p, ad, w, h, c):
+        cy = h // 2
+        x, bw, bh = self._bars(ad, w, cy * 0.9)
+        p.setPen(Qt.PenStyle.NoPen); p.setBrush(QColor(c[0]))
+        p.drawRects(*[QRect(xi + 1, cy - b, bw, b * 2) for xi, b in zip(x.tolist(), bh.tolist())])
+
+    def flux_wave(self, p, ad, ph, w, h, c):
+        ad = np.asarray(ad, dtype=np.float64)
+        y = h / 2 + np.sin(ph + self._wi * 0.2) * ad[self._widx] * h * 0.4
+        p.setPen(QPen(QColor(c[0]), 2))
+        p.drawPolyline(self._wave.set(self._wi * w / 128, y))
+
 # ============================================================================
 # MATRIX VISUALIZER
 # ============================================================================
@@ -4365,7 +7153,12 @@ class MatrixVisualizer(QWidget):
         self.setAttribute(Qt.WidgetAttribute.WA_OpaquePaintEvent)  # brak tła Qt
         self.ad=[0.0]*64; self.bl=0.0; self.ph=0.0
         self.dc=(None,"",""); self.dp=(None,"",""); self.dn=(None,"","")
-        self.bg=None; self.phaser_mode="linear"; self.phase_speed=0.03; self.parts=[]
+        self.bg=None; self.phaser_mode="linear"; self.phase_speed=0.03
+        self.parts={}        # warstwa → ParticleLayer (VIZ PARTICLES)
+        self._rng=np.random.default_rng()
+        self._pts=PointBuffer(); self._atlas={}; self._batch=BatchRenderer()
+        self._static={}      # warstwa statyczna → QPixmap (STATIC_LAYERS)
+        self.layer_stats={}  # warstwa → [klatek, suma ms, max ms]
         self._cache = None   # offscreen pixmap
         self._dirty = True   # czy trzeba przerysować
         self.presets={
@@ -4379,16 +7172,21 @@ class MatrixVisualizer(QWidget):
         # Jeden timer — 30fps zamiast 60fps + dodatkowych update() z spectrum
         self.tm=QTimer(); self.tm.timeout.connect(self._tick); self.tm.start(1000//self.TARGET_FPS)
 
-    def set_preset(self,n): self.curr=n; self.parts=[]; self._dirty=True
+    def set_preset(self,n): self.curr=n; self.parts={}; self._invalidate()
+    def set_running(self,on):
+        """Animacja tylko dla subskrybenta analizy 'viz' (widoczny, nie pauza)."""
+        if on and not self.tm.isActive(): self.tm.start(1000//self.TARGET_FPS)
+        elif not on and self.tm.isActive(): self.tm.stop(); self.update()
     def set_covers_data(self,p,c,n):
         self.dp=p; self.dc=c; self.dn=n
         self.bg=blur_pixmap(c[0],self.size()) if c[0] else None
-        self._dirty=True
+        self._invalidate("background","sidebar")
     def update_data(self,d):
         # Tylko zapisujemy dane — NIE wołamy update() — timer zrobi to co 33ms
-        if d:
+        # d: float32 ndarray 0..1 (spectrum_normalize)
+        if d is not None and len(d):
             self.ad=d
-            self.bl=self.bl*0.8+(sum(d[:5])/5)*0.2
+            self.bl=self.bl*0.8+float(d[:5].mean())*0.2
             self._dirty=True
     def _tick(self):
         self.ph+=self.phase_speed
@@ -4402,7 +7200,8 @@ class MatrixVisualizer(QWidget):
         if (self._cache is None or
                 self._cache.width()!=w or self._cache.height()!=h or
                 self._dirty):
-            self._cache = QPixmap(w, h)
+            if self._cache is None or self._cache.width()!=w or self._cache.height()!=h:
+                self._cache = QPixmap(w, h)
             self._render_to(self._cache, w, h)
             self._dirty = False
         # Blit z cache na ekran — bardzo szybkie
@@ -4410,79 +7209,136 @@ class MatrixVisualizer(QWidget):
         scrn.drawPixmap(0, 0, self._cache)
         scrn.end()
 
+    # ── Warstwy statyczne ────────────────────────────────────────────────
+    # Tło (rozmyta okładka), siatka i sidebar (okładki + tytuły) renderowane
+    # raz do pixmap; unieważniane tylko przy resize / zmianie utworu / presetu.
+    # Co klatkę rysujemy warstwy audio-reaktywne + blity z cache.
+    STATIC_LAYERS = ("background","grid_3d","sidebar")
+
+    def _invalidate(self,*names):
+        for n in names or self.STATIC_LAYERS: self._static.pop(n,None)
+        self._dirty=True
+
+    def _static_layer(self,name,w,h,draw):
+        pm=self._static.get(name)
+        if pm is None or pm.width()!=w or pm.height()!=h:
+            t0=time.perf_counter()
+            pm=QPixmap(w,h); pm.fill(Qt.GlobalColor.transparent)
+            q=QPainter(pm); draw(q,w,h); q.end()
+            self._static[name]=pm
+            self._time(f"{name} (cache)",t0)
+        return pm
+
+    def _time(self,name,t0):
+        ms=(time.perf_counter()-t0)*1000.0
+        st=self.layer_stats.setdefault(name,[0,0.0,0.0])
+        st[0]+=1; st[1]+=ms; st[2]=max(st[2],ms)
+
+    def layer_report(self):
+        """{warstwa: (klatek, śr. ms, max ms)} — czas renderu per warstwa."""
+        return {n:(k,tot/k,mx) for n,(k,tot,mx) in self.layer_stats.items() if k}
+
     def _render_to(self, pm, w, h):
         p=QPainter(pm)
         # Antialiasing tylko dla linii/okręgów, nie dla prostokątów
         p.setRenderHint(QPainter.RenderHint.Antialiasing, False)
         pr=self.presets.get(self.curr,self.presets["Cyberpunk"]); c=pr["c"]
-        if self.bg: p.drawPixmap(0,0,self.bg.scaled(w,h,Qt.AspectRatioMode.IgnoreAspectRatio,Qt.TransformationMode.FastTransformation))
-        else: p.fillRect(0,0,w,h,QColor(c[2]))
+        t0=time.perf_counter()
+        p.drawPixmap(0,0,self._static_layer("background",w,h,
+                                            lambda q,w,h: self._paint_background(q,w,h,c)))
+        self._time("background",t0)
         for layer in pr["layers"]:
             fn = getattr(self,f"_draw_{layer}",None)
             if fn:
+                t0=time.perf_counter()
                 if layer in ("flux_wave","pulse_orb","digital_rain","bubbles","starfield"):
                     p.setRenderHint(QPainter.RenderHint.Antialiasing, True)
                 else:
                     p.setRenderHint(QPainter.RenderHint.Antialiasing, False)
                 fn(p,w,h,c)
+                self._time(layer,t0)
         p.setRenderHint(QPainter.RenderHint.Antialiasing, False)
-        self._draw_sidebar(p,w,h)
+        t0=time.perf_counter()
+        p.drawPixmap(0,0,self._static_layer("sidebar",w,h,self._paint_sidebar))
+        self._time("sidebar",t0)
         p.end()
 
-    def _draw_spectrum_bars(self,p,w,h,c):
-        bw=w/64
-        for i,v in enumerate(self.ad):
-            bh=max(1,int(v*h*0.8)); x=int(i*bw)
-            g=QLinearGradient(x,h,x,h-bh); g.setColorAt(0,QColor(c[0])); g.setColorAt(1,QColor(c[1]))
-            p.setBrush(QBrush(g)); p.setPen(Qt.PenStyle.NoPen)
-            p.drawRect(x+1,h-bh,max(1,int(bw)-2),bh)
+    def _paint_background(self,p,w,h,c):
+        p.fillRect(0,0,w,h,QColor(c[2]))
+        if self.bg: p.drawPixmap(0,0,self.bg.scaled(w,h,Qt.AspectRatioMode.IgnoreAspectRatio,Qt.TransformationMode.FastTransformation))
 
-    def _draw_mirror_spectrum(self,p,w,h,c):
-        bw=w/64; cy=h//2
-        for i,v in enumerate(self.ad):
-            bh=max(1,int(v*cy*0.9)); x=int(i*bw)
-            p.fillRect(x+1,cy-bh,max(1,int(bw)-2),bh*2,QColor(c[0]))
+    def _draw_spectrum_bars(self,p,w,h,c): self._batch.spectrum_bars(p,self.ad,w,h,c)
+
+    def _draw_mirror_spectrum(self,p,w,h,c): self._batch.mirror_spectrum(p,self.ad,w,h,c)
 
     def _draw_grid_3d(self,p,w,h,c):
-        p.setPen(QPen(QColor(c[0]),1)); p.setOpacity(0.2+self.bl*0.3)
+        # Linie z cache; na audio reaguje tylko krycie
+        pm=self._static_layer("grid_3d",w,h,lambda q,w,h: self._paint_grid(q,w,h,c))
+        p.setOpacity(0.2+self.bl*0.3); p.drawPixmap(0,0,pm)
+        p.setOpacity(1.0)
+
+    def _paint_grid(self,p,w,h,c):
+        p.setPen(QPen(QColor(c[0]),1))
         for i in range(0,w,30): p.drawLine(i,0,i,h)
         for j in range(0,h,20): p.drawLine(0,j,w,j)
-        p.setOpacity(1.0)
 
-    def _draw_digital_rain(self,p,w,h,c):
-        if len(self.parts)<40: self.parts.append([random.randint(0,w),random.randint(-h,0),random.uniform(1,4),random.randint(6,14)])
-        p.setPen(QColor(c[0])); act=[]
-        for pt in self.parts:
-            pt[1]+=pt[2]; p.setFont(QFont("Consolas",pt[3]))
-            p.drawText(int(pt[0]),int(pt[1]),chr(random.randint(33,126)))
-            if pt[1]<h: act.append(pt)
-        self.parts=act
+    def _layer(self,name,dtype,spawn):
+        lay=self.parts.get(name)
+        if lay is None: lay=self.parts[name]=ParticleLayer(dtype,VIZ_PARTICLES[name],spawn)
+        return lay
 
-    def _draw_flux_wave(self,p,w,h,c):
-        p.setPen(QPen(QColor(c[0]),2)); pts=[]
-        for i in range(129):
-            x=i*w/128; idx=min(63,int(i*64/128))
-            y=h/2+math.sin(self.ph+i*0.2)*self.ad[idx]*h*0.4
-            pts.append(QPointF(x,y))
-        for i in range(len(pts)-1): p.drawLine(pts[i],pts[i+1])
+    def _spawn_rain(self,n,w,h):
+        a=np.empty(n,RAIN_DT); r=self._rng
+        a["x"]=r.integers(0,w+1,n); a["y"]=r.integers(-h,1,n)
+        a["v"]=r.uniform(1,4,n); a["size"]=r.integers(6,15,n)
+        return a
+
+    def _draw_digital_rain(self,p,w,h,c):
+        lay=self._layer("digital_rain",RAIN_DT,self._spawn_rain); a=lay.fill(w,h)
+        a["y"]+=a["v"]
+        at=self._atlas.get(c[0])
+        if at is None: at=self._atlas[c[0]]=GlyphAtlas(c[0])
+        si=a["size"]-GlyphAtlas.SIZES[0]
+        src=at.src[si,self._rng.integers(0,at.src.shape[1],a.size)]      # (n,4) sx,sy,w,h
+        cx=np.floor(a["x"])+src[:,2]/2; cy=np.floor(a["y"])-at.ascent[si]+src[:,3]/2
+        mk=QPainter.PixmapFragment.create
+        draw_fragments(p,[mk(QPointF(x,y),QRectF(*s4)) for x,y,s4
+                          in zip(cx.tolist(),cy.tolist(),src.tolist())],at.pm)
+        lay.keep(a["y"]<h)
+
+    def _draw_flux_wave(self,p,w,h,c): self._batch.flux_wave(p,self.ad,self.ph,w,h,c)
+
+    def _spawn_bubbles(self,n,w,h):
+        a=np.empty(n,BUBBLE_DT); r=self._rng
+        a["x"]=r.uniform(0,w,n); a["y"]=r.uniform(0,h,n)
+        a["r"]=r.uniform(2,8,n); a["v"]=r.uniform(1,3,n)
+        return a
 
     def _draw_bubbles(self,p,w,h,c):
-        if len(self.parts)<20: self.parts.append([random.uniform(0,w),random.uniform(0,h),random.uniform(2,8),random.uniform(1,3)])
-        p.setBrush(QColor(c[0])); p.setPen(Qt.PenStyle.NoPen); act=[]
-        for pt in self.parts:
-            pt[1]-=pt[3]; xw=math.sin(self.ph+pt[1]*0.1)*3
-            if pt[1]>-20: p.drawEllipse(QPointF(pt[0]+xw,pt[1]),pt[2],pt[2]); act.append(pt)
-        self.parts=act
+        lay=self._layer("bubbles",BUBBLE_DT,self._spawn_bubbles); a=lay.fill(w,h)
+        a["y"]-=a["v"]; lay.keep(a["y"]>-20); a=lay.a
+        x=a["x"]+np.sin(self.ph+a["y"]*0.1)*3
+        # Kubełki promienia co 0.5 px: jedno drawPoints per kubełek, pióro = średnica
+        rb,inv=np.unique(np.round(a["r"]*2)/2,return_inverse=True)
+        pen=QPen(QColor(c[0])); pen.setCapStyle(Qt.PenCapStyle.RoundCap)
+        for k,r in enumerate(rb.tolist()):
+            sel=inv==k
+            pen.setWidthF(2*r); p.setPen(pen)
+            p.drawPoints(self._pts.set(x[sel],a["y"][sel]))
+
+    def _spawn_stars(self,n,w,h):
+        a=np.empty(n,STAR_DT)
+        a["a"]=self._rng.uniform(0,6.28,n); a["r"]=self._rng.uniform(10,50,n)
+        return a
 
     def _draw_starfield(self,p,w,h,c):
         cx,cy=w/2,h/2
-        if len(self.parts)<100: self.parts.append([random.uniform(0,6.28),random.uniform(10,50)])
-        p.setPen(QColor(c[0])); act=[]
-        for pt in self.parts:
-            pt[1]*=1.05+self.bl*0.1; r=pt[1]
-            x=cx+math.cos(pt[0])*r; y=cy+math.sin(pt[0])*r
-            if 0<x<w and 0<y<h: p.drawEllipse(QPointF(x,y),2,2); act.append(pt)
-        self.parts=act
+        lay=self._layer("starfield",STAR_DT,self._spawn_stars); a=lay.fill(w,h)
+        a["r"]*=1.05+self.bl*0.1
+        x=cx+np.cos(a["a"])*a["r"]; y=cy+np.sin(a["a"])*a["r"]
+        vis=(x>0)&(x<w)&(y>0)&(y<h); lay.keep(vis)
+        pen=QPen(QColor(c[0]),4); pen.setCapStyle(Qt.PenCapStyle.RoundCap); p.setPen(pen)
+        p.drawPoints(self._pts.set(x[vis],y[vis]))
 
     def _draw_pulse_orb(self,p,w,h,c):
         cx,cy=w/2,h/2; r=50+self.bl*150
@@ -4493,7 +7349,7 @@ class MatrixVisualizer(QWidget):
         p.drawEllipse(QPointF(cx,cy),r*1.5,r*1.5)
         p.setBrush(QColor(c[0])); p.drawEllipse(QPointF(cx,cy),r*0.5,r*0.5)
 
-    def _draw_sidebar(self,p,w,h):
+    def _paint_sidebar(self,p,w,h):
         sw=int(w*0.25); sx=w-sw; sy=h//3
         p.fillRect(sx,0,sw,h,QColor(0,0,0,110))
         p.setPen(QColor(255,255,255,25)); p.drawLine(sx,0,sx,h)
@@ -4522,44 +7378,69 @@ class MatrixVisualizer(QWidget):
 
     def resizeEvent(self,e):
         if self.dc[0]: self.bg=blur_pixmap(self.dc[0],self.size())
+        self._invalidate()
         super().resizeEvent(e)
 
 # ============================================================================
 # SMART EQ
 # ============================================================================
+# SmartEQ — tablice liczone raz: gm = amp * sin(ph + off), exp stałe per tryb
+_EQ_I = np.arange(10, dtype=np.float64)
+_EQ_C = np.abs(4.5 - _EQ_I)
+SMARTEQ_PHASE = {   # tryb PHASE -> (off, amp); "chaos" — szum, bez tablicy
+    "linear":   ( _EQ_I * 0.5, np.full(10, 2.0)),
+    "diverge":  (-_EQ_C * 0.5, np.full(10, 3.0)),
+    "converge": ( _EQ_C * 0.5, np.full(10, 3.0)),
+    "rise":     ( _EQ_I * 0.8, 4.0 * _EQ_I / 10),
+    "fall":     (-_EQ_I * 0.8, 4.0 * (10 - _EQ_I) / 10),
+}
+SMARTEQ_EXPOSURE = {
+    "Flat":   np.zeros(10),
+    "Gora":   -3.0 + _EQ_I * 0.8,
+    "Dol":     5.0 - _EQ_I * 0.8,
+    "Srodek":  5.0 - _EQ_C * 1.5,
+}
+EQ_WRITE_EPS   = 0.05     # dB — mniejsze ruchy pasma nie idą do GStreamera
+EQ_SLIDER_MS   = 1000 // 60
+
+
 class SmartEQProcessor:
     def __init__(self,eq):
         self.eq=eq; self.active=False; self.geo_active=True
         self.depth=0.5; self.pm="linear"; self.ph=0.0; self.ps=0.03
         self.exposure_mode="Flat"
-        self.tgt=[0.65]*10; self.base=[0.0]*10; self.curr=[0.0]*10; self.sm=0.9
+        self.tgt=np.full(10,0.65); self.base=np.zeros(10); self.curr=np.zeros(10); self.sm=0.9
+        self._t=None
+        self._rng=np.random.default_rng()
 
     def set_base(self,i,v): self.base[i]=float(v)
-    def set_all_base(self,vals): self.base=[float(v) for v in vals]
+    def set_all_base(self,vals): self.base=np.asarray(vals,dtype=np.float64).copy()
 
     def process(self,spec):
-        if not spec: return
-        self.ph+=self.ps; chunk=len(spec)//10
-        for i in range(10):
-            gm=0.0
-            if self.geo_active:
-                if self.pm=="linear":    gm=math.sin(self.ph+i*0.5)*2
-                elif self.pm=="diverge": gm=math.sin(self.ph-abs(4.5-i)*0.5)*3
-                elif self.pm=="converge":gm=math.sin(self.ph+abs(4.5-i)*0.5)*3
-                elif self.pm=="rise":    gm=math.sin(self.ph+i*0.8)*4*(i/10)
-                elif self.pm=="fall":    gm=math.sin(self.ph-i*0.8)*4*((10-i)/10)
-                elif self.pm=="chaos":   gm=(random.random()-0.5)*4
-            exp=0.0
-            if   self.exposure_mode=="Gora":  exp=-3+(i*0.8)
-            elif self.exposure_mode=="Dol":   exp=5-(i*0.8)
-            elif self.exposure_mode=="Srodek":exp=5-abs(4.5-i)*1.5
-            dc=0.0
-            if self.active:
-                s=i*chunk; ea=sum(spec[s:s+chunk])/chunk if chunk else 0
-                dc=(self.tgt[i]-ea)*20*self.depth
-            des=max(-12,min(12,self.base[i]+gm+dc+exp))
-            self.curr[i]=self.curr[i]*self.sm+des*(1-self.sm)
-            self.eq.update_vis(i,self.curr[i])
+        # spec=None: brak analizy — tylko PHASE/EXP (DYNAMIC czeka na dane)
+        if spec is not None and not len(spec): return
+        if spec is None and self.active: return
+        # Faza w czasie rzeczywistym: ps na 100 ms, niezależnie od tempa ramek analizy
+        now=time.perf_counter(); dt=min(0.5,now-self._t) if self._t else 0.1; self._t=now
+        self.ph+=self.ps*dt/0.1
+        des=self.base+SMARTEQ_EXPOSURE.get(self.exposure_mode,SMARTEQ_EXPOSURE["Flat"])
+        if self.geo_active:
+            tab=SMARTEQ_PHASE.get(self.pm)
+            if tab is not None: des=des+tab[1]*np.sin(self.ph+tab[0])
+            elif self.pm=="chaos": des=des+(self._rng.random(10)-0.5)*4
+        if self.active and spec is not None:
+            # Energia per pasmo EQ: z analizatora FFT już 10 pasm wokół środków EQ;
+            # z elementu spectrum — reshape 64 liniowych pasm na 10 grup
+            if len(spec)==10: ea=np.asarray(spec,dtype=np.float64)
+            else:
+                chunk=len(spec)//10
+                ea=spec[:chunk*10].reshape(10,chunk).mean(axis=1) if chunk else np.zeros(10)
+            # NaN = pasmo poza Nyquistem analizy — bez korekty
+            des=des+np.nan_to_num((self.tgt-ea)*20*self.depth,nan=0.0)
+        np.clip(des,-12,12,out=des)
+        self.curr=self.curr*self.sm+des*(1-self.sm)
+        self.eq.apply_bands(self.curr)
+
 
 class EqualizerWidget(QGroupBox):
     def __init__(self,parent=None):
@@ -4571,7 +7452,9 @@ class EqualizerWidget(QGroupBox):
             QCheckBox{color:#00FFFF} QLabel{color:#666;font-size:9px}
             QComboBox{background:#1A1A1E;color:#EEE;border:1px solid #333;border-radius:3px}
         """)
-        self.gst=None; self._mon_gst=None; self.sl=[]
+        self.gst=None; self._mon_gst=None; self.sl=[]; self.auto=None
+        self._sent=np.zeros(10); self._sl_t=0.0
+        self.stats={"gst_writes":0,"gst_avoided":0,"slider_writes":0,"slider_avoided":0}
         self.proc=SmartEQProcessor(self); self.prog_upd=False
         m=QVBoxLayout(self); m.setContentsMargins(5,15,5,5); m.setSpacing(4)
         pl=QHBoxLayout()
@@ -4596,13 +7479,37 @@ class EqualizerWidget(QGroupBox):
         m.addLayout(bl)
 
     def set_gst(self,el,mon_el=None): self.gst=el; self._mon_gst=mon_el
+    def set_automation(self,auto): self.auto=auto
     def usr_chg(self,i,v):
         if not self.prog_upd: self.proc.set_base(i,v); self.set_b(i,v)
     def update_vis(self,i,v):
         self.prog_upd=True; self.sl[i].setValue(int(v)); self.prog_upd=False; self.set_b(i,v)
+    def apply_bands(self,vals):
+        """
+        Wektor 10 pasm z SmartEQ. Do GStreamera tylko pasma, które ruszyły się
+        o > EQ_WRITE_EPS od ostatniego zapisu; suwaki najwyżej co EQ_SLIDER_MS
+        i tylko gdy zmienia się wartość całkowita.
+        """
+        moved=np.flatnonzero(np.abs(vals-self._sent)>EQ_WRITE_EPS)
+        self.stats["gst_avoided"]+=10-moved.size
+        for i in moved:
+            self.set_b(int(i),float(vals[i])); self._sent[i]=vals[i]
+        self.stats["gst_writes"]+=moved.size
+        now=time.perf_counter()
+        if now-self._sl_t<EQ_SLIDER_MS/1000.0:
+            self.stats["slider_avoided"]+=10; return
+        self._sl_t=now; self.prog_upd=True
+        for i,v in enumerate(np.rint(vals).astype(int).tolist()):
+            if self.sl[i].value()!=v: self.sl[i].setValue(v); self.stats["slider_writes"]+=1
+            else: self.stats["slider_avoided"]+=1
+        self.prog_upd=False
     def set_b(self,i,v):
+        # Rampa EQ_RAMP_MS w wątku streamingu — SmartEQ pisze co klatkę bez zippera
+        self._sent[i]=v
         for el in [self.gst,self._mon_gst]:
-            if el:
+            if not el: continue
+            if self.auto: self.auto.set(el,f"band{i}",float(v),EQ_RAMP_MS)
+            else:
                 try: el.set_property(f"band{i}",float(v))
                 except: pass
     def app_pre(self,n):
@@ -5257,6 +8164,9 @@ class ChainModuleWidget(QFrame):
         super().__init__(parent)
         self.mid=mid; self.accent=accent; self._pd=params
         self.param_sliders={}; self.param_labels={}; self.gst_els=[]
+        self.bypass_mode=BYPASS_MODE
+        self.bypass_sws=[]      # ChainBypass (tryb "selector") — main + monitor
+        self.on_need_gst=None   # LAZY_DSP: callable(mid) -> element, wołany przy pierwszym włączeniu
         self.setStyleSheet(f"""
             QFrame{{background:#0E0E12;border:1px solid #252525;
                    border-left:3px solid {accent};border-radius:3px;margin:1px}}
@@ -5292,14 +8202,23 @@ class ChainModuleWidget(QFrame):
         for el in els:
             if el and el not in self.gst_els: self.gst_els.append(el)
 
+    def add_bypass(self,bp):
+        """ChainBypass z resolvera — moduł w nim dostaje parametry, pady wg checkboxa."""
+        if bp in self.bypass_sws: return
+        self.bypass_sws.append(bp); self.add_gst(bp.el)
+        if self.en.isChecked(): self._toggle(True)
+        else: bp.set_active(False)
+
     def _toggle(self,enabled):
         self.pw.setVisible(enabled)
         if not enabled: self._bypass()
         else:
+            if not self.gst_els and self.on_need_gst: self.add_gst(self.on_need_gst(self.mid))
             if self.mid=="phase_inv": self._phase()
             else:
                 for pn,sl in self.param_sliders.items():
                     self._param(pn,sl.value()/self._pd[pn][3],self._pd[pn][4],self.param_labels[pn])
+            for bp in self.bypass_sws: bp.set_active(True)
 
     def _param(self,pn,val,unit,lbl):
         if unit=="Hz":   lbl.setText(f"{val:.0f}Hz")
@@ -5316,12 +8235,20 @@ class ChainModuleWidget(QFrame):
                         except: pass
 
     def _bypass(self):
+        if self.bypass_mode=="selector" and self.bypass_sws:
+            # Skrót obok modułu — element nie dostaje buforów, propsy bez zmian
+            for bp in self.bypass_sws: bp.set_active(False)
+            return
         _,neutral,_=CHAIN_GST.get(self.mid,("",{},""))
         for el in self.gst_els:
             for k,v in neutral.items():
                 try: el.set_property(k, float(v) if isinstance(v,float) else v)
                 except: pass
 
+    def set_bypass_mode(self,mode):
+        self.bypass_mode=mode
+        if not self.en.isChecked(): self._bypass()
+
     def _phase(self):
         if not self.en.isChecked(): return
         d=1.0 if(getattr(self,'invL',None)and(self.invL.isChecked()or self.invR.isChecked())) else 0.0
@@ -5370,6 +8297,7 @@ class SignalChainPanel(QGroupBox):
             "QScrollBar:vertical{background:#0A0A0A;width:7px}"
             "QScrollBar::handle:vertical{background:#1A4A3A;border-radius:3px}")
         self.mws={}
+        self.bypass_mode = BYPASS_MODE
         self._resolver = None   # DSPAutoResolver — przypisywany przez set_resolver()
         self._rebuild_pending = False
         self._rebuild_timer = QTimer()
@@ -5380,13 +8308,21 @@ class SignalChainPanel(QGroupBox):
     def set_resolver(self, resolver):
         """Przypisuje DSPAutoResolver — wywoływane z CarbonPhaserPlayer po init pipeline."""
         self._resolver = resolver
+        resolver.set_bypass_mode(self.bypass_mode)
+        # Odłożony (scalony) rebuild kończy się poza _do_rebuild — etykieta z callbacku
+        resolver.on_rebuilt = self._on_rebuilt
 
     def add_resolver(self, resolver):
         """Dodaje dodatkowy resolver (np. dla pipeline monitora)."""
         if not hasattr(self, '_extra_resolvers'):
             self._extra_resolvers = []
+        resolver.set_bypass_mode(self.bypass_mode)
         self._extra_resolvers.append(resolver)
 
+    def _on_rebuilt(self, order):
+        self._adopt_new_elements()
+        self._update_chain_label(order)
+
     def _schedule_rebuild(self):
         """Debounce rebuild — czeka 80ms po ostatniej zmianie checkboxa."""
         self._rebuild_timer.start(80)
@@ -5396,7 +8332,11 @@ class SignalChainPanel(QGroupBox):
         if not self._resolver:
             return
         enabled = [mid for mid, w in self.mws.items() if w.en.isChecked()]
+        if self.bypass_mode != "relink":
+            # Wszystkie moduły na stałe w torze — wyłączone neutralizuje _bypass()
+            enabled = list(self.mws)
         new_order = self._resolver.rebuild(enabled)
+        self._adopt_new_elements()
         for extra in getattr(self, '_extra_resolvers', []):
             try:
                 extra.rebuild(enabled)
@@ -5404,6 +8344,28 @@ class SignalChainPanel(QGroupBox):
                 print(f"[AutoResolver extra] Error: {e}")
         self._update_chain_label(new_order)
 
+    def _adopt_new_elements(self):
+        """Elementy utworzone leniwie przez resolver (tryb neutral / selector) → widgety."""
+        resolvers = [r for r in [self._resolver] + getattr(self, '_extra_resolvers', []) if r]
+        for mid, w in self.mws.items():
+            el = getattr(self, '_chain_els', {}).get(mid)
+            if el and el not in w.gst_els:
+                w.add_gst(el)
+                if not w.en.isChecked(): w._bypass()
+            for r in resolvers:
+                bp = r.bypasses.get(mid)
+                if bp: w.add_bypass(bp)
+
+    def set_bypass_mode(self, mode):
+        if mode not in BYPASS_MODES:
+            return
+        self.bypass_mode = mode
+        for r in [self._resolver] + getattr(self, '_extra_resolvers', []):
+            if r: r.set_bypass_mode(mode)
+        for w in self.mws.values():
+            w.set_bypass_mode(mode)
+        self._schedule_rebuild()
+
     def _update_chain_label(self, order):
         if hasattr(self, '_chain_lbl'):
             if not order:
@@ -5434,6 +8396,10 @@ class SignalChainPanel(QGroupBox):
         sb=QPushButton("Save"); sb.clicked.connect(self._save); pb.addWidget(sb)
         db=QPushButton("Del"); db.setFixedWidth(32); db.clicked.connect(self._del); pb.addWidget(db)
         pb.addStretch()
+        pb.addWidget(QLabel("Bypass:"))
+        self.bcb=QComboBox(); self.bcb.addItems(BYPASS_MODES); self.bcb.setFixedWidth(90)
+        self.bcb.setCurrentText(self.bypass_mode)
+        self.bcb.currentTextChanged.connect(self.set_bypass_mode); pb.addWidget(self.bcb)
         rb=QPushButton("Reset All"); rb.clicked.connect(self._reset); pb.addWidget(rb)
         outer.addLayout(pb)
 
@@ -5461,11 +8427,13 @@ class SignalChainPanel(QGroupBox):
             self.mws[mid]=w; cv.addWidget(w)
         cv.addStretch(); scroll.setWidget(cont); outer.addWidget(scroll)
 
-    def attach(self,main_els,mon_els=None):
+    def attach(self,main_els,mon_els=None,factory=None):
+        """factory(mid) — LAZY_DSP: element tworzony przy pierwszym włączeniu modułu."""
+        self._chain_els=main_els
         for mid in CHAIN_ORDER:
             w=self.mws.get(mid)
             if not w: continue
-            w.gst_els=[]
+            w.gst_els=[]; w.on_need_gst=factory
             w.en.blockSignals(True)   # blokuj _schedule_rebuild podczas attach
             me=main_els.get(mid)
             if me: w.add_gst(me)
@@ -5520,8 +8488,8 @@ class SignalChainPanel(QGroupBox):
 # ============================================================================
 class TestSignalGenerator(QGroupBox):
     """
-    Wbudowany generator sygnału testowego — osobny pipeline GStreamer.
-    audiotestsrc → vol → audioconvert → audioresample → autoaudiosink
+    Wbudowany generator sygnału testowego — wejście "test" input-selectora
+    w głównym pipeline: audiotestsrc → volume → in_sel → cały tor FX.
 
     Fale: sine, sawtooth, triangle, square, white-noise + auto-remix (kolejność cykliczna).
     Sweep: auto-sweep (center→low→high→center) + ręczny suwak.
@@ -5540,6 +8508,9 @@ class TestSignalGenerator(QGroupBox):
     FREQ_HIGH   = 8000
 
     TEMPO_MS   = {"🐢 Wolno": 80,   "▶ Normal": 30,   "⚡ Szybko": 10}
+    SWEEP_SHOW_MS = 50    # odświeżanie UI przy sweepie z GstController
+    SWEEP_PPO     = 12    # punkty kontrolne na oktawę
+    SWEEP_AHEAD   = 4     # cykli zaplanowanych z góry
     TEMPO_STEP = {"🐢 Wolno": 1.008, "▶ Normal": 1.025, "⚡ Szybko": 1.06}
     WAVE_HOLD  = {"🐢 Wolno": 3000,  "▶ Normal": 1500,  "⚡ Szybko": 500}
 
@@ -5567,13 +8538,14 @@ class TestSignalGenerator(QGroupBox):
     def __init__(self, parent=None):
         super().__init__("🔬 Generator Sygnału Testowego", parent)
         self.setStyleSheet(self.SS)
-        self._pipe = None
         self._src  = None
         self._vol_el = None
         self._active = False
         self._app  = None   # referencja do CarbonPhaserPlayer (set via set_app())
         self._sweep_freq  = float(self.FREQ_CENTER)
         self._sweep_phase = 0
+        self._sweep_t0    = None    # stream time startu zaplanowanego sweepu (GstController)
+        self._sweep_cycle = 0; self._sweep_bounds = []; self._sweep_rearm = None
         self._remix_idx   = 0
         self._sweep_timer = QTimer(); self._sweep_timer.timeout.connect(self._sweep_tick)
         self._remix_timer = QTimer(); self._remix_timer.timeout.connect(self._remix_tick)
@@ -5612,8 +8584,8 @@ class TestSignalGenerator(QGroupBox):
         # Info — jak działa routing
         info = QLabel(
             "💡 Generator wysyła sygnał przez cały łańcuch FX (Tape → Spatial → "
-            "Phantom → EQ → Signal Chain → Limitery). Kliknij START — Monitor Mode "
-            "uruchomi się automatycznie."
+            "Phantom → EQ → Signal Chain → Limitery). Kliknij START — generator "
+            "staje się aktywnym wejściem odtwarzacza."
         )
         info.setWordWrap(True)
         info.setStyleSheet(
@@ -5700,92 +8672,55 @@ class TestSignalGenerator(QGroupBox):
     # ── GStreamer ─────────────────────────────────────────────────────────────
 
     def set_app(self, app_ref):
-        """Referencja do CarbonPhaserPlayer — potrzebna do uruchomienia Monitor Mode."""
+        """Referencja do CarbonPhaserPlayer — generator to jego wejście "test"."""
         self._app = app_ref
 
-    def _build_pipe(self):
-        """
-        Pipeline generatora:
-          audiotestsrc → volume → audioconvert → audioresample → pulsesink[carbon_monitor]
-        Sygnał trafia do virtual sink PulseAudio, skąd Monitor Mode go odbiera
-        i puszcza przez cały łańcuch FX (Tape, Spatial, Phantom, EQ, Chain...).
-        """
-        if self._pipe:
-            self._pipe.set_state(Gst.State.NULL)
-            self._pipe = None
-        p   = Gst.Pipeline.new("tsg-pipe")
-        src = mkgst("audiotestsrc","tsg_src",
-                    {"wave":0,"freq":float(self.FREQ_CENTER),"volume":1.0,"is-live":True})
-        vol  = mkgst("volume","tsg_vol",{"volume":self.vol_sl.value()/100.0})
-        conv = mkgst("audioconvert","tsg_conv")
-        res  = mkgst("audioresample","tsg_res")
-        # Wysyłamy do virtual sink — Monitor Mode go przechwytuje przez .monitor
-        snk  = mkgst("pulsesink","tsg_sink",
-                     {"device": VIRTUAL_SINK, "sync": False})
-        for el in [src,vol,conv,res,snk]:
-            if el: p.add(el)
-        def lnk(a,b):
-            if a and b:
-                if not a.link(b): print(f"  [!] tsg: {a.get_name()}->{b.get_name()}")
-        lnk(src,vol); lnk(vol,conv); lnk(conv,res); lnk(res,snk)
-        self._pipe=p; self._src=src; self._vol_el=vol
+    def _auto(self):
+        return self._app.automation if self._app else None
 
     def _s(self, prop, val):
-        if self._src:
-            try: self._src.set_property(prop, val)
-            except Exception as e: print(f"  [TSG] {prop}={val}: {e}")
+        if not self._src: return
+        auto = self._auto()
+        if prop == "freq" and auto:
+            auto.set(self._src, "freq", float(val)); return
+        try: self._src.set_property(prop, val)
+        except Exception as e: print(f"  [TSG] {prop}={val}: {e}")
 
     # ── Slots ─────────────────────────────────────────────────────────────────
 
     def _on_start(self, active):
         self._active = active
         if active:
-            # 1. Utwórz virtual sink jeśli nie istnieje
-            if not create_virtual_sink():
-                QMessageBox.critical(self, "Generator",
-                    "Nie można utworzyć virtual sink PulseAudio!\n"
-                    "Sprawdź czy PulseAudio/PipeWire jest uruchomiony.")
+            if not self._app or not self._app.tsg_src:
+                self._wave_lbl.setText("⚠ Brak wejścia generatora w pipeline")
                 self.btn_start.blockSignals(True)
                 self.btn_start.setChecked(False)
                 self.btn_start.blockSignals(False)
                 self._active = False
                 return
 
-            # 2. Uruchom generator → pulsesink[carbon_monitor]
-            self._build_pipe()
-            self._pipe.set_state(Gst.State.PLAYING)
-            self.btn_start.setText("⏹ STOP GENERATOR")
+            # Wejście "test" input-selectora → cały tor FX → output
+            self._src = self._app.tsg_src; self._vol_el = self._app.tsg_vol
+            self._on_vol(self.vol_sl.value())
             self._set_freq(self.freq_sl.value())
             self._apply_wave_now()
-
-            # 3. Aktywuj Monitor Mode w głównej aplikacji
-            #    (pulsesrc[carbon_monitor.monitor] → cały FX chain → output)
-            if hasattr(self, '_app') and self._app:
-                self._app._start_monitor()
-                self._wave_lbl.setText(
-                    "✅ Generator → FX Chain aktywny")
-            else:
-                self._wave_lbl.setText(
-                    "⚠ Brak ref do app — Monitor Mode uruchom ręcznie")
+            self._app._start_test_input()
+            self.btn_start.setText("⏹ STOP GENERATOR")
+            self._wave_lbl.setText("✅ Generator → FX Chain aktywny")
 
             if self.btn_sweep.isChecked(): self._start_sweep()
             if self.btn_remix.isChecked(): self._start_remix()
         else:
-            self._sweep_timer.stop(); self._remix_timer.stop()
-            if self._pipe:
-                self._pipe.set_state(Gst.State.NULL)
-                self._pipe = None
+            self._stop_sweep(); self._remix_timer.stop()
+            if self._app: self._app._stop_test_input()
             self._src = None; self._vol_el = None
             self.btn_start.setText("▶ START GENERATOR")
             self._wave_lbl.setText("● OFF")
             self._sweep_lbl.setText("● STOP")
-            # Informacja — Monitor Mode zostaje aktywny (user może go wyłączyć ręcznie)
-            # żeby nie przerywać odsłuchu jeśli user chce coś jeszcze sprawdzić
 
     def _on_vol(self, v):
-        if self._vol_el:
-            try: self._vol_el.set_property("volume", v/100.0)
-            except: pass
+        if self._vol_el and self._auto():
+            self._auto().set(self._vol_el, "volume", v/100.0)
 
     def _on_wave_btn(self, wave_id, btn):
         # Wyłącz remix
@@ -5805,7 +8740,8 @@ class TestSignalGenerator(QGroupBox):
         self._s("wave", 0)
 
     def _on_tempo(self, t):
-        if self._sweep_timer.isActive(): self._sweep_timer.setInterval(self.TEMPO_MS[t])
+        if self._sweep_t0 is not None: self._start_sweep()
+        elif self._sweep_timer.isActive(): self._sweep_timer.setInterval(self.TEMPO_MS[t])
         if self._remix_timer.isActive(): self._remix_timer.setInterval(self.WAVE_HOLD[t])
 
     # ── Freq ─────────────────────────────────────────────────────────────────
@@ -5822,7 +8758,7 @@ class TestSignalGenerator(QGroupBox):
         if self.btn_sweep.isChecked():
             self.btn_sweep.blockSignals(True); self.btn_sweep.setChecked(False)
             self.btn_sweep.blockSignals(False)
-            self._sweep_timer.stop(); self._sweep_lbl.setText("● STOP (ręczny)")
+            self._stop_sweep(); self._sweep_lbl.setText("● STOP (ręczny)")
         self._set_freq(v)
 
     # ── Sweep ─────────────────────────────────────────────────────────────────
@@ -5830,16 +8766,84 @@ class TestSignalGenerator(QGroupBox):
     def _on_sweep(self, active):
         if active: self._start_sweep()
         else:
-            self._sweep_timer.stop(); self._sweep_lbl.setText("● STOP")
+            self._stop_sweep(); self._sweep_lbl.setText("● STOP")
 
     def _start_sweep(self):
         t = self.tempo_cb.currentText()
+        self._stop_sweep()
         self._sweep_freq  = float(self.FREQ_CENTER)
         self._sweep_phase = 0   # 0: center→low  1: low→high  2: high→center
-        self._sweep_timer.setInterval(self.TEMPO_MS[t])
+        auto = self._auto()
+        if self._active and auto and auto.ok and self._sweep_arm(first=True):
+            # Rampa na zegarze potoku — timer Qt tylko odświeża etykietę/suwak
+            self._sweep_timer.setInterval(self.SWEEP_SHOW_MS)
+        else:
+            self._sweep_timer.setInterval(self.TEMPO_MS[t])
         self._sweep_timer.start()
 
+    def _stop_sweep(self):
+        self._sweep_timer.stop()
+        if self._sweep_rearm is not None:
+            GLib.source_remove(self._sweep_rearm); self._sweep_rearm = None
+        if self._sweep_t0 is not None:
+            self._sweep_t0 = None
+            if self._src and self._auto(): self._auto().hold(self._src, "freq")
+
+    def _sweep_plan(self):
+        """
+        Jeden cykl center→low→high→center jako łamana [(offset_ns, Hz)].
+        Czas fazy = liczba kroków TEMPO_STEP × TEMPO_MS (jak w trybie krokowym);
+        punkty geometrycznie, SWEEP_PPO na oktawę — liniowa interpolacja
+        między nimi przybliża sweep wykładniczy.
+        """
+        t = self.tempo_cb.currentText()
+        step, tick = self.TEMPO_STEP[t], self.TEMPO_MS[t] * Gst.MSECOND
+        c  = float(self.FREQ_CENTER)
+        lo = min(c, float(max(20,    self._sw_lo.value())))
+        hi = max(c, float(min(16000, self._sw_hi.value())))
+        pts, t0, bounds = [(0, c)], 0, []
+        for a, b in ((c, lo), (lo, hi), (hi, c)):
+            ratio = max(a, b) / min(a, b)
+            dur   = max(1.0, math.log(ratio) / math.log(step)) * tick
+            k     = max(1, math.ceil(math.log2(ratio) * self.SWEEP_PPO))
+            pts  += [(t0 + dur * j / k, a * (b / a) ** (j / k)) for j in range(1, k + 1)]
+            t0   += dur; bounds.append(t0)
+        return pts, int(t0), bounds
+
+    def _sweep_arm(self, first=False):
+        """Wgrywa SWEEP_AHEAD cykli od początku bieżącego; re-arm co cykl (nowe Lo/Hi)."""
+        pts, cycle, bounds = self._sweep_plan()
+        if not first and self._sweep_t0 is not None:
+            self._sweep_t0 += self._sweep_cycle
+        pts = [(i * cycle + dt, f) for i in range(self.SWEEP_AHEAD) for dt, f in pts]
+        t0 = self._auto().curve(self._src, "freq", pts,
+                                t0=None if first else self._sweep_t0)
+        if t0 is None:
+            self._sweep_t0 = None; self._sweep_rearm = None
+            return False
+        self._sweep_t0, self._sweep_cycle, self._sweep_bounds = t0, cycle, bounds
+        self._sweep_rearm = GLib.timeout_add(max(1, cycle // Gst.MSECOND), self._sweep_arm)
+        return first
+
+    def _sweep_show(self):
+        """Etykieta/suwak z wartości policzonej przez kontroler."""
+        hz  = float(self._src.get_property("freq"))
+        now = self._auto().now(self._src)
+        if now is not None:
+            ph = (now - self._sweep_t0) % self._sweep_cycle
+            self._sweep_phase = sum(ph >= b for b in self._sweep_bounds[:2])
+        self._sweep_freq = hz
+        txt, col = (("↓ center→low", "#FF8800"), ("↑ low→high", "#00FF88"),
+                    ("↓ high→center", "#FF8800"))[self._sweep_phase]
+        self._sweep_lbl.setText(f"{txt}   {int(hz)} Hz")
+        self._sweep_lbl.setStyleSheet(f"color:{col};font-size:10px")
+        self.freq_sl.blockSignals(True); self.freq_sl.setValue(int(hz))
+        self.freq_sl.blockSignals(False)
+        self.freq_lbl.setText(f"{int(hz)} Hz")
+
     def _sweep_tick(self):
+        if self._sweep_t0 is not None and self._src:
+            self._sweep_show(); return
         t    = self.tempo_cb.currentText()
         step = self.TEMPO_STEP[t]
         lo   = float(max(20,   self._sw_lo.value()))
@@ -5902,8 +8906,7 @@ class TestSignalGenerator(QGroupBox):
         self._remix_idx += 1
 
     def closeEvent(self, e):
-        self._sweep_timer.stop(); self._remix_timer.stop()
-        if self._pipe: self._pipe.set_state(Gst.State.NULL)
+        self._stop_sweep(); self._remix_timer.stop()
         super().closeEvent(e)
 
 
@@ -5918,8 +8921,7 @@ class CarbonPhaserPlayer(QMainWindow):
         self.setWindowTitle("CarbonX Player  v3.0")
         self.scale=1.0
         self.pl=[]; self.idx=-1; self.play=False
-        self._mon_pipe=None
-        self._mon_resolver=None
+        self._src_kind="file"    # aktywne wejście input-selectora: file / mon / test
 
         # Calculate 80% of screen at 16:10
         scr=QApplication.primaryScreen().availableGeometry()
@@ -5934,146 +8936,208 @@ class CarbonPhaserPlayer(QMainWindow):
         self.tm=QTimer(); self.tm.timeout.connect(self._poll); self.tm.start(50)
 
     def closeEvent(self,event):
-        self._stop_monitor_pipe()
         if self.ply: self.ply.set_state(Gst.State.NULL)
+        if getattr(self,"bus_disp",None):
+            st=self.bus_disp.stats()
+            print(f"[Bus] {st['total']} wiadomości, odrzucone {st['dropped']}, "
+                  f"scalone {st['coalesced']}  {st['counts']}")
+            self.bus_disp.stop()
+        if getattr(self,"queue_tm",None):
+            self.queue_tm.stop(); self.queue_tm.report()
+        if getattr(self,"analysis",None): self.analysis.report()
+        if getattr(self,"limiter_router",None):
+            for pid,st in self.limiter_router.switch_stats().items():
+                print(f"  [Switch:{pid}] przełączeń {st['switches']}, attach {st['attach_ms']} ms")
+            for pid in self.limiter_router.built_points():
+                st=self.limiter_router.peek(pid).ctl_stats
+                if st["blocks"]:
+                    print(f"  [MBL:{pid}] Auto* w wątku streamingu: {st['blocks']} bloków, "
+                          f"{st['us']/st['blocks']:.1f} µs/blok, przełączeń AI {st['switches']}")
+        print(f"  [SmartEQ] {self.eqw.stats}")
+        for n,(k,avg,mx) in self.viz.layer_report().items():
+            print(f"  [Viz] {n:<18} {k:6d}×  śr {avg:6.2f} ms  max {mx:6.2f} ms")
         cleanup_virtual_sink()
         super().closeEvent(event)
 
     # ── GST PIPELINE ────────────────────────────────────────────────────
     def _gst_init(self):
         """
-        uridecodebin -> audioconvert -> audioresample -> tee
-            tee -> queue -> [Tape -> EQ -> Spatial -> Chain modules] -> audioconvert -> autoaudiosink
-            tee -> queue -> spectrum -> fakesink
+        deck(uridecodebin x2 -> concat | audiomixer) | pulsesrc | audiotestsrc -> input-selector
+            -> audioconvert -> audioresample -> fx_caps(FX_CAPS) -> tee
+            tee -> [bin FX: queue -> Tape -> EQ -> Spatial -> Chain modules -> fx_out]
+                -> audioconvert -> volume -> autoaudiosink
+            tee -> valve -> queue -> audioconvert -> audioresample -> mono @ ANALYSIS_RATE
+                -> appsink (SpectrumAnalyzer)  |  spectrum -> fakesink
+        Od fx_caps do fx_out format jest stały (FX_CAPS); audioconvert tylko
+        wokół pluginów, których caps tego wymagają (conv_for / DSP_META).
         """
+        t_init=time.perf_counter(); rss0=rss_mb()
         self.ply=Gst.Pipeline.new("carbon")
-        self.src=mkgst("uridecodebin","src")
-        if self.src: self.src.connect("pad-added",self._on_pad)
+        # Pliki/streamy: dwa dekodery → concat (gapless, GaplessDeck)
+        self.deck=GaplessDeck(self.ply,on_switch=self._on_track_switched)
+        # Pozostałe wejścia — monitor (virtual sink) i generator testowy
+        self.mon_src=mkgst("pulsesrc","mon_src",{"device":f"{VIRTUAL_SINK}.monitor"})
+        self.tsg_src=mkgst("audiotestsrc","tsg_src",
+                           {"wave":0,"freq":440.0,"volume":1.0,"is-live":True})
+        self.tsg_vol=mkgst("volume","tsg_vol",{"volume":0.6})
+        self.in_sel =mkgst("input-selector","in_sel")
         self.conv_in=mkgst("audioconvert","conv_in")
         self.res_in =mkgst("audioresample","res_in")
+        self.fx_caps=mkgst("capsfilter","fx_caps",{"caps":Gst.Caps.from_string(FX_CAPS)})
         self.tee    =mkgst("tee","tee")
 
-        # FX queue
-        self.q_fx=mkgst("queue","q_fx",{"max-size-buffers":0,"max-size-time":0,"max-size-bytes":0})
-
-        # Tape sim
-        self.tape_sat =mkgst("audiodynamic","tape_sat",
-                              {"characteristics":"soft-knee","mode":"compressor",
-                               "threshold":1.0,"ratio":1.0})
-        self.tape_gain=mkgst("volume","tape_gain",{"volume":1.0})
-        self.tape_tone=mkgst("equalizer-3bands","tape_tone")
-
-        # EQ
-        self.eq=mkgst("equalizer-10bands","eq10")
-
-        # Spatial
-        # UWAGA: plugin 'stereo' wymaga audioconvert przed i po sobie (inne caps)
-        self.sp_sat    = mkgst("audiodynamic","sp_sat",
-                               {"characteristics":"hard-knee","mode":"compressor",
-                                "threshold":0.0,"ratio":1.0})
-        self.sp_conv1  = mkgst("audioconvert","sp_conv1")   # przed stereo
-        # Plugin stereo negocjuje format przez sp_conv1 — nie potrzebuje capsfilter
-        self.sp_stereo = mkgst("stereo","sp_stereo",{"stereo":1.0})
-        self.sp_conv2  = mkgst("audioconvert","sp_conv2")   # po stereo
-        self.sp_echo   = mkgst("audioecho","sp_echo",{"delay":1,"intensity":0.0,"feedback":0.0})
-
-        # Phantom Stereo — własny niezależny blok za Spatial FX
-        # Topologia: sp_echo → ph_conv1 → ph_stereo → ph_conv2 → ph_echo → DSPResolver
-        # Bypass: ph_stereo.stereo=1.0, ph_echo.intensity=0.0 (sygnał bez zmian)
-        self.ph_conv1  = mkgst("audioconvert","ph_conv1")
-        self.ph_stereo = mkgst("stereo",      "ph_stereo", {"stereo":1.0})
-        self.ph_conv2  = mkgst("audioconvert","ph_conv2")
-        self.ph_echo   = mkgst("audioecho",   "ph_echo",
-                               {"delay":1,"intensity":0.0,"feedback":0.0})
-
-        # Signal chain modules — wszystkie tworzone z wartościami neutralnymi
-        # AutoResolver zadecyduje o kolejności i konwerterach
-        self.chain_els={}
-        for mid in CHAIN_ORDER:
-            plugin,neutral,_=CHAIN_GST[mid]
-            self.chain_els[mid]=mkgst(plugin,f"ch_{mid}",neutral)
-
-        # Output
+        # Tor FX (Tape → EQ → Spatial → Phantom → chain → fx_out) jako jeden bin
+        # Elementy dostępne po kluczu spec jako atrybuty: self.tape_sat, self.eq, self.ph_echo...
+        self.fx_factory=FXChainFactory()
+        self.fx=self.fx_factory.build("", with_mbl=True)
+        for key,el in self.fx.els.items():
+            setattr(self,key,el)
+        self.chain_els=self.fx.chain_els
+        self.dsp_resolver=self.fx.resolver
+
+        # Output — conv_out dopasowuje FX_CAPS do sinka
+        # out_vol — master volume + dip scen (rampy ParamAutomation)
         self.conv_out=mkgst("audioconvert","conv_out")
+        self.out_vol =mkgst("volume","out_vol")
         self.hw_sink =mkgst("autoaudiosink","hw_sink",{"sync":True})
-
-        # Spectrum branch
-        self.q_sp  =mkgst("queue","q_sp",{"max-size-buffers":0,"max-size-time":0,"max-size-bytes":0})
-        self.sp    =mkgst("spectrum","spectrum",
-                           {"bands":64,"threshold":-80,"post-messages":True,"message-magnitude":True})
-        self.sp_snk=mkgst("fakesink","sp_snk",{"sync":False,"silent":True})
-
-        # Add stałe elementy do pipeline (chain_els dodaje AutoResolver)
-        for el in ([self.src,self.conv_in,self.res_in,self.tee,
-                    self.q_fx,self.tape_sat,self.tape_gain,self.tape_tone,
-                    self.eq,self.sp_sat,self.sp_conv1,self.sp_stereo,self.sp_conv2,self.sp_echo,
-                    self.ph_conv1,self.ph_stereo,self.ph_conv2,self.ph_echo]
-                   +list(self.chain_els.values())
-                   +[self.conv_out,self.hw_sink,self.q_sp,self.sp,self.sp_snk]):
+        self.automation=ParamAutomation()
+
+        # Gałąź analizy: tee → q_sp → appsink + numpy FFT (AnalysisRing)
+        # albo dawny spectrum → fakesink z wiadomościami na bus
+        self.an_valve=mkgst("valve","an_valve")   # AnalysisHub: drop gdy brak subskrybentów
+        self.q_sp  =mkgst("queue","q_sp",QUEUE_PROFILES["analysis"])
+        # Pre-stage: downmix + resample raz, w wątku kolejki — wspólny dla obu silników
+        self.an_conv=mkgst("audioconvert","an_conv")
+        self.an_res =mkgst("audioresample","an_res",{"quality":2})
+        self.an_caps=mkgst("capsfilter","an_caps",{"caps":Gst.Caps.from_string(ANALYSIS_CAPS)})
+        if ANALYSIS_ENGINE=="fft":
+            self.analyzer=SpectrumAnalyzer("an_sink")
+            self.sp=self.analyzer.sink; self.sp_snk=None
+        else:
+            self.analyzer=None
+            self.sp    =mkgst("spectrum","spectrum",
+                               {"bands":64,"threshold":-80,"post-messages":True,"message-magnitude":True,
+                                "interval":ANALYSIS_INTERVAL_MS*Gst.MSECOND})
+            self.sp_snk=mkgst("fakesink","sp_snk",{"sync":False,"silent":True})
+
+        for el in [self.mon_src,self.tsg_src,self.tsg_vol,self.in_sel,
+                   self.conv_in,self.res_in,self.fx_caps,self.tee,self.fx.bin,
+                   self.conv_out,self.out_vol,self.hw_sink,self.an_valve,self.q_sp,self.an_conv,self.an_res,self.an_caps,
+                   self.sp,self.sp_snk]:
             if el: self.ply.add(el)
 
-        # Static links (przed chain)
         def lnk(a,b):
             if a and b:
                 if not a.link(b): print(f"  [!] link: {a.get_name()} -> {b.get_name()}")
-        lnk(self.conv_in,self.res_in); lnk(self.res_in,self.tee)
-        lnk(self.tee,self.q_fx)
-        prev=self.q_fx
-        for el in [self.tape_sat,self.tape_gain,self.tape_tone,
-                   self.eq,self.sp_sat,self.sp_conv1,self.sp_stereo,self.sp_conv2,self.sp_echo,
-                   self.ph_conv1,self.ph_stereo,self.ph_conv2,self.ph_echo]:
-            if el: lnk(prev,el); prev=el
-
-        # AutoResolver DSP — dynamiczny łańcuch chain
-        self.dsp_resolver = DSPAutoResolver(
-            pipeline    = self.ply,
-            entry_el    = self.ph_echo,
-            exit_el     = self.conv_out,
-            name_prefix = "main",
-        )
-        self.dsp_resolver.set_chain_elements(self.chain_els)
-        self.dsp_resolver.init_convs()  # tworzy sloty konwerterów w pipeline
 
-        # Domyślne połączenie: ph_echo → conv_out (brak aktywnych modułów chain)
-        lnk(self.ph_echo, self.conv_out)
+        # input-selector: po jednym stałym padzie na źródło. Nieaktywne źródła
+        # są zablokowane w NULL — zmiana wejścia to tylko przełączenie active-pad.
+        self._inputs={"file":None,"mon":self.mon_src,"test":self.tsg_src}   # file = self.deck
+        self._sel_pads={}
+        req=getattr(self.in_sel,"request_pad_simple",None) or self.in_sel.get_request_pad
+        for kind,up in (("file",self.deck.concat),("file_x",self.deck.mixer),
+                        ("mon",self.mon_src),("test",self.tsg_vol)):
+            pad=req("sink_%u"); self._sel_pads[kind]=pad
+            if up and pad: up.get_static_pad("src").link(pad)
+        lnk(self.tsg_src,self.tsg_vol)
+        for kind in ("mon","test"):
+            if self._inputs[kind]: self._inputs[kind].set_locked_state(True)
+        self.in_sel.set_property("active-pad",self._sel_pads["file"])
+        lnk(self.in_sel,self.conv_in)
+
+        lnk(self.conv_in,self.res_in); lnk(self.res_in,self.fx_caps); lnk(self.fx_caps,self.tee)
+        lnk(self.tee,self.fx.bin)
 
         # MultibandLimiter instances — jeden per punkt wstrzyknięcia
-        # POST_FX: między conv_out a hw_sink (master output)
-        # INPUT:   między conv_in a res_in (wejście, przed wszystkim)
-        # POST_EQ: między eq a sp_sat (po EQ, przed Spatial)
-        self._mbl_post_fx = MultibandLimiter(self.ply, "mbl_out",  MBLIMIT_BANDS)
-        self._mbl_input   = MultibandLimiter(self.ply, "mbl_in",   MBLIMIT_BANDS)
-        self._mbl_post_eq = MultibandLimiter(self.ply, "mbl_eq",   MBLIMIT_BANDS)
+        # Wszystkie punkty leżą w torze FX_CAPS — MBL bez własnych audioconvert
+        # POST_FX: między binem FX a conv_out (master output)
+        # INPUT:   między fx_caps a tee (wejście, przed wszystkim)
+        # POST_EQ: między eq a sp_sat — wewnątrz binu FX (FX_CHAIN_MBL)
+        # LAZY_DSP: router dostaje fabryki — MBL powstaje przy pierwszym enable/get
+        mk_out=mbl_factory(self.ply, "POST_FX", MBL_OUTER_POINTS["POST_FX"])
+        mk_in =mbl_factory(self.ply, "INPUT",   MBL_OUTER_POINTS["INPUT"])
+        self._mbl_post_fx = mk_out if LAZY_DSP else mk_out()
+        self._mbl_input   = mk_in  if LAZY_DSP else mk_in()
+        self._mbl_post_eq = self.fx.mbls["POST_EQ"]
+
+        # Połącz bezpośrednio (MBL domyślnie wyłączone) — przed rejestracją
+        # punktów: MBL_WIRING="switch" wpina się w istniejące połączenie up → dn
+        lnk(self.fx.bin, self.conv_out); lnk(self.conv_out, self.out_vol); lnk(self.out_vol, self.hw_sink)
 
         # LimiterRouter — zarządza wszystkimi punktami
         self.limiter_router = LimiterRouter()
-        self.limiter_router.register("INPUT",   self._mbl_input,   self.conv_in,  self.res_in)
+        self.limiter_router.register("INPUT",   self._mbl_input,   self.fx_caps,  self.tee)
         self.limiter_router.register("POST_EQ", self._mbl_post_eq, self.eq,       self.sp_sat)
-        self.limiter_router.register("POST_FX", self._mbl_post_fx, self.conv_out, self.hw_sink)
+        self.limiter_router.register("POST_FX", self._mbl_post_fx, self.fx.bin,   self.conv_out,
+                                     tp=lambda: TruePeakLimiter(self.ply, "tp_out"))
 
         # Podepnij limiter_router do resolvera — eject/re-inject wokół rebuild
         self.dsp_resolver.limiter_router = self.limiter_router
 
-        # Połącz bezpośrednio (MBL domyślnie wyłączone)
-        lnk(self.conv_out, self.hw_sink)
-
         # Spectrum branch
-        lnk(self.tee,self.q_sp); lnk(self.q_sp,self.sp); lnk(self.sp,self.sp_snk)
-
+        lnk(self.tee,self.an_valve); lnk(self.an_valve,self.q_sp)
+        lnk(self.q_sp,self.an_conv); lnk(self.an_conv,self.an_res); lnk(self.an_res,self.an_caps)
+        lnk(self.an_caps,self.sp); lnk(self.sp,self.sp_snk)
+
+        # BusDispatcher: szum odrzucony w sync handlerze, level/spectrum raz na klatkę;
+        # do _on_bus (pętla GLib) trafiają tylko EOS / ERROR / stan pipeline
+        self.bus_disp=BusDispatcher(self.ply)
+        self.bus_disp.route_limiters(self.limiter_router)
+        self.bus_disp.on_spectrum=self._spectrum
+        # Telemetria kolejek: tor FX, gałąź analizy, gałęzie pasm MBL
+        self.queue_tm=QueueTelemetry()
+        self.queue_tm.add(self.fx["q_fx"]); self.queue_tm.add(self.q_sp)
+        def tm_mbl(pid,mbl):
+            for q in mbl._queues: self.queue_tm.add(q)
+        for pid in self.limiter_router.built_points(): tm_mbl(pid,self.limiter_router.peek(pid))
+        self.limiter_router.on_built.append(tm_mbl)
+        self.queue_tm.start()
+        self.analysis=AnalysisHub(self.an_valve,
+                                  on_change=lambda on:self.analyzer and self.analyzer.reset())
+        self._an_seq=0
+        GLib.timeout_add(BusDispatcher.FRAME_MS,self._analysis_frame)
         bus=self.ply.get_bus(); bus.add_signal_watch()
         bus.connect("message",self._on_bus)
         print("Main pipeline built (DSPAutoResolver + MultibandLimiter)")
+        n_els=len(iterate_recurse(self.ply))
+        print(f"[Startup] _gst_init {(time.perf_counter()-t_init)*1000:.1f} ms, "
+              f"{n_els} elementów, RSS {rss_mb():.1f} MB (+{rss_mb()-rss0:.1f})"
+              f"  LAZY_DSP={LAZY_DSP}")
+
+    def _set_input(self,kind,device=None):
+        """
+        Przełącza wejście input-selectora (file / mon / test) bez przebudowy toru FX.
+        Nieaktywne źródła: locked + NULL. Stan elementów FX nie jest kopiowany
+        — jest jeden tor i jeden zestaw parametrów.
+        """
+        for k,el in self._inputs.items():
+            if k!=kind and el:
+                el.set_locked_state(True); el.set_state(Gst.State.NULL)
+        if kind!="file": self.deck.reset()
+        src=self._inputs.get(kind)
+        if src:
+            if kind=="mon" and device: src.set_property("device",device)
+            src.set_locked_state(False)
+            src.sync_state_with_parent()
+        self.in_sel.set_property("active-pad",
+                                 self._sel_pads[self.deck.out_key() if kind=="file" else kind])
+        # Źródła live (monitor, generator) — sink bez sync, inaczej underrun przy FX
+        try: self.hw_sink.set_property("sync",kind=="file")
+        except: pass
+        self._src_kind=kind
+        print(f"[Input] {kind}" + (f"  ({device})" if device else ""))
 
-    def _on_pad(self,src,pad):
-        caps=pad.get_current_caps()
-        if caps:
-            s=caps.get_structure(0)
-            if s and not s.get_name().startswith("audio"): return
-        if not self.conv_in: return
-        sink=self.conv_in.get_static_pad("sink")
-        if sink and not sink.is_linked():
-            ret=pad.link(sink)
-            print(f"Pad link: {ret.value_name}")
+    def _start_test_input(self):
+        """Generator testowy jako wejście toru FX (TestSignalGenerator)."""
+        self._set_input("test")
+        self.ply.set_state(Gst.State.PLAYING)
+        self.play=True; self.bp.setText("⏸"); self.lt.setText("🔬 Generator")
+
+    def _stop_test_input(self):
+        if self._src_kind!="test": return
+        self.ply.set_state(Gst.State.NULL)
+        self._set_input("file")
+        self.play=False; self.bp.setText("▶"); self.lt.setText("Ready")
 
     def _on_bus(self,bus,msg):
         t=msg.type
@@ -6101,57 +9165,34 @@ class CarbonPhaserPlayer(QMainWindow):
                 GLib.idle_add(lambda:(self.ply.set_state(Gst.State.NULL),
                                       setattr(self,'play',False),
                                       self.bp.setText("Play")))
-        elif t==Gst.MessageType.ELEMENT:
-            s=msg.get_structure()
-            if not s: return
-            if s.get_name()=="spectrum":
-                self._spectrum(s)
-            elif s.get_name()=="level":
-                src_name = msg.src.get_name() if msg.src else ""
-                if src_name and hasattr(self,"limiter_router") and self.limiter_router:
-                    for pid in self.limiter_router.registered_points():
-                        mbl = self.limiter_router.get(pid)
-                        if mbl and mbl._injected:
-                            for node in mbl.nodes:
-                                if node._level and node._level.get_name()==src_name:
-                                    node.handle_level_message(s); break
-            elif s.get_name()=="level":
-                # Routing przez msg.src — przekaż do właściwego node MBL
-                src_el = msg.src
-                src_name = src_el.get_name() if src_el else ""
-                if src_name and hasattr(self, 'limiter_router'):
-                    for pid in self.limiter_router.registered_points():
-                        mbl = self.limiter_router.get(pid)
-                        if mbl and mbl._injected:
-                            for node in mbl.nodes:
-                                lvl_name = node._level.get_name() if node._level else ""
-                                if lvl_name and lvl_name == src_name:
-                                    node.handle_level_message(s)
-                                    break
+
+    def _sync_analysis_subs(self):
+        """Subskrypcje ze stanu konsumentów — wołane co klatkę, set() jest idempotentne."""
+        viz_on=self.play and self.viz.isVisible() and not self.isMinimized()
+        self.analysis.set("viz",viz_on); self.viz.set_running(viz_on)
+        self.analysis.set("smarteq",self.eqw.proc.active)
+
+    def _analysis_frame(self):
+        """Najnowsza ramka AnalysisRing → wizualizer, SmartEQ (10 pasm EQ)."""
+        self._sync_analysis_subs()
+        if not self.analysis.active:
+            # Brak danych analizy — SmartEQ PHASE/EXP nadal moduluje EQ
+            if self.eqw.proc.geo_active: self.eqw.proc.process(None)
+            return True
+        if not self.analyzer: return True    # ANALYSIS_ENGINE="spectrum" — dane idą przez bus
+        ring=self.analyzer.ring
+        seq,viz=ring.latest("viz")
+        if seq==self._an_seq: return True
+        self._an_seq=seq
+        self.viz.update_data(spectrum_normalize(viz))
+        self.eqw.proc.process(spectrum_normalize(ring.latest("eq")[1]))
+        return True
 
     def _spectrum(self,s):
-        rm=[]
-        try: rm=s.get_value("magnitude")
-        except TypeError:
-            try:
-                m=re.search(r'magnitude=\(float\)\{\s*([^}]+)\s*\}',s.to_string())
-                if m: rm=[float(x.strip()) for x in m.group(1).split(',')]
-            except: pass
-        if rm:
-            d=[max(0,min(1,(x+80)/80)) for x in rm]
+        rm=spectrum_magnitudes(s)
+        if rm is not None and rm.size:
+            d=spectrum_normalize(rm)
             self.viz.update_data(d); self.eqw.proc.process(d)
-            if hasattr(self,"limiter_router_widget"):
-                overall_rms = sum(rm)/len(rm)
-                for w in self.limiter_router_widget._detail_widgets.values():
-                    try: w.update_overall_rms(overall_rms)
-                    except: pass
-            # Oblicz ogólny RMS z magnitude i przekaż do MBL AutoInsert
-            if hasattr(self,'limiter_router_widget'):
-                overall_rms = sum(rm) / len(rm)
-                # Przekaż do wszystkich otwartych detail widget MBL
-                for w in self.limiter_router_widget._detail_widgets.values():
-                    try: w.update_overall_rms(overall_rms)
-                    except: pass
 
     # ── UI BUILD ─────────────────────────────────────────────────────────
     def _build_ui(self):
@@ -6231,7 +9272,11 @@ class CarbonPhaserPlayer(QMainWindow):
 
         r2=QHBoxLayout(); r2.setSpacing(4)
         mon_b=QPushButton("Monitor"); mon_b.clicked.connect(self._start_monitor); r2.addWidget(mon_b)
-        r2.addStretch(); bv.addLayout(r2)
+        r2.addStretch()
+        self.xf_cb=QComboBox(); self.xf_cb.addItems(["Gapless","X-fade 2s","X-fade 4s","X-fade 8s"])
+        self.xf_cb.currentIndexChanged.connect(
+            lambda i:self.deck.set_crossfade((0.0,2.0,4.0,8.0)[i]))
+        r2.addWidget(self.xf_cb); bv.addLayout(r2)
 
         # Transport
         tr=QHBoxLayout(); tr.setSpacing(4)
@@ -6323,10 +9368,10 @@ class CarbonPhaserPlayer(QMainWindow):
         root.addWidget(hsplit,1)
 
     def _connect_widgets(self):
-        self.eqw.set_gst(self.eq)
+        self.eqw.set_gst(self.eq); self.eqw.set_automation(self.automation)
         self.tape_sim.set_pipeline(self.tape_sat,self.tape_gain,self.tape_tone)
         self.tape_spatial.set_pipeline(self.sp_stereo,self.sp_echo,self.sp_sat)
-        self.chain_panel.attach(self.chain_els)
+        self.chain_panel.attach(self.chain_els,factory=self.dsp_resolver.element)
         self.chain_panel.set_resolver(self.dsp_resolver)
         self.limiter_router_widget.set_router(self.limiter_router)
         # Phantom Stereo — własne elementy GST (ph_*), niezależne od Spatial
@@ -6340,7 +9385,7 @@ class CarbonPhaserPlayer(QMainWindow):
         self.scene_mgr = SceneManager(self)
         self.scene_bar.set_manager(self.scene_mgr)
         self._connect_change_notify()
-        # Generator testowy — referencja do app dla Monitor Mode
+        # Generator testowy — referencja do app (wejście "test" input-selectora)
         self.test_gen.set_app(self)
 
     def _connect_change_notify(self):
@@ -6377,29 +9422,29 @@ class CarbonPhaserPlayer(QMainWindow):
         if i<0 or i>=len(self.pl): return
         self.idx=i; uri,name=self.pl[i]
 
-        # Jeśli aktualnie gramy monitor i przełączamy na ten sam monitor — nic nie rób
-        if self._mon_pipe and uri.startswith("pulsesrc://"):
-            # Już gramy monitor — sprawdź czy to ten sam device
+        if uri.startswith("pulsesrc://"):
+            # Monitor — tylko przełączenie wejścia, tor FX gra dalej
             mon_dev = uri.replace("pulsesrc://","")
-            cur_src = self._mon_pipe.get_by_name("mon_src")
-            if cur_src:
-                try:
-                    cur_dev = cur_src.get_property("device")
-                    if cur_dev == mon_dev:
-                        return  # Ten sam monitor — nic nie rób
-                except: pass
-
-        # Zatrzymaj monitor pipeline jeśli istnieje
-        if self._mon_pipe:
-            self._stop_monitor_pipe()
-            self.play = False
+            if (self._src_kind=="mon" and self.play and self.mon_src
+                    and self.mon_src.get_property("device")==mon_dev):
+                return  # Ten sam monitor — nic nie rób
+            self._set_input("mon",mon_dev)
+            ret=self.ply.set_state(Gst.State.PLAYING)
+            print(f"Monitor: {name}  [{ret.value_name}]")
+            self.play=True; self.bp.setText("⏸")
+            self.lt.setText(f"🎤 {name}"); self.ls.setCurrentRow(i); self._up_meta()
+            return
 
-        if uri.startswith("pulsesrc://"):
-            self._start_mon_pipe(uri.replace("pulsesrc://",""), name); return
+        # Gapless/crossfade: utwór już prerollowany na drugim decku — concat przełączy
+        # na granicy próbki albo mikser zrobi przejście (UI odświeża _on_track_switched)
+        if (GAPLESS and self._src_kind=="file" and self.play
+                and self.deck.prepared()==i and self.deck.skip()):
+            return
 
         # Stop main pipeline before changing URI
         self.ply.set_state(Gst.State.NULL)
         self.ply.get_state(Gst.CLOCK_TIME_NONE)
+        self._set_input("file")
 
         if "[TV]" in name:
             self.dstack.setCurrentIndex(1)
@@ -6407,22 +9452,41 @@ class CarbonPhaserPlayer(QMainWindow):
         else:
             self.dstack.setCurrentIndex(0); self.video_player.stop()
 
-        self.src.set_property("uri",uri)
+        self.deck.load(i,uri)
+        self.in_sel.set_property("active-pad",self._sel_pads[self.deck.out_key()])
         # Re-wstrzyknij aktywne MBL przed startem playbacku
         if hasattr(self, 'limiter_router'):
             for pid in self.limiter_router.registered_points():
-                mbl = self.limiter_router.get(pid)
+                mbl = self.limiter_router.peek(pid)
                 if mbl and not mbl._injected and mbl.enabled and mbl._upstream and mbl._downstream:
                     mbl.inject(mbl._upstream, mbl._downstream)
         ret=self.ply.set_state(Gst.State.PLAYING)
         print(f"Play: {name}  [{ret.value_name}]")
         self.play=True; self.bp.setText("⏸")
         self.lt.setText(name); self.ls.setCurrentRow(i); self._up_meta()
+        self._prepare_next()
+
+    def _prepare_next(self):
+        """Preroll następnej pozycji — tylko lokalne pliki audio (streamy nie mają końca)."""
+        if not GAPLESS or self._src_kind!="file" or len(self.pl)<2: return
+        cur_uri,cur_name=self.pl[self.idx]
+        n=(self.idx+1)%len(self.pl); uri,name=self.pl[n]
+        if (cur_uri.startswith("file://") and uri.startswith("file://")
+                and "[TV]" not in cur_name and "[TV]" not in name):
+            self.deck.prepare(n,uri)
+
+    def _on_track_switched(self,item):
+        """concat przeszedł na prerollowany utwór (EOS albo skip) — tylko UI."""
+        if item is None or item>=len(self.pl): return
+        self.idx=item; name=self.pl[item][1]
+        print(f"Gapless → {name}")
+        self.lt.setText(name); self.ls.setCurrentRow(item); self._up_meta()
+        self._prepare_next()
 
     def _pp(self):
         if not self.pl: return
         if self.idx==-1: self._pl_t(0); return
-        pipe=self._mon_pipe or self.ply
+        pipe=self.ply
         if self.play:
             pipe.set_state(Gst.State.PAUSED); self.play=False; self.bp.setText("▶")
         else:
@@ -6434,23 +9498,16 @@ class CarbonPhaserPlayer(QMainWindow):
         if self.pl: self._pl_t((self.idx-1)%len(self.pl))
 
     def _seek(self):
-        if self._mon_pipe: return
+        if self._src_kind!="file": return
+        self.deck.settle()
         self.ply.seek_simple(Gst.Format.TIME,Gst.SeekFlags.FLUSH,self.sk.value()*Gst.SECOND)
 
     def _vol(self,v):
-        vol=v/100.0
-        if self.hw_sink:
-            try: self.hw_sink.set_property("volume",vol)
-            except: pass
-        if self._mon_pipe:
-            hw=self._mon_pipe.get_by_name("mon_hw")
-            if hw:
-                try: hw.set_property("volume",vol)
-                except: pass
+        self.automation.set(self.out_vol,"volume",v/100.0)
 
     def _clr(self):
         self.ply.set_state(Gst.State.NULL)
-        self._stop_monitor_pipe()
+        self._set_input("file"); self.deck.reset()
         self.video_player.stop(); self.dstack.setCurrentIndex(0)
         self.play=False; self.pl=[]; self.ls.clear(); self.idx=-1; self.lt.setText("Ready")
 
@@ -6485,30 +9542,6 @@ class CarbonPhaserPlayer(QMainWindow):
             if not self.play and self.idx==-1 and self.pl: self._pl_t(0)
 
     # ── MONITOR MODE ────────────────────────────────────────────────────────
-    def _stop_monitor_pipe(self):
-        """Bezpiecznie zatrzymuje i usuwa monitor pipeline."""
-        if self._mon_pipe:
-            self._mon_pipe.set_state(Gst.State.NULL)
-            self._mon_pipe.get_state(Gst.CLOCK_TIME_NONE)
-            self._mon_pipe = None
-        if self._mon_resolver:
-            self._mon_resolver = None
-        # Wyczyść extra resolvers z chain_panel i anuluj pending rebuild
-        if hasattr(self.chain_panel, '_extra_resolvers'):
-            self.chain_panel._extra_resolvers.clear()
-        if hasattr(self.chain_panel, '_rebuild_timer'):
-            self.chain_panel._rebuild_timer.stop()
-        # Przywróć widgety do main pipeline
-        self.eqw.set_gst(self.eq)
-        self.tape_sim.set_pipeline(self.tape_sat, self.tape_gain, self.tape_tone)
-        self.tape_spatial.set_pipeline(self.sp_stereo, self.sp_echo, self.sp_sat)
-        self.chain_panel.attach(self.chain_els)  # blockSignals wbudowane w attach()
-        # Wyczyść mph_* z phantom — pipeline monitora już nie istnieje
-        self.phantom_stereo.mph_conv1  = None
-        self.phantom_stereo.mph_stereo = None
-        self.phantom_stereo.mph_conv2  = None
-        self.phantom_stereo.mph_echo   = None
-
     def _start_monitor(self):
         if not create_virtual_sink():
             QMessageBox.critical(self,"Error","Failed to create virtual sink!"); return
@@ -6520,164 +9553,17 @@ class CarbonPhaserPlayer(QMainWindow):
             if u == mon_uri:
                 self._pl_t(i); return
 
-        # Pierwsza aktywacja — zatrzymaj odtwarzanie i dodaj wpis (tylko raz)
-        if self.play: self._pp()
+        # Pierwsza aktywacja — dodaj wpis (tylko raz); przełączenie wejścia bez zatrzymywania
         self.pl.append((mon_uri, mon_name))
         self.ls.addItem(mon_name)
         self._pl_t(len(self.pl)-1)
 
-    def _start_mon_pipe(self, device, name):
-        # Zatrzymaj poprzedni monitor pipeline jeśli istnieje
-        self._stop_monitor_pipe()
-        # Wysuń aktywne MBL przed NULL — set_state(NULL) zrywa pady GST
-        _mbl_states = {}
-        if hasattr(self, 'limiter_router'):
-            for pid in self.limiter_router.registered_points():
-                mbl = self.limiter_router.get(pid)
-                if mbl and mbl._injected:
-                    mbl.eject()
-                    _mbl_states[pid] = True
-        self.ply.set_state(Gst.State.NULL)
-        self.ply.get_state(Gst.CLOCK_TIME_NONE)
-
-        p = Gst.Pipeline.new("mon-pipe"); self._mon_pipe = p
-
-        src   = mkgst("pulsesrc",   "mon_src",  {"device": device})
-        conv  = mkgst("audioconvert","mon_conv")
-        res   = mkgst("audioresample","mon_res")
-        tee   = mkgst("tee",        "mon_tee")
-        q_fx  = mkgst("queue","mon_q_fx",{"max-size-buffers":0,"max-size-time":0,"max-size-bytes":0})
-        t_sat = mkgst("audiodynamic","mon_tsat",
-                      {"characteristics":"soft-knee","mode":"compressor",
-                       "threshold":1.0,"ratio":1.0})
-        t_gn  = mkgst("volume",     "mon_tgn",  {"volume":1.0})
-        t_tn  = mkgst("equalizer-3bands","mon_ttn")
-        eq10  = mkgst("equalizer-10bands","mon_eq10")
-        sp_sat  = mkgst("audiodynamic","mon_spsat",
-                        {"characteristics":"hard-knee","mode":"compressor",
-                         "threshold":0.0,"ratio":1.0})
-        sp_conv1 = mkgst("audioconvert","mon_sp_conv1")
-        sw       = mkgst("stereo","mon_sw",{"stereo":1.0})
-        sp_conv2 = mkgst("audioconvert","mon_sp_conv2")
-        echo     = mkgst("audioecho","mon_echo",{"delay":1,"intensity":0.0,"feedback":0.0})
-
-        # Phantom monitor — własny niezależny blok za Spatial monitor
-        mph_conv1  = mkgst("audioconvert","mon_ph_conv1")
-        mph_stereo = mkgst("stereo",      "mon_ph_stereo", {"stereo":1.0})
-        mph_conv2  = mkgst("audioconvert","mon_ph_conv2")
-        mph_echo   = mkgst("audioecho",   "mon_ph_echo",
-                           {"delay":1,"intensity":0.0,"feedback":0.0})
-
-        # Używamy pulsesink z default sink — NIE autoaudiosink (który tworzy nowy strumień)
-        # sync=False żeby uniknąć underrun przy przetwarzaniu FX
-        cvo = mkgst("audioconvert","mon_cvo")
-        hw  = mkgst("pulsesink","mon_hw",{"sync":False,"volume":self.vol_sl.value()/100.0})
-
-        q_sp  = mkgst("queue","mon_q_sp",{"max-size-buffers":0,"max-size-time":0,"max-size-bytes":0})
-        msp   = mkgst("spectrum","mon_sp",{"bands":64,"threshold":-80,
-                                           "post-messages":True,"message-magnitude":True})
-        msnk  = mkgst("fakesink","mon_fsnk",{"sync":False,"silent":True})
-
-        # Kopiuj ustawienia z main pipeline
-        if self.eq and eq10:
-            for i in range(10):
-                try: eq10.set_property(f"band{i}", self.eq.get_property(f"band{i}"))
-                except: pass
-        for src_el, dst_el, props in [
-            (self.tape_sat,  t_sat,  ["threshold","ratio"]),
-            (self.tape_gain, t_gn,   ["volume"]),
-            (self.sp_stereo, sw,     ["stereo"]),
-            (self.sp_echo,   echo,   ["delay","intensity","feedback"]),
-            (self.sp_sat,    sp_sat, ["threshold","ratio"]),
-        ]:
-            if src_el and dst_el:
-                for prop in props:
-                    try: dst_el.set_property(prop, src_el.get_property(prop))
-                    except: pass
-
-        mon_chain={}
-        for mid in CHAIN_ORDER:
-            plugin,neutral,_=CHAIN_GST[mid]
-            el=mkgst(plugin,f"mon_ch_{mid}",neutral)
-            main_el=self.chain_els.get(mid)
-            if main_el and el:
-                for prop in neutral:
-                    try: el.set_property(prop,main_el.get_property(prop))
-                    except: pass
-            mon_chain[mid]=el
-
-        for el in ([src,conv,res,tee,q_fx,t_sat,t_gn,t_tn,eq10,sp_sat,
-                    sp_conv1,sw,sp_conv2,echo,
-                    mph_conv1,mph_stereo,mph_conv2,mph_echo]
-                   +list(mon_chain.values())
-                   +[cvo,hw,q_sp,msp,msnk]):
-            if el: p.add(el)
-
-        def lnk(a,b):
-            if a and b:
-                if not a.link(b): print(f"  [!] mon link: {a.get_name()}->{b.get_name()}")
-        lnk(src,conv); lnk(conv,res); lnk(res,tee); lnk(tee,q_fx)
-        prev=q_fx
-        for el in [t_sat,t_gn,t_tn,eq10,sp_sat,sp_conv1,sw,sp_conv2,echo,
-                   mph_conv1,mph_stereo,mph_conv2,mph_echo]:
-            if el: lnk(prev,el); prev=el
-
-        # AutoResolver dla monitor chain
-        mon_resolver = DSPAutoResolver(
-            pipeline    = p,
-            entry_el    = mph_echo,
-            exit_el     = cvo,
-            name_prefix = "mon",
-        )
-        mon_resolver.set_chain_elements(mon_chain)
-        mon_resolver.init_convs()
-        mon_resolver.limiter_router = self.limiter_router  # musi być przed rebuild!
-
-        # Domyślne połączenie — jeśli brak aktywnych, mph_echo → cvo bezpośrednio
-        enabled = [mid for mid, w in self.chain_panel.mws.items() if w.en.isChecked()]
-        if enabled:
-            mon_resolver.rebuild(enabled)
-        else:
-            lnk(mph_echo, cvo)
-
-        lnk(cvo,hw)
-        lnk(tee,q_sp); lnk(q_sp,msp); lnk(msp,msnk)
-
-        bus=p.get_bus(); bus.add_signal_watch()
-        bus.connect("message",self._on_mon_bus)
-
-        self.eqw.set_gst(self.eq,eq10)
-        self.tape_sim.set_pipeline(self.tape_sat,self.tape_gain,self.tape_tone,t_sat,t_gn,t_tn)
-        self.tape_spatial.set_pipeline(self.sp_stereo,self.sp_echo,self.sp_sat,sw,echo,sp_sat)
-        self.chain_panel.attach(self.chain_els,mon_chain)
-        # Phantom monitor — własne mph_* elementy, niezależne od Spatial
-        self.phantom_stereo.mph_conv1  = mph_conv1
-        self.phantom_stereo.mph_stereo = mph_stereo
-        self.phantom_stereo.mph_conv2  = mph_conv2
-        self.phantom_stereo.mph_echo   = mph_echo
-        self.phantom_stereo._apply_current()   # sync stanu (bypass lub aktywny)
-        # Podepnij resolver monitora jako drugi resolver (działa obok głównego)
-        self._mon_resolver = mon_resolver
-        self.chain_panel.add_resolver(mon_resolver)
-
-        ret=p.set_state(Gst.State.PLAYING)
-        print(f"Monitor pipeline: {ret.value_name}")
-        self.play=True; self.bp.setText("⏸")
-        self.lt.setText(f"🎤 {name}"); self.ls.setCurrentRow(self.idx); self._up_meta()
-
-    def _on_mon_bus(self,bus,msg):
-        if msg.type==Gst.MessageType.ERROR:
-            err,dbg=msg.parse_error(); print(f"Mon ERR: {err.message} | {dbg}")
-        elif msg.type==Gst.MessageType.ELEMENT:
-            s=msg.get_structure()
-            if s and s.get_name()=="spectrum": self._spectrum(s)
-
     # ── POLL TIMER ──────────────────────────────────────────────────────────
     def _poll(self):
-        if not self.play or self._mon_pipe: return
-        ok,pos=self.ply.query_position(Gst.Format.TIME)
-        ok2,dur=self.ply.query_duration(Gst.Format.TIME)
-        if ok and ok2 and dur>0:
+        if not self.play or self._src_kind!="file": return
+        # Pozycja z dekodera aktywnego decka — wyjście concat/miksera liczy czas ciągły
+        ok,pos,dur=self.deck.position()
+        if ok and dur>0:
             if not self.sk.isSliderDown():
                 self.sk.setRange(0,int(dur/Gst.SECOND)); self.sk.setValue(int(pos/Gst.SECOND))
             ps=int(pos/Gst.SECOND); ds=int(dur/Gst.SECOND)
@@ -6688,10 +9574,558 @@ class CarbonPhaserPlayer(QMainWindow):
         l=len(self.pl); c=self.idx; g=lambda i:get_metadata(*self.pl[i])
         self.viz.set_covers_data(g((c-1)%l),g(c),g((c+1)%l))
 
+# ============================================================================
+# BENCHMARKI  (python3 CarbonfX12g_v8.py --bench <nazwa>)
+# ============================================================================
+BENCHMARKS = {}
+
+def benchmark(name):
+    """Rejestruje funkcję benchmarku pod nazwą używaną w --bench."""
+    def deco(fn):
+        BENCHMARKS[name] = fn
+        return fn
+    return deco
+
+BENCH_RATE = FX_RATE
+
+def _bench_rtf(build, seconds=20.0, label=""):
+    """
+    Offline: audiotestsrc(pink) → FX_CAPS → build(pipeline) → fakesink sync=False.
+    build(pipeline) dodaje elementy do pipeline i zwraca ich listę (w kolejności).
+    Zwraca RTF = czas_przetwarzania / czas_audio (mniej = lepiej).
+    """
+    spb  = 1024
+    pipe = Gst.Pipeline.new("bench")
+    src  = mkgst("audiotestsrc", None, {"wave": "pink-noise", "is-live": False,
+                                        "samplesperbuffer": spb,
+                                        "num-buffers": int(seconds * BENCH_RATE / spb)})
+    conv = mkgst("audioconvert", None)
+    caps = mkgst("capsfilter", None, {"caps": Gst.Caps.from_string(FX_CAPS)})
+    sink = mkgst("fakesink", None, {"sync": False})
+    for el in (src, conv, caps, sink):
+        pipe.add(el)
+    chain = [el for el in build(pipe) if el]
+    seq = [src, conv, caps] + chain + [sink]
+    for a, b in zip(seq, seq[1:]):
+        if not a.link(b):
+            print(f"  [bench] link {a.get_name()} → {b.get_name()} FAIL")
+    t0 = time.perf_counter()
+    pipe.set_state(Gst.State.PLAYING)
+    msg = pipe.get_bus().timed_pop_filtered(
+        Gst.CLOCK_TIME_NONE, Gst.MessageType.EOS | Gst.MessageType.ERROR)
+    dt = time.perf_counter() - t0
+    pipe.set_state(Gst.State.NULL)
+    if msg and msg.type == Gst.MessageType.ERROR:
+        err, _ = msg.parse_error()
+        print(f"  [bench] {label}: ERROR {err.message}")
+        return None
+    rtf = dt / seconds
+    print(f"  {label:<32} {dt*1000:8.1f} ms   RTF {rtf:.5f}   ({1/rtf:6.0f}x realtime)")
+    return rtf
+
+def _bench_chain(enabled, mode):
+    """Builder łańcucha CHAIN_GST jak w SignalChainPanel dla danego trybu bypass."""
+    topo = DSPTopology.shared()
+    def build(pipe):
+        linked = enabled if mode == "relink" else CHAIN_ORDER
+        els = []
+        for slot in topo.plan(linked)[1]:
+            if isinstance(slot, int):
+                el = mkgst("audioconvert", None)
+            elif mode == "selector":
+                plugin, _, _ = CHAIN_GST[slot]
+                bp = ChainBypass(slot, mkgst(plugin, None), f"bench_chb_{slot}")
+                bp.set_active(slot in enabled)
+                el = bp.bin if bp.ok else None
+            else:
+                plugin, neutral, _ = CHAIN_GST[slot]
+                el = mkgst(plugin, None, None if slot in enabled else neutral)
+            if el:
+                pipe.add(el); els.append(el)
+        return els
+    return build
+
+@benchmark("bypass")
+def _bench_bypass():
+    """Porównanie trybów bypass: relink / neutral / selector (ChainBypass)."""
+    for enabled in ([], ["compressor", "hi_pass", "panorama"]):
+        print(f"[bench:bypass] aktywne: {enabled or '—'}  (wyłączone: {len(CHAIN_ORDER)-len(enabled)})")
+        for mode in BYPASS_MODES:
+            _bench_rtf(_bench_chain(enabled, mode), label=mode)
+
+def _bench_decode(uris, seconds):
+    """
+    Offline: N × uridecodebin → audiomixer → FX_CAPS → fakesink sync=False.
+    Zwraca (RTF, CPU s, przyrost maxrss MB) — maxrss jest szczytowy dla procesu,
+    więc warianty mierzymy od najmniejszego.
+    """
+    pipe = Gst.Pipeline.new("bench_dec")
+    mix  = mkgst("audiomixer", None)
+    caps = mkgst("capsfilter", None, {"caps": Gst.Caps.from_string(FX_CAPS)})
+    sink = mkgst("fakesink", None, {"sync": False})
+    for el in (mix, caps, sink):
+        pipe.add(el)
+    mix.link(caps); caps.link(sink)
+    def on_pad(dec, pad):
+        req = getattr(mix, "request_pad_simple", None) or mix.get_request_pad
+        conv = mkgst("audioconvert", None); pipe.add(conv); conv.sync_state_with_parent()
+        pad.link(conv.get_static_pad("sink")); conv.get_static_pad("src").link(req("sink_%u"))
+    for u in uris:
+        d = mkgst("uridecodebin", None, {"uri": u})
+        d.connect("pad-added", on_pad)
+        pipe.add(d)
+    rss0 = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    c0 = resource.getrusage(resource.RUSAGE_SELF); t0 = time.perf_counter()
+    pipe.set_state(Gst.State.PAUSED); pipe.get_state(Gst.CLOCK_TIME_NONE)
+    pipe.send_event(Gst.Event.new_seek(1.0, Gst.Format.TIME, Gst.SeekFlags.FLUSH,
+                                       Gst.SeekType.SET, 0,
+                                       Gst.SeekType.SET, int(seconds * Gst.SECOND)))
+    pipe.set_state(Gst.State.PLAYING)
+    pipe.get_bus().timed_pop_filtered(Gst.CLOCK_TIME_NONE,
+                                      Gst.MessageType.EOS | Gst.MessageType.ERROR)
+    dt = time.perf_counter() - t0; c1 = resource.getrusage(resource.RUSAGE_SELF)
+    pipe.set_state(Gst.State.NULL)
+    cpu = (c1.ru_utime + c1.ru_stime) - (c0.ru_utime + c0.ru_stime)
+    return dt / seconds, cpu, (c1.ru_maxrss - rss0) / 1024.0
+
+@benchmark("spectrum-ingest")
+def _bench_spectrum_ingest(n=20000):
+    """Wiadomości spectrum/s: dawna ścieżka (listy Pythona) vs float32 ndarray."""
+    rnd  = random.Random(1)
+    vals = ", ".join(f"{rnd.uniform(-80, 0):.3f}" for _ in range(64))
+    st   = Gst.Structure.from_string(f"spectrum, magnitude=(float){{ {vals} }}")[0]
+
+    def legacy(s):
+        rm = []
+        try: rm = s.get_value("magnitude")
+        except TypeError:
+            m = re.search(r'magnitude=\(float\)\{\s*([^}]+)\s*\}', s.to_string())
+            if m: rm = [float(x.strip()) for x in m.group(1).split(',')]
+        if rm:
+            d = [max(0, min(1, (x + 80) / 80)) for x in rm]
+            sum(d[:5]) / 5; chunk = len(d) // 10
+            [sum(d[i*chunk:(i+1)*chunk]) / chunk for i in range(10)]
+            sum(rm) / len(rm)
+
+    def fast(s):
+        rm = spectrum_magnitudes(s)
+        if rm is not None and rm.size:
+            d = spectrum_normalize(rm)
+            float(d[:5].mean()); chunk = len(d) // 10
+            d[:chunk*10].reshape(10, chunk).mean(axis=1)
+            float(rm.mean())
+
+    for k in SPECTRUM_STATS: SPECTRUM_STATS[k] = 0
+    for label, fn in (("legacy (listy + regex fallback)", legacy), ("ndarray float32", fast)):
+        t0 = time.perf_counter()
+        for _ in range(n): fn(st)
+        dt = time.perf_counter() - t0
+        print(f"  {label:<32} {n/dt:10.0f} msg/s   ({dt/n*1e6:6.1f} µs/msg)")
+    print(f"  ścieżki ekstrakcji: {SPECTRUM_STATS}")
+
+@benchmark("analysis")
+def _bench_analysis(seconds=30.0):
+    """Koszt analizy FFT na sekundę audio: pełny tap FX_CAPS vs pre-stage mono ANALYSIS_RATE."""
+    rng = np.random.default_rng(1)
+    for label, rate, ch, n in (("FX_CAPS stereo 48k, N=4096", FX_RATE, 2, 4096),
+                               (f"mono {ANALYSIS_RATE}, N={ANALYSIS_N}", ANALYSIS_RATE, 1, ANALYSIS_N)):
+        an  = SpectrumAnalyzer(None, rate=rate, channels=ch, n_fft=n)
+        blk = rate // 100                                  # bufory po 10 ms
+        x   = rng.standard_normal(int(seconds * rate) * ch).astype(np.float32) * 0.1
+        t0  = time.perf_counter()
+        for i in range(0, x.size, blk * ch):
+            v = x[i:i + blk * ch]
+            an._push(v if ch == 1 else v.reshape(-1, ch).mean(axis=1))
+        dt  = time.perf_counter() - t0
+        print(f"  {label:<32} {dt/seconds*1000:7.2f} ms CPU / s audio   "
+              f"{an.stats['frames']} ramek, FFT {an.stats['fft_ms']/max(1,an.stats['frames']):.3f} ms/ramkę")
+
+@benchmark("startup")
+def _bench_startup():
+    """Budowa toru FX + 3 punktów MBL: LAZY_DSP vs wszystko od razu (czas, elementy, RSS)."""
+    global LAZY_DSP
+    saved = LAZY_DSP
+    for lazy in (True, False):                      # RSS rośnie — mniejszy wariant pierwszy
+        LAZY_DSP = lazy
+        rss0, t0 = rss_mb(), time.perf_counter()
+        pipe = Gst.Pipeline.new(f"bench_startup_{int(lazy)}")
+        fx = FXChainFactory().build(f"s{int(lazy)}_", with_mbl=True)
+        pipe.add(fx.bin)
+        # Te same fabryki co w CarbonPhaserPlayer (topologia z MBL_TOPOLOGY)
+        for pid, name in MBL_OUTER_POINTS.items():
+            mk = mbl_factory(pipe, pid, f"s{int(lazy)}_{name}")
+            if not lazy:
+                mk()
+        ms = (time.perf_counter() - t0) * 1000.0
+        print(f"  LAZY_DSP={lazy!s:<5}  {ms:7.1f} ms   {len(iterate_recurse(pipe)):4d} elementów   "
+              f"RSS +{rss_mb() - rss0:.1f} MB")
+        pipe.set_state(Gst.State.NULL)
+    LAZY_DSP = saved
+
+def _mbl_bin(pipe, name, topology):
+    """MultibandLimiter w osobnym binie z ghost padami — jeden element dla _bench_rtf."""
+    b = Gst.Bin.new(name)
+    mbl = MultibandLimiter(b, name, MBLIMIT_BANDS, topology=topology)
+    b.add_pad(Gst.GhostPad.new("sink", mbl._tee.get_static_pad("sink")))
+    b.add_pad(Gst.GhostPad.new("src",  mbl._tail.get_static_pad("src")))
+    pipe.add(b)
+    return b, mbl
+
+def _impulse_response(topology, n=16384, amp=0.1):
+    """Odpowiedź impulsowa MBL (kanał L) przez appsrc → MBL → appsink; amp pod progami limiterów."""
+    pipe = Gst.Pipeline.new(f"bench_ir_{topology}")
+    src  = mkgst("appsrc", None, {"caps": Gst.Caps.from_string(FX_CAPS), "format": "time"})
+    sink = mkgst("appsink", None, {"sync": False, "emit-signals": True})
+    pipe.add(src); pipe.add(sink)
+    b, _ = _mbl_bin(pipe, f"ir_{topology}", topology)
+    src.link(b); b.link(sink)
+    chunks = []
+    def on_sample(s):
+        buf = s.emit("pull-sample").get_buffer()
+        chunks.append(np.frombuffer(buf.extract_dup(0, buf.get_size()), dtype=np.float32))
+        return Gst.FlowReturn.OK
+    sink.connect("new-sample", on_sample)
+    x = np.zeros((n, 2), dtype=np.float32); x[0] = amp
+    buf = Gst.Buffer.new_wrapped(x.tobytes())
+    buf.pts, buf.duration = 0, n * Gst.SECOND // FX_RATE
+    pipe.set_state(Gst.State.PLAYING)
+    src.emit("push-buffer", buf); src.emit("end-of-stream")
+    pipe.get_bus().timed_pop_filtered(Gst.CLOCK_TIME_NONE,
+                                      Gst.MessageType.EOS | Gst.MessageType.ERROR)
+    pipe.set_state(Gst.State.NULL)
+    y = np.concatenate(chunks)[0::2] if chunks else np.zeros(n, dtype=np.float32)
+    return y[:n] / amp
+
+@benchmark("mbl-topology")
+def _bench_mbl_topology():
+    """MBL: tee fan-out (Czebyszew) vs drzewo LR4 — RTF, CPU i płaskość sumy pasm."""
+    for topo in MBL_TOPOLOGIES:
+        c0 = resource.getrusage(resource.RUSAGE_SELF)
+        holder = []
+        def build(pipe, topo=topo):
+            b, mbl = _mbl_bin(pipe, f"bt_{topo}", topo)
+            holder.append(mbl)
+            return [b]
+        _bench_rtf(build, label=f"MBL {topo}")
+        c1 = resource.getrusage(resource.RUSAGE_SELF)
+        cpu = (c1.ru_utime + c1.ru_stime) - (c0.ru_utime + c0.ru_stime)
+        h = np.fft.rfft(_impulse_response(topo))
+        f = np.fft.rfftfreq(len(h) * 2 - 2, 1.0 / FX_RATE)
+        db = 20 * np.log10(np.maximum(np.abs(h[(f >= 30) & (f <= 16000)]), 1e-9))
+        n_filt = sum(1 for el in holder[0]._all_els()
+                     if el.get_factory().get_name() in ("audiocheblimit", "audioiirfilter"))
+        print(f"  {'':<32} CPU {cpu*1000:7.1f} ms/20s   filtrów {n_filt:2d}   "
+              f"suma pasm 30 Hz–16 kHz: {db.min():+.2f} … {db.max():+.2f} dB")
+
+@benchmark("output-protect")
+def _bench_output_protect(seconds=20.0):
+    """Ochrona POST_FX: 5-pasmowy MBL (fanout / lr_tree) vs jednoprzebiegowy true-peak."""
+    def cpu_ms(fn):
+        c0 = resource.getrusage(resource.RUSAGE_SELF)
+        rtf = fn()
+        c1 = resource.getrusage(resource.RUSAGE_SELF)
+        return rtf, ((c1.ru_utime + c1.ru_stime) - (c0.ru_utime + c0.ru_stime)) * 1000.0
+
+    rows = []
+    for topo in MBL_TOPOLOGIES:
+        rtf, cpu = cpu_ms(lambda topo=topo: _bench_rtf(
+            lambda pipe: [_mbl_bin(pipe, f"bp_{topo}", topo)[0]], seconds, f"MBL {topo}"))
+        rows.append((f"MBL {topo}", rtf, cpu))
+    def build_tp(pipe):
+        el = mkgst(TP_ELEMENT, "bp_tp")
+        pipe.add(el)
+        return [el]
+    if register_truepeak():
+        rtf, cpu = cpu_ms(lambda: _bench_rtf(build_tp, seconds, "TruePeak (element)"))
+        rows.append(("TruePeak (element)", rtf, cpu))
+    for label, rtf, cpu in rows:
+        if rtf is not None:
+            print(f"  {label:<32} CPU {cpu:8.1f} ms/{seconds:.0f}s")
+
+    # Sam rdzeń NumPy — bez GStreamera, bloki jak w _bench_rtf
+    core = TruePeakCore(FX_RATE, 2)
+    rng  = np.random.default_rng(0)
+    blk  = 1024
+    x    = (rng.standard_normal((int(seconds * FX_RATE) // blk, blk, 2)) * 0.5).astype(np.float32)
+    t0 = time.perf_counter()
+    for b in x:
+        core.process(b)
+    dt = time.perf_counter() - t0
+    print(f"  {'TruePeakCore (NumPy)':<32} {dt*1000:8.1f} ms   RTF {dt/seconds:.5f}   "
+          f"({seconds/dt:6.0f}x realtime)   max GR {core.max_gr_db:.1f} dB   "
+          f"latencja {core.delay / FX_RATE * 1000:.2f} ms")
+
+@benchmark("truepeak-ceiling")
+def _bench_truepeak_ceiling(seconds=1.0):
+    """Test: true-peak wyjścia TruePeakCore ≤ sufit (bez potoku GStreamera; kod wyjścia 1 = FAIL)."""
+    rate = FX_RATE
+    rng  = np.random.default_rng(3)
+    n    = np.arange(int(seconds * rate))
+
+    def lowpass(x, fc):
+        X = np.fft.rfft(x, axis=0)
+        X[np.fft.rfftfreq(x.shape[0], 1.0 / rate) > fc] = 0.0
+        return np.fft.irfft(X, x.shape[0], axis=0)
+
+    signals = {
+        "szum biały +3.5 dBFS":       rng.standard_normal((n.size, 2)) * 1.5,
+        "szum pasmowy 18 kHz":        lowpass(rng.standard_normal((n.size, 2)), 18000.0) * 3.0,
+        "sinus 0.45·fs":              np.stack([np.sin(2 * np.pi * 0.45 * n + 0.3) * 2.0] * 2, 1),
+        "sinus fs/4, faza 45°":       np.stack([np.sin(np.pi / 2 * n + np.pi / 4) * 2.0] * 2, 1),
+        "prostokąt 997 Hz":           np.stack([np.sign(np.sin(2 * np.pi * 997 / rate * n))] * 2, 1),
+        "impulsy ±3":                 np.where((n % 500 == 0)[:, None], np.array([[3.0, -3.0]]), 0.0),
+    }
+    failed = 0
+    for ceiling in (TP_CEILING_DB, -0.1):
+        lim = 10.0 ** (ceiling / 20.0)
+        for label, x in signals.items():
+            # ogon ciszy > delay: koniec sygnału też przechodzi przez limiter
+            x = np.concatenate([x, np.zeros((4096, x.shape[1]))]).astype(np.float32)
+            for blk in (1024, 333):
+                core = TruePeakCore(rate, x.shape[1], ceiling_db=ceiling)
+                y = np.concatenate([core.process(x[i:i + blk]) for i in range(0, len(x), blk)])
+                pk = TruePeakCore.true_peak(y)
+                ok = pk <= lim * (1.0 + 1e-6)             # zaokrąglenie float32
+                failed += not ok
+                print(f"  {label:<24} sufit {ceiling:+.1f}  blok {blk:4d}   "
+                      f"TP {20.0 * math.log10(max(pk, 1e-12)):+.4f} dBTP   {'OK' if ok else 'FAIL'}")
+    if failed:
+        print(f"[bench:truepeak-ceiling] {failed} przekroczeń sufitu")
+        sys.exit(1)
+
+@benchmark("mbl-switch")
+def _bench_mbl_switch(toggles=16, period_ms=250):
+    """Włącz/wyłącz MBL na żywym torze: relink (inject/eject) vs switch (valve + crossfade)."""
+    global MBL_WIRING
+    saved = MBL_WIRING
+    for wiring in ("relink", "switch"):
+        MBL_WIRING = wiring
+        pipe = Gst.Pipeline.new(f"bench_sw_{wiring}")
+        src  = mkgst("audiotestsrc", None, {"wave": "pink-noise", "is-live": True})
+        caps = mkgst("capsfilter", None, {"caps": Gst.Caps.from_string(FX_CAPS)})
+        up   = mkgst("volume", None)
+        dn   = mkgst("identity", None)
+        sink = mkgst("fakesink", None, {"sync": True})
+        for el in (src, caps, up, dn, sink):
+            pipe.add(el)
+        src.link(caps); caps.link(up); up.link(dn); dn.link(sink)
+        router = LimiterRouter()
+        router.register("BENCH", lambda: MultibandLimiter(pipe, f"bsw_{wiring}", MBLIMIT_BANDS), up, dn)
+        gaps, last_end, calls = [0], [None], []
+
+        def on_buf(pad, info, _data):
+            buf = info.get_buffer()
+            if last_end[0] is not None and buf.pts > last_end[0] + Gst.MSECOND:
+                gaps[0] += 1
+            last_end[0] = buf.pts + buf.duration
+            return Gst.PadProbeReturn.OK
+        sink.get_static_pad("sink").add_probe(Gst.PadProbeType.BUFFER, on_buf, None)
+
+        loop, n = GLib.MainLoop(), [0]
+        def toggle():
+            t0 = time.perf_counter()
+            router.enable("BENCH", n[0] % 2 == 0)
+            calls.append((time.perf_counter() - t0) * 1000.0)
+            n[0] += 1
+            if n[0] >= toggles:
+                loop.quit(); return False
+            return True
+        pipe.set_state(Gst.State.PLAYING)
+        GLib.timeout_add(period_ms, toggle)
+        loop.run()
+        pipe.set_state(Gst.State.NULL)
+        calls = np.array(calls)
+        print(f"  {wiring:<7} {toggles} przełączeń   wywołanie śr {calls.mean():6.2f} ms  "
+              f"max {calls.max():6.2f} ms   dziury w PTS na wyjściu: {gaps[0]}")
+    MBL_WIRING = saved
+
+def _qt_app():
+    """QApplication dla benchmarków rysowania — platforma offscreen, bez okna."""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    return QApplication.instance() or QApplication(sys.argv[:1])
+
+@benchmark("viz-particles")
+def _bench_viz_particles(frames=240, w=1280, h=400):
+    """Warstwy cząsteczkowe MatrixVisualizer offscreen: ms/klatkę przy rosnącej puli."""
+    global VIZ_PARTICLES
+    app = _qt_app()
+    saved = dict(VIZ_PARTICLES)
+    c = ("#00FFFF", "#FF00FF", "#050010")
+    for scale in (1, 10, 50):
+        VIZ_PARTICLES = {k: v * scale for k, v in saved.items()}
+        viz = MatrixVisualizer(); viz.tm.stop()
+        pm = QPixmap(w, h)
+        row = []
+        for layer in VIZ_PARTICLES:
+            fn = getattr(viz, f"_draw_{layer}")
+            p = QPainter(pm); p.setRenderHint(QPainter.RenderHint.Antialiasing, True)
+            for _ in range(frames // 2):             # rozbieg: pula dochodzi do limitu
+                p.fillRect(0, 0, w, h, QColor(c[2])); fn(p, w, h, c); viz.ph += viz.phase_speed
+            t0 = time.perf_counter()
+            for _ in range(frames):
+                p.fillRect(0, 0, w, h, QColor(c[2])); fn(p, w, h, c); viz.ph += viz.phase_speed
+            ms = (time.perf_counter() - t0) * 1000.0 / frames
+            p.end()
+            row.append(f"{layer} {viz.parts[layer].a.size:5d} szt. {ms:6.2f} ms")
+        print(f"  ×{scale:<3} " + "   ".join(row))
+        viz.deleteLater()
+    VIZ_PARTICLES = saved
+    app.processEvents()
+
+@benchmark("viz-layers")
+def _bench_viz_layers(frames=300, w=1280, h=400):
+    """Kompozytor MatrixVisualizer offscreen: warstwy statyczne z cache vs render co klatkę."""
+    app = _qt_app()
+    cover = QPixmap(600, 600)
+    g = QLinearGradient(0, 0, 600, 600)
+    g.setColorAt(0, QColor("#AA3355")); g.setColorAt(1, QColor("#3355AA"))
+    p = QPainter(cover); p.fillRect(0, 0, 600, 600, QBrush(g)); p.end()
+    d = np.linspace(1.0, 0.1, VIZ_BARS, dtype=np.float32)
+    viz = MatrixVisualizer(); viz.tm.stop(); viz.resize(w, h)
+    viz.set_covers_data((cover, "Poprzedni utwór", "Artysta"),
+                        (cover, "Bieżący utwór o dość długim tytule", "Artysta"),
+                        (cover, "Następny utwór", "Artysta"))
+    pm = QPixmap(w, h)
+    for preset in viz.presets:
+        viz.set_preset(preset)
+        for cached in (False, True):
+            viz.layer_stats = {}
+            t0 = time.perf_counter()
+            for i in range(frames):
+                if not cached:
+                    viz._invalidate()
+                viz.update_data(d * (0.6 + 0.4 * math.sin(i * 0.1))); viz.ph += viz.phase_speed
+                viz._render_to(pm, w, h)
+            ms = (time.perf_counter() - t0) * 1000.0 / frames
+            per = "  ".join(f"{n} {avg:.2f}" for n, (_, avg, _) in viz.layer_report().items()
+                            if not n.endswith("(cache)"))
+            print(f"  {preset:<10} {'cache' if cached else 'co klatkę':<10} {ms:6.2f} ms/klatkę   [{per}]")
+    viz.deleteLater(); app.processEvents()
+
+def _legacy_spectrum_bars(p, ad, w, h, c):
+    """Referencja dla --bench viz-spectrum: gradient + pędzel + drawRect per słupek."""
+    bw = w / 64
+    for i, v in enumerate(ad):
+        bh = max(1, int(v * h * 0.8)); x = int(i * bw)
+        g = QLinearGradient(x, h, x, h - bh); g.setColorAt(0, QColor(c[0])); g.setColorAt(1, QColor(c[1]))
+        p.setBrush(QBrush(g)); p.setPen(Qt.PenStyle.NoPen)
+        p.drawRect(x + 1, h - bh, max(1, int(bw) - 2), bh)
+
+def _legacy_mirror_spectrum(p, ad, w, h, c):
+    bw = w / 64; cy = h // 2
+    for i, v in enumerate(ad):
+        bh = max(1, int(v * cy * 0.9)); x = int(i * bw)
+        p.fillRect(x + 1, cy - bh, max(1, int(bw) - 2), bh * 2, QColor(c[0]))
+
+def _legacy_flux_wave(p, ad, ph, w, h, c):
+    p.setPen(QPen(QColor(c[0]), 2)); pts = []
+    for i in range(129):
+        x = i * w / 128; idx = min(63, int(i * 64 / 128))
+        pts.append(QPointF(x, h / 2 + math.sin(ph + i * 0.2) * ad[idx] * h * 0.4))
+    for i in range(len(pts) - 1): p.drawLine(pts[i], pts[i + 1])
+
+@benchmark("viz-spectrum")
+def _bench_viz_spectrum(frames=1000, w=1280, h=400):
+    """Słupki / lustro / fala offscreen: dawne rysowanie per element vs BatchRenderer."""
+    app = _qt_app()
+    c = ("#00FFFF", "#FF00FF", "#050010")
+    rng = np.random.default_rng(0)
+    specs = rng.random((frames, VIZ_BARS)).astype(np.float32)
+    br = BatchRenderer()
+    cases = [
+        ("spectrum_bars",   lambda p, d, i: _legacy_spectrum_bars(p, d, w, h, c),
+                            lambda p, d, i: br.spectrum_bars(p, d, w, h, c), False),
+        ("mirror_spectrum", lambda p, d, i: _legacy_mirror_spectrum(p, d, w, h, c),
+                            lambda p, d, i: br.mirror_spectrum(p, d, w, h, c), False),
+        ("flux_wave",       lambda p, d, i: _legacy_flux_wave(p, d, i * 0.03, w, h, c),
+                            lambda p, d, i: br.flux_wave(p, d, i * 0.03, w, h, c), True),
+    ]
+    pm = QPixmap(w, h)
+    for name, old, new, aa in cases:
+        res = []
+        for fn in (old, new):
+            p = QPainter(pm); p.setRenderHint(QPainter.RenderHint.Antialiasing, aa)
+            t0 = time.perf_counter()
+            for i in range(frames):
+                p.fillRect(0, 0, w, h, QColor(c[2])); fn(p, specs[i], i)
+            res.append((time.perf_counter() - t0) * 1000.0 / frames)
+            p.end()
+        print(f"  {name:<16} dawne {res[0]:6.3f} ms   batch {res[1]:6.3f} ms   "
+              f"×{res[0] / max(res[1], 1e-9):4.1f}  (z czyszczeniem tła, {w}×{h})")
+    app.processEvents()
+
+@benchmark("crossfade")
+def _bench_crossfade():
+    """Koszt overlapu crossfade: 1 vs 2 dekodery → audiomixer, seek po crossfade (--bench crossfade A B)."""
+    files = [os.path.abspath(p) for p in sys.argv[3:5]]
+    if len(files) < 2:
+        print("[bench:crossfade] użycie: --bench crossfade <plik_a> <plik_b>"); return
+    uris = [Gst.filename_to_uri(p) for p in files]
+    for label, us in (("1 dekoder", uris[:1]), ("2 dekodery (overlap)", uris)):
+        rtf, cpu, rss = _bench_decode(us, 20.0)
+        print(f"  {label:<32} RTF {rtf:.5f}   CPU {cpu*1000:7.1f} ms/20s   maxrss +{rss:.1f} MB")
+    adv = _bench_xfade_seek(uris)
+    print(f"  {'seek po crossfade':<32} dekoder +{adv:.2f} s w 1.00 s   "
+          f"{'OK' if adv >= 0.5 else 'FAIL (mikser czeka — offset padu po flushu)'}")
+
+def _bench_xfade_seek(uris, xfade=2.0):
+    """
+    GaplessDeck na żywo (fakesink sync=True): A, crossfade → B, po rampie seek
+    FLUSH na 1 s. Zwraca, o ile sekund przesunął się dekoder B w 1 s po seeku
+    (≈ 1.0 — tor gra; ≈ 0 — mikser czeka na dane przesunięte offsetem padu).
+    """
+    pipe = Gst.Pipeline.new("bench_xseek")
+    deck = GaplessDeck(pipe)
+    conv = mkgst("audioconvert", None)
+    caps = mkgst("capsfilter", None, {"caps": Gst.Caps.from_string(FX_CAPS)})
+    sink = mkgst("fakesink", None, {"sync": True})
+    for el in (conv, caps, sink):
+        pipe.add(el)
+    deck.mixer.link(conv); conv.link(caps); caps.link(sink)
+    deck.set_crossfade(xfade)
+    deck.load(0, uris[0])
+    loop, res = GLib.MainLoop(), {"adv": 0.0}
+
+    def prepare():
+        deck.prepare(1, uris[1]); return False
+
+    def skip():
+        if deck.prepared() is None:
+            return True                       # B jeszcze się prerolluje
+        deck.skip()
+        GLib.timeout_add(int(xfade * 1000) + 600, seek)
+        return False
+
+    def seek():
+        deck.settle()
+        pipe.seek_simple(Gst.Format.TIME, Gst.SeekFlags.FLUSH, Gst.SECOND)
+        GLib.timeout_add(1000, check)
+        return False
+
+    def check():
+        ok, pos, _ = deck.position()
+        res["adv"] = (pos - Gst.SECOND) / Gst.SECOND if ok else 0.0
+        loop.quit(); return False
+
+    pipe.set_state(Gst.State.PLAYING)
+    GLib.timeout_add(500, prepare)
+    GLib.timeout_add(1000, skip)
+    GLib.timeout_add(int((xfade + 10) * 1000), lambda: (loop.quit(), False)[1])
+    loop.run()
+    pipe.set_state(Gst.State.NULL)
+    return res["adv"]
+
+
 # ============================================================================
 # ENTRY
 # ============================================================================
 if __name__=="__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "--bench":
+        fn = BENCHMARKS.get(sys.argv[2])
+        if not fn:
+            print(f"Dostępne benchmarki: {', '.join(sorted(BENCHMARKS))}")
+            sys.exit(1)
+        fn(); sys.exit(0)
     app=QApplication(sys.argv); app.setStyle("Fusion")
     pal=QPalette()
     pal.setColor(QPalette.ColorRole.Window,      QColor(13,13,16))